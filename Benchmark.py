@@ -0,0 +1,475 @@
+import os
+import sys
+import json
+import time
+import timeit
+import platform
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import Indicators as indicators
+import VectorBacktest as vector
+import WalkForward as walk_forward
+import Portfolio as portfolio
+from backtesting import Backtest
+from Strategies import VolumeIndicatorOBV, GoldenCross
+from StockData import Universe
+from Downloader import Downloader, frame_source
+from PriceStore import open_store
+from ResponseCache import ResponseCache
+import Screener as screening
+from Compact import CompactBars, TimeGrid
+from Cache import sizeof
+from Panel import BarPanel
+import Streaming as streaming
+from Resample import resample
+from Quality import Cleaner
+from QuantStocks import HEAVY_MODULES
+from ta.utils import dropna
+
+
+def synthetic_bars(bars: int = 100000, interval: str = "5min", seed: int = 0) -> pd.DataFrame:
+    """
+    :param bars: the number of bars
+    :param interval: the time between two bars
+    :param seed: the seed of the random walk
+    :return: a dataframe of OHLCV bars that follow a random walk
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.001, bars)) * close
+    index = pd.date_range("2021-01-04 09:30", periods=bars, freq=interval, tz="America/New_York", name="Datetime")
+    return pd.DataFrame({"Open": open_, "High": np.maximum(open_, close) + spread,
+                         "Low": np.minimum(open_, close) - spread, "Close": close,
+                         "Volume": rng.integers(1000, 100000, bars)}, index=index)
+
+
+def _first_derivative_obv_loop(close: pd.Series, volume: pd.Series, time: pd.Series) -> pd.Series:
+    """
+    The original (one bar at a time) implementation of Indicators.first_derivative_obv, kept as the baseline.
+    """
+    c_obv = indicators.obv(close, volume)
+    first_derivatives = []
+
+    for index in range(len(c_obv)):
+        if index == 0:
+            first_derivatives.append(0)
+            continue
+        delta_obv = c_obv[index] - c_obv[index - 1]
+        delta_time = (time[index] - time[index - 1]).total_seconds() * 1000
+
+        first_derivatives.append(delta_obv / delta_time)
+
+    return pd.Series(first_derivatives, copy=False)
+
+
+def bench_first_derivative_obv(bars: int = 100000, repeat: int = 3) -> dict:
+    """
+    Times the vectorized first_derivative_obv against the original loop (tests/test_indicators.py checks that both
+    return the same values).
+
+    :return: a dict of the best time (in seconds) of each implementation and the speedup
+    """
+    df = synthetic_bars(bars).reset_index()
+    close, volume, time = df["Close"], df["Volume"], df["Datetime"]
+
+    # the memoized result would be returned after the first call
+    enabled = indicators.cache.enabled
+    indicators.cache.enabled = False
+    try:
+        loop = min(timeit.repeat(lambda: _first_derivative_obv_loop(close, volume, time), number=1, repeat=repeat))
+        vectorized = min(timeit.repeat(lambda: indicators.first_derivative_obv(close, volume, time), number=1,
+                                       repeat=repeat))
+    finally:
+        indicators.cache.enabled = enabled
+    return {"bars": bars, "loop": loop, "vectorized": vectorized, "speedup": loop / vectorized}
+
+
+def bench_indicator_backends(bars: int = 100000, repeat: int = 3) -> dict:
+    """
+    Times every indicator with both the ta and the numpy backends (tests/test_indicators.py checks that they agree).
+
+    :return: a dict of indicator -> the best time (in seconds) of each backend and the speedup
+    """
+    df = synthetic_bars(bars)
+    high, low, close, volume = df["High"], df["Low"], df["Close"], df["Volume"].astype(float)
+    calls = {"ema": lambda: indicators.ema(close, 9), "rsi": lambda: indicators.rsi(close),
+             "bollinger_bands": lambda: indicators.bollinger_bands(close), "obv": lambda: indicators.obv(close, volume),
+             "vwap": lambda: indicators.vwap(high, low, close, volume), "atr": lambda: indicators.atr(close, low, high)}
+
+    enabled = indicators.cache.enabled
+    indicators.cache.enabled = False
+    results = {}
+    try:
+        for name, call in calls.items():
+            timings = {}
+            for backend in ("ta", "numpy"):
+                indicators.set_backend(backend)
+                timings[backend] = min(timeit.repeat(call, number=1, repeat=repeat))
+            results[name] = {**timings, "speedup": timings["ta"] / timings["numpy"]}
+    finally:
+        indicators.set_backend("ta")
+        indicators.cache.enabled = enabled
+    return results
+
+
+def bench_vector_backtest(strategies=(VolumeIndicatorOBV, GoldenCross), bars: int = 20000, repeat: int = 3) -> dict:
+    """
+    Times Backtest.run against the vectorized backtester (both compute their own indicators).
+
+    :return: a dict of strategy -> the best time (in seconds) of each engine and the speedup
+    """
+    df = synthetic_bars(bars)
+    enabled = indicators.cache.enabled
+    indicators.cache.enabled = False
+    results = {}
+    try:
+        for strategy in strategies:
+            bt = Backtest(df, strategy, commission=0, exclusive_orders=True, cash=100000)
+            backtesting = min(timeit.repeat(bt.run, number=1, repeat=repeat))
+            vectorized = min(timeit.repeat(lambda: vector.back_test(df, strategy), number=1, repeat=repeat))
+            results[strategy.__name__] = {"backtesting": backtesting, "vector": vectorized,
+                                          "speedup": backtesting / vectorized}
+    finally:
+        indicators.cache.enabled = enabled
+    return results
+
+
+def bench_walk_forward(strategy=VolumeIndicatorOBV, bars: int = 5000, train: int = 1000, test: int = 500,
+                       step: int = None) -> dict:
+    """
+    Times a walk-forward backtest of a synthetic ticker with Backtest.run on the sliced indicators, with Backtest.run
+    recomputing the indicators within every segment and with the vectorized backtester (tests/test_walk_forward.py
+    checks that they agree).
+
+    :return: a dict of the number of windows and the time (in seconds) of each way
+    """
+    df = synthetic_bars(bars)
+    panel = BarPanel({"ticker": df})
+    precomputed = panel.slices(strategy.batch_indicators(panel), "ticker")
+    windows = walk_forward.windows(bars, train, test, step)
+
+    enabled = indicators.cache.enabled
+    indicators.cache.enabled = False
+    try:
+        started = time.perf_counter()
+        for window in windows:
+            walk_forward.back_test(df.iloc[window.train_start:window.test_end], strategy, window,
+                                   walk_forward.slice_values(precomputed, window.train_start, window.test_end))
+        sliced = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for window in windows:
+            walk_forward.back_test(df.iloc[window.train_start:window.test_end], strategy, window)
+        recomputed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        walk_forward.vector_back_test({"ticker": df}, strategy, train, test, step)
+        vectorized = time.perf_counter() - started
+    finally:
+        indicators.cache.enabled = enabled
+    return {"windows": len(windows), "sliced": sliced, "recomputed": recomputed, "vector": vectorized}
+
+
+def bench_portfolio(tickers: int = 1000, bars: int = 2000, strategy=VolumeIndicatorOBV, max_positions: int = 20,
+                    max_weight: float = 0.05) -> dict:
+    """
+    Times a portfolio backtest of many synthetic tickers that share their cash.
+
+    :return: a dict of the time (in seconds) and the stats of the portfolio
+    """
+    frames = {f"T{number:05d}": synthetic_bars(bars, seed=number) for number in range(tickers)}
+    started = time.perf_counter()
+    result = portfolio.run(frames, strategy, max_positions=max_positions, max_weight=max_weight)
+    elapsed = time.perf_counter() - started
+    return {"tickers": tickers, "bars": bars, "seconds": elapsed,
+            "stats": {key: value for key, value in result["stats"].items() if key not in ("Start", "End")}}
+
+
+def bench_quality(bars: int = 5000, seed: int = 0, repeat: int = 3) -> dict:
+    """
+    Times the Cleaner against ta.utils.dropna over synthetic bars with NaNs, zero volumes and duplicate timestamps
+    (tests/test_quality.py checks that both drop the same rows).
+
+    :return: the best time (in seconds) of each way of cleaning
+    """
+    df = synthetic_bars(bars, seed=seed)
+    rows = np.random.default_rng(seed).choice(bars, 20, replace=False)
+    df.iloc[rows[:10], df.columns.get_loc("Close")] = np.nan
+    df.iloc[rows[10:], df.columns.get_loc("Volume")] = 0
+    duplicated = pd.concat([df, df.iloc[:5]])
+    return {"cleaner": min(timeit.repeat(lambda: Cleaner().clean(duplicated), number=1, repeat=repeat)),
+            "dropna": min(timeit.repeat(lambda: dropna(duplicated), number=1, repeat=repeat))}
+
+
+def bench_compact(tickers: int = 100, bars: int = 5000, prices=("float32", "scaled"), rtol: float = 1e-6) -> dict:
+    """
+    Measures the memory of the compact bars (see Compact) of synthetic tickers that share the same timestamps and
+    compares the core stats of the vectorized backtests on both (tests/test_compact.py checks the round trip).
+
+    :return: a dict of prices -> bytes of the dataframes, bytes of the compact bars, the ratio, the time to expand a
+    ticker and the largest difference of the core stats
+    """
+    frames = {number: synthetic_bars(bars, seed=number) for number in range(tickers)}
+    frame_bytes = sum(sizeof(df) for df in frames.values())
+
+    results = {}
+    for kind in prices:
+        time_grid = TimeGrid()
+        compact = {number: CompactBars.from_frame(df, kind, rtol=rtol, time_grid=time_grid)
+                   for number, df in frames.items()}
+        # the timestamps are shared, so they are only counted once
+        compact_bytes = (sum(bars.nbytes - bars.time.nbytes for bars in compact.values())
+                         + sum(bars.time.nbytes for bars in {id(bars.time): bars for bars in compact.values()}.values()))
+
+        df = frames[0]
+        expanded = compact[0].to_frame()
+        difference = 0.0
+        for strategy in (VolumeIndicatorOBV, GoldenCross):
+            expected = vector.back_test(df, strategy)
+            actual = vector.back_test(expanded, strategy)
+            for key in vector.CORE_STATS:
+                if not (np.isnan(expected[key]) and np.isnan(actual[key])):
+                    difference = max(difference, abs(float(expected[key]) - float(actual[key])))
+
+        results[kind] = {"frame_bytes": frame_bytes, "compact_bytes": compact_bytes,
+                         "ratio": frame_bytes / compact_bytes, "grids": len(time_grid),
+                         "expand": min(timeit.repeat(compact[0].to_frame, number=1, repeat=3)),
+                         "max_stat_difference": difference}
+    return results
+
+
+def bench_streaming(tickers: int = 1000, bars: int = 200, strategy=VolumeIndicatorOBV) -> dict:
+    """
+    Times the latency of a streaming strategy per bar, over a replay of many tickers.
+
+    :return: a dict of the number of bars and the mean and worst time (in microseconds) per bar
+    """
+    source = list(streaming.ReplaySource({number: synthetic_bars(bars, seed=number) for number in range(tickers)}))
+    stream = streaming.Stream(strategy)
+    latencies = np.empty(len(source))
+    for position, (ticker, bar) in enumerate(source):
+        started = time.perf_counter()
+        stream.update(ticker, bar)
+        latencies[position] = time.perf_counter() - started
+    return {"bars": len(source), "mean_us": latencies.mean() * 1e6, "p99_us": np.percentile(latencies, 99) * 1e6,
+            "max_us": latencies.max() * 1e6}
+
+
+def bench_resample(bars: int = 100000, intervals=("15m", "30m", "1h", "1d"), repeat: int = 3) -> dict:
+    """
+    Times resampling synthetic 5 minute bars (see Resample) against pandas' resample with the same bins
+    (tests/test_resample.py checks that both return the same bars).
+
+    :return: a dict of interval -> the best time (in seconds) of each implementation and the speedup
+    """
+    df = synthetic_bars(bars)
+    aggregation = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    # the intraday bins start at 9:30
+    frequencies = {"15m": ("15min", "0min"), "30m": ("30min", "0min"), "1h": ("60min", "30min"), "1d": ("1D", "0min")}
+
+    results = {}
+    for interval in intervals:
+        frequency, offset = frequencies[interval]
+        vectorized = min(timeit.repeat(lambda: resample(df, interval), number=1, repeat=repeat))
+        pandas = min(timeit.repeat(lambda: df.resample(frequency, offset=offset).agg(aggregation), number=1,
+                                   repeat=repeat))
+        results[interval] = {"numpy": vectorized, "pandas": pandas, "speedup": pandas / vectorized}
+    return results
+
+
+def synthetic_universe(root: str, tickers: int = 100, bars: int = 5000, interval: str = "5min", store="pickle",
+                       seed: int = 0) -> list:
+    """
+    Writes everything a Universe needs to start without a network into root: the screener and short interest
+    responses (as offline ResponseCache entries within root/Exchanges/Cache) and the bars of every ticker (within the
+    root/Exchanges/Screener store).
+
+    :param root: the directory the universe is written to
+    :param tickers: the number of tickers
+    :param bars: the number of bars of every ticker
+    :param interval: the time between two bars
+    :param store: pickle, parquet or memmap
+    :param seed: the seed of the first ticker, the other tickers use the following seeds
+    :return: the symbols of the tickers
+    """
+    symbols = [f"T{number:05d}" for number in range(tickers)]
+
+    # every ticker passes the default screener parameters of Universe
+    screener = pd.DataFrame({"symbol": symbols, "name": symbols, "lastsale": "$100.00", "netchange": "0.00",
+                             "pctchange": "0.00%", "marketCap": "1000000000", "country": "United States",
+                             "ipoyear": "", "volume": "1000000", "sector": "Miscellaneous", "industry": ""})
+    cache = ResponseCache(f"{root}/Exchanges/Cache", offline=True)
+    cache.put(screening.SCREENER_URL, screener, params=screening.SCREENER_PARAMS)
+    cache.put(screening.SHORT_INTEREST_URL, pd.DataFrame(columns=["Symbol", "Float Shorted (%)"]))
+
+    frames = {symbol: synthetic_bars(bars, interval, seed + number) for number, symbol in enumerate(symbols)}
+    # the synthetic bars are clean, their quality reports are written so that the universe does not clean them again
+    bars_store = open_store(store, f"{root}/Exchanges/Screener")
+    bars_store.save(frames)
+    bars_store.record_quality(Cleaner().clean_frames(frames)[1])
+    return symbols
+
+
+@contextmanager
+def working_directory(path: str):
+    """
+    Universe keeps its caches relative to the working directory, so a synthetic universe is used from within its root.
+    """
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _open_universe(strategies, store) -> Universe:
+    return Universe(strategies, store=store, http_cache=ResponseCache(offline=True),
+                    downloader=Downloader(frame_source({})))
+
+
+def bench_universe(strategies, store="pickle", repeat: int = 3) -> dict:
+    """
+    Times constructing a Universe from its cache and then loading every ticker, from within a synthetic universe.
+
+    :return: a dict of the best time (in seconds) of each stage
+    """
+    construct = []
+    load = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        universe = _open_universe(strategies, store)
+        constructed = time.perf_counter()
+        for ticker in universe.tickers:
+            universe.tickers[ticker]
+        construct.append(constructed - started)
+        load.append(time.perf_counter() - constructed)
+    return {"tickers": len(universe.tickers), "construct": min(construct), "load": min(load)}
+
+
+def bench_indicators(bars: int = 100000, repeat: int = 3) -> dict:
+    """
+    Times every function of Indicators.py with the current backend (without the memoization).
+
+    :return: a dict of indicator -> the best time (in seconds)
+    """
+    df = synthetic_bars(bars)
+    high, low, close, volume = df["High"], df["Low"], df["Close"], df["Volume"].astype(float)
+    time_ = pd.Series(df.index)
+    calls = {"ema": lambda: indicators.ema(close, 9), "atr": lambda: indicators.atr(close, low, high),
+             "bollinger_bands": lambda: indicators.bollinger_bands(close), "rsi": lambda: indicators.rsi(close),
+             "obv": lambda: indicators.obv(close, volume), "vwap": lambda: indicators.vwap(high, low, close, volume),
+             "first_derivative_obv": lambda: indicators.first_derivative_obv(close, volume, time_)}
+
+    enabled = indicators.cache.enabled
+    indicators.cache.enabled = False
+    try:
+        return {name: min(timeit.repeat(call, number=1, repeat=repeat)) for name, call in calls.items()}
+    finally:
+        indicators.cache.enabled = enabled
+
+
+def bench_back_test(strategies, store="pickle", engines=("backtesting", "vector"), processes=1) -> dict:
+    """
+    Times Universe.back_test of every strategy with every engine, from within a synthetic universe.
+
+    :return: a dict of strategy -> engine -> the total time and the time per ticker (in seconds)
+    """
+    universe = _open_universe(list(strategies), store)
+    results = {}
+    # the indicators are cached on their data, so an engine would otherwise reuse the indicators of the one before it
+    enabled = indicators.cache.enabled
+    indicators.cache.enabled = False
+    try:
+        for strategy in strategies:
+            universe.strategies = [strategy]
+            for engine in engines:
+                started = time.perf_counter()
+                universe.back_test(processes=processes, engine=engine)
+                elapsed = time.perf_counter() - started
+                results.setdefault(strategy.__name__, {})[engine] = {
+                    "seconds": elapsed, "per_ticker": elapsed / max(1, len(universe.tickers)),
+                    "win_rate": None if np.isnan(universe.win_rate) else universe.win_rate}
+    finally:
+        indicators.cache.enabled = enabled
+    return results
+
+
+def bench_startup(module: str = "QuantStocks", repeat: int = 3, budget: float = 0.5) -> dict:
+    """
+    Times importing the module within a new interpreter (the way the command line starts) and checks that it does not
+    import any of HEAVY_MODULES.
+
+    :param module: the module that is imported
+    :param budget: the most seconds the import can take
+    :return: a dict of the best time (in seconds) of the import, the heavy modules it imported and whether it passed
+    (it imported no heavy module within the budget)
+    """
+    code = (f"import sys, time, json; started = time.perf_counter(); import {module}; "
+            f"elapsed = time.perf_counter() - started; "
+            f"print(json.dumps({{'seconds': elapsed, 'heavy': sorted(set({HEAVY_MODULES!r}) & set(sys.modules))}}))")
+    directory = os.path.dirname(os.path.abspath(__file__))
+    runs = [json.loads(subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True,
+                                      check=True).stdout) for _ in range(repeat)]
+
+    seconds = min(run["seconds"] for run in runs)
+    return {"seconds": seconds, "heavy": runs[0]["heavy"], "budget": budget,
+            "passed": not runs[0]["heavy"] and seconds <= budget}
+
+
+def run_suite(tickers: int = 100, bars: int = 5000, interval: str = "5min", store="pickle",
+              strategies=(VolumeIndicatorOBV, GoldenCross), repeat: int = 3, processes=1, output: str = None) -> dict:
+    """
+    Runs every benchmark over a synthetic universe of tickers x bars that is built within a temporary directory, so
+    nothing touches the network or the real caches.
+
+    :param output: a json file the report is written to (None to only return it)
+    :return: a report of the configuration, the environment and the timings of every benchmark
+    """
+    report = {"config": {"tickers": tickers, "bars": bars, "interval": interval, "store": store, "repeat": repeat,
+                         "processes": processes, "strategies": [strategy.__name__ for strategy in strategies]},
+              "environment": {"python": sys.version.split()[0], "platform": platform.platform(),
+                              "numpy": np.__version__, "pandas": pd.__version__, "timestamp": time.time()}}
+
+    indicators.cache.clear()
+    with tempfile.TemporaryDirectory() as root:
+        synthetic_universe(root, tickers, bars, interval, store)
+        with working_directory(root):
+            report["universe"] = bench_universe(list(strategies), store, repeat)
+            report["back_test"] = bench_back_test(strategies, store, processes=processes)
+    report["indicators"] = bench_indicators(bars, repeat)
+    report["first_derivative_obv"] = bench_first_derivative_obv(bars, repeat)
+    report["indicator_backends"] = bench_indicator_backends(bars, repeat)
+    report["vector_backtest"] = bench_vector_backtest(strategies, bars, repeat)
+    report["compact"] = bench_compact(tickers, bars)
+    report["streaming"] = bench_streaming(tickers)
+    report["resample"] = bench_resample(bars, repeat=repeat)
+    report["walk_forward"] = bench_walk_forward(bars=bars, train=bars // 5, test=bars // 10)
+    report["quality"] = bench_quality(bars, repeat=repeat)
+    report["portfolio"] = bench_portfolio(tickers, bars)
+    report["startup"] = bench_startup(repeat=repeat)
+
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks QuantStocks over a synthetic universe")
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--interval", default="5min")
+    parser.add_argument("--store", default="pickle", choices=("pickle", "parquet", "memmap"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--output", help="the json file the report is written to")
+    args = parser.parse_args()
+
+    print(json.dumps(run_suite(args.tickers, args.bars, args.interval, args.store, repeat=args.repeat,
+                               processes=args.processes, output=args.output), indent=2))
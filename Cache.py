@@ -0,0 +1,238 @@
+import os
+import sys
+import pickle
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+def sizeof(value) -> int:
+    """
+    :return: the approximate number of bytes a cached value holds on to
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(sizeof(item) for item in value.values())
+    if hasattr(value, "nbytes"):
+        # e.g. Compact.CompactBars
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    A least recently used cache that is bounded by both the number of items and the number of bytes it holds. When
+    either bound is exceeded, the least recently used items are evicted first.
+    """
+
+    def __init__(self, max_items: int = None, max_bytes: int = None):
+        """
+        :param max_items: the maximum number of items (None for no limit)
+        :param max_bytes: the maximum number of bytes (None for no limit)
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key, value):
+        """
+        Adds the value to the cache. A value that is larger than max_bytes on its own is not cached at all.
+        """
+        size = sizeof(value)
+        with self._lock:
+            self._discard(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self._items[key] = (value, size)
+            self.nbytes += size
+            while ((self.max_items is not None and len(self._items) > self.max_items)
+                   or (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+                self._discard(next(iter(self._items)))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            value = self._items[key][0]
+            self._discard(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "items": len(self._items), "bytes": self.nbytes}
+
+    def _discard(self, key):
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+
+
+def _update_digest(digest, value):
+    if isinstance(value, pd.Series):
+        digest.update(b"series")
+        _update_digest(digest, value.to_numpy())
+        _update_digest(digest, value.index.to_numpy())
+    elif isinstance(value, pd.Index):
+        digest.update(b"index")
+        _update_digest(digest, value.to_numpy())
+    elif isinstance(value, np.ndarray):
+        if value.dtype == object:
+            value = pd.util.hash_pandas_object(pd.Series(value, copy=False), index=False).to_numpy()
+        digest.update(f"{value.dtype}{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).view(np.uint8))
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update_digest(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f"dict{len(value)}".encode())
+        for key in sorted(value):
+            _update_digest(digest, key)
+            _update_digest(digest, value[key])
+    else:
+        digest.update(repr(value).encode())
+
+
+def fingerprint(value) -> str:
+    """
+    :return: a hash of the contents of the value (series, arrays, and nested lists, tuples and dicts of them)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update_digest(digest, value)
+    return digest.hexdigest()
+
+
+def _copy(value):
+    if isinstance(value, (pd.Series, pd.DataFrame, np.ndarray)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    return value
+
+
+class IndicatorCache:
+    """
+    Memoizes indicator functions. A result is keyed on the function, a fingerprint of the data it was computed from and
+    its parameters, so the same indicator over the same data is only computed once no matter which strategy (or run)
+    asks for it. Results are kept in an in-memory LRU cache and, when a directory is given, also on disk so that they
+    are shared between processes and runs.
+    """
+
+    def __init__(self, max_items: int = None, max_bytes: int = 256 * 2 ** 20, directory: str = None, enabled=True,
+                 salt=None):
+        """
+        :param max_items: the maximum number of results kept in memory (None for no limit)
+        :param max_bytes: the maximum number of bytes the results in memory can take up (None for no limit)
+        :param directory: the directory of the on-disk cache (None to only cache in memory)
+        :param enabled: whether results are cached at all
+        :param salt: a function whose return value is added to every key (for state that changes the results of the
+        functions without being one of their arguments)
+        """
+        self.memory = LRUCache(max_items, max_bytes)
+        self.directory = directory
+        self.enabled = enabled
+        self.salt = salt
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def configure(self, max_items: int = None, max_bytes: int = 256 * 2 ** 20, directory: str = None, enabled=True):
+        """
+        Changes the bounds and the on-disk directory of the cache. The results in memory are dropped.
+        """
+        self.memory = LRUCache(max_items, max_bytes)
+        self.directory = directory
+        self.enabled = enabled
+
+    def memoize(self, func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+
+            key = fingerprint((name, self.salt() if self.salt is not None else None, args, kwargs))
+            value = self.memory.get(key)
+            if value is not None:
+                self.hits += 1
+                return _copy(value)
+
+            value = self._read(key)
+            if value is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                value = func(*args, **kwargs)
+                self._write(key, value)
+
+            self.memory.put(key, value)
+            return _copy(value)
+
+        return wrapper
+
+    def clear(self):
+        self.memory.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.disk_hits + self.misses
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+                "items": len(self.memory), "bytes": self.memory.nbytes}
+
+    def _read(self, key: str):
+        if self.directory is None:
+            return None
+
+        path = f"{self.directory}/{key}.pkl"
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as file:
+            return pickle.load(file)
+
+    def _write(self, key: str, value):
+        if self.directory is None:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = f"{self.directory}/{key}.pkl"
+        # another process might be writing the same result, so the file is only renamed into place once it is complete
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
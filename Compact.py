@@ -0,0 +1,182 @@
+"""
+A compact in-memory representation of the bars of a ticker. Prices are float32 (or integers scaled by 10 ** decimals),
+volumes are the smallest unsigned integer type that holds them and the timestamps are int64 nanoseconds that are shared
+by every ticker with the same bars (see TimeGrid), which takes a 5 column float64 dataframe with a DatetimeIndex from
+48 bytes per bar down to 20-28 bytes per bar (plus the shared timestamps). The bars are turned back into a float64
+dataframe (see CompactBars.to_frame) only when a backtest needs one.
+"""
+import hashlib
+import weakref
+import numpy as np
+import pandas as pd
+
+PRICES = ("Open", "High", "Low", "Close")
+
+
+class TimeGrid:
+    """
+    Interns the timestamps of the tickers, tickers on the same interval grid (the same timestamps) share a single read
+    only array. An array is forgotten once no ticker uses it anymore.
+    """
+
+    def __init__(self):
+        self._arrays = weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        return len(self._arrays)
+
+    def intern(self, values: np.ndarray) -> np.ndarray:
+        """
+        :param values: int64 nanoseconds
+        :return: the shared array with the same timestamps
+        """
+        values = np.ascontiguousarray(values, dtype="int64")
+        key = (len(values), hashlib.blake2b(values.view(np.uint8), digest_size=16).digest())
+        existing = self._arrays.get(key)
+        if existing is not None and np.array_equal(existing, values):
+            return existing
+
+        values = values.copy()
+        values.setflags(write=False)
+        self._arrays[key] = values
+        return values
+
+
+# the grid that is shared by every ticker within this process
+grid = TimeGrid()
+
+
+def _volume_dtype(volume: np.ndarray):
+    """
+    :return: the smallest unsigned integer type that holds every volume, None when the volumes are not all whole
+    non-negative numbers (e.g. NaNs), in which case they stay as they are
+    """
+    if not len(volume):
+        return np.uint32
+    if not np.all(np.isfinite(volume)) or volume.min() < 0 or np.any(volume != np.floor(volume)):
+        return None
+    return np.uint32 if volume.max() <= np.iinfo(np.uint32).max else np.uint64
+
+
+class CompactBars:
+    """
+    The bars of a single ticker, see the module docstring.
+    """
+
+    def __init__(self, time: np.ndarray, prices: np.ndarray, scale, volume: np.ndarray, dtypes: dict, tz, index_name,
+                 extra: dict = None):
+        """
+        :param time: the timestamps as int64 nanoseconds (usually an array of a TimeGrid)
+        :param prices: a (bar x 4) array of the open, high, low and close prices
+        :param scale: the prices are divided by the scale when they are read (None for float prices)
+        :param volume: the volumes
+        :param dtypes: the dtypes of the columns of the original dataframe
+        :param tz: the timezone of the timestamps
+        :param index_name: the name of the index of the original dataframe
+        :param extra: any other columns of the original dataframe, as they are
+        """
+        self.time = time
+        self._prices = prices
+        self.scale = scale
+        self.volume = volume
+        self.dtypes = dtypes
+        self.tz = tz
+        self.index_name = index_name
+        self.extra = extra or {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, prices="float32", decimals: int = 4, rtol: float = 1e-6,
+                   time_grid: TimeGrid = grid):
+        """
+        :param df: a dataframe of bars with a DatetimeIndex
+        :param prices: float32 or scaled (integers in units of 10 ** -decimals)
+        :param decimals: the number of decimals that are kept by scaled prices
+        :param rtol: the largest relative error of a price that is accepted
+        :param time_grid: the grid the timestamps are interned in
+        :return: the compact bars of the dataframe
+        :raises ValueError: when a price can not be represented within rtol (e.g. a sub-penny price with scaled prices)
+        """
+        index = pd.DatetimeIndex(df.index)
+        time = time_grid.intern(index.values.astype("datetime64[ns]").view("int64"))
+        original = df[list(PRICES)].to_numpy(dtype=float)
+
+        if prices == "float32":
+            compact, scale = original.astype(np.float32), None
+        elif prices == "scaled":
+            scale = 10 ** decimals
+            scaled = np.round(original * scale)
+            limit = np.iinfo(np.int32).max
+            dtype = np.int32 if np.nanmax(np.abs(scaled), initial=0) < limit else np.int64
+            # NaN prices are kept as the smallest integer
+            compact = np.where(np.isnan(scaled), np.iinfo(dtype).min, scaled).astype(dtype)
+        else:
+            raise ValueError(f"unknown prices {prices!r}, expected float32 or scaled")
+
+        bars = cls(time, compact, scale, None, {column: df[column].dtype for column in df.columns}, index.tz,
+                   df.index.name)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            error = np.abs(bars.prices() - original) / np.abs(original)
+        error = error[np.isfinite(error)]
+        if len(error) and error.max() > rtol:
+            raise ValueError(f"{prices} prices have a relative error of {error.max():.2e}, more than {rtol:.2e}")
+
+        volume = df["Volume"].to_numpy()
+        dtype = _volume_dtype(volume.astype(float))
+        bars.volume = volume.astype(dtype) if dtype is not None else volume
+        bars.extra = {column: df[column].to_numpy() for column in df.columns if column not in (*PRICES, "Volume")}
+        return bars
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.time.nbytes + self._prices.nbytes + self.volume.nbytes
+                + sum(values.nbytes for values in self.extra.values()))
+
+    def prices(self, column: str = None) -> np.ndarray:
+        """
+        :param column: Open, High, Low or Close (None for a (bar x 4) array of all of them)
+        :return: the prices as float64
+        """
+        values = self._prices if column is None else self._prices[:, PRICES.index(column)]
+        if self.scale is None:
+            return values.astype(float)
+
+        result = values.astype(float) / self.scale
+        result[values == np.iinfo(values.dtype).min] = np.nan
+        return result
+
+    def index(self) -> pd.DatetimeIndex:
+        index = pd.DatetimeIndex(self.time.view("datetime64[ns]"), name=self.index_name)
+        return index.tz_localize("UTC").tz_convert(self.tz) if self.tz is not None else index
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        :return: the bars as a dataframe with the columns, dtypes and index of the original dataframe
+        """
+        columns = dict(zip(PRICES, self.prices().T))
+        columns["Volume"] = self.volume
+        columns.update(self.extra)
+        df = pd.DataFrame(columns, index=self.index())
+        return df[list(self.dtypes)].astype(self.dtypes)
+
+
+def compact(df: pd.DataFrame, prices="float32", decimals: int = 4, rtol: float = 1e-6):
+    """
+    :return: the compact bars of the dataframe, or the dataframe itself when it can not be represented within rtol
+    """
+    if prices not in ("float32", "scaled"):
+        raise ValueError(f"unknown prices {prices!r}, expected float32 or scaled")
+    try:
+        return CompactBars.from_frame(df, prices, decimals, rtol)
+    except ValueError:
+        return df
+
+
+def expand(bars) -> pd.DataFrame:
+    """
+    :param bars: either CompactBars or a dataframe
+    :return: the bars as a dataframe
+    """
+    return bars.to_frame() if isinstance(bars, CompactBars) else bars
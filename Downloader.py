@@ -0,0 +1,179 @@
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+# frames is a dict of ticker -> dataframe, failures is a dict of ticker -> reason the ticker could not be downloaded
+DownloadResult = namedtuple("DownloadResult", ["frames", "failures"])
+
+# the failure reason of a ticker for which the source did not return any bars (without raising an error)
+NO_DATA = "no data returned"
+
+
+def yfinance_source(tickers: list, period: str = "30d", interval: str = "15m", start=None) -> dict:
+    """
+    The default data source. A whole batch of tickers is fetched with a single multi-ticker yf.download call.
+
+    :param tickers: a list of tickers
+    :param period: 60d is the maximum for intraday intervals (ignored when start is given)
+    :param interval: 5m, 15m, 30m, 1h, 1d, and so on
+    :param start: only download the bars from this timestamp onwards
+    :return: a dict of ticker -> dataframe, tickers that yfinance could not find are left out
+    """
+    # yfinance is only imported once it is needed, it takes a while to import
+    import yfinance as yf
+
+    if start is not None:
+        df = yf.download(tickers=tickers, start=start, interval=interval, group_by="ticker", threads=False,
+                         progress=False)
+    else:
+        df = yf.download(tickers=tickers, period=period, interval=interval, group_by="ticker", threads=False,
+                         progress=False)
+
+    frames = {}
+    for ticker in tickers:
+        if isinstance(df.columns, pd.MultiIndex):
+            if ticker not in df.columns.get_level_values(0):
+                continue
+            frame = df[ticker]
+        else:
+            frame = df
+
+        # a multi-ticker download outer joins the index, so the bars of other tickers show up as empty rows
+        frame = frame.drop(columns=["Adj Close"], errors="ignore").dropna(how="all")
+        if not frame.empty:
+            frames[ticker] = frame
+    return frames
+
+
+def frame_source(frames: dict, fail: set = ()):
+    """
+    A local data source that serves dataframes from memory instead of the network. It is meant for testing and
+    benchmarking the downloader.
+
+    :param frames: a dict of ticker -> dataframe
+    :param fail: tickers that will raise an error every time they are requested
+    :return: a source function with the same signature as yfinance_source
+    """
+    def source(tickers: list, period: str = "30d", interval: str = "15m", start=None) -> dict:
+        for ticker in tickers:
+            if ticker in fail:
+                raise ConnectionError(f"failed to download {ticker}")
+
+        result = {}
+        for ticker in tickers:
+            if ticker not in frames:
+                continue
+            df = frames[ticker]
+            if start is not None:
+                df = df[df.index >= start]
+            result[ticker] = df.copy()
+        return result
+
+    return source
+
+
+class RateLimiter:
+    """
+    Spaces out calls to a data source so that at most `calls_per_second` calls are made, no matter how many threads
+    are sharing the limiter.
+    """
+
+    def __init__(self, calls_per_second: float = 2.0):
+        self._interval = 1 / calls_per_second if calls_per_second else 0.0
+        self._next_call = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_call - now
+            self._next_call = max(now, self._next_call) + self._interval
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Downloader:
+    """
+    Downloads many tickers at once. The tickers are split into batches, every batch is a single call to the data source
+    and the batches are fetched concurrently on a bounded thread pool.
+    """
+
+    def __init__(self, source=yfinance_source, batch_size=50, max_workers=4, rate_limit=2.0, retries=3, backoff=1.0):
+        """
+        :param source: a function (tickers, period, interval, start) -> dict of ticker -> dataframe
+        :param batch_size: the number of tickers requested per call to the source
+        :param max_workers: the maximum number of concurrent connections to the source
+        :param rate_limit: the maximum number of calls per second made to the source (0 disables the limit)
+        :param retries: how many times a batch is retried when it fails or comes back incomplete
+        :param backoff: the delay (in seconds) before the first retry, doubled after every retry
+        """
+        self.source = source
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self._rate_limiter = RateLimiter(rate_limit)
+
+    def download(self, tickers: list, period: str = "30d", interval: str = "15m", start=None) -> DownloadResult:
+        """
+        :param tickers: a list of tickers
+        :param period: 60d is the maximum for intraday intervals
+        :param interval: 5m, 15m, 30m, 1h, 1d, and so on
+        :param start: only download the bars from this timestamp onwards
+        :return: a DownloadResult of the frames that were downloaded and the tickers that failed
+        """
+        frames = {}
+        failures = {}
+        if not tickers:
+            return DownloadResult(frames, failures)
+
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._download_batch, batch, period, interval, start) for batch in batches]
+            for future in futures:
+                batch_frames, batch_failures = future.result()
+                frames.update(batch_frames)
+                failures.update(batch_failures)
+
+        return DownloadResult(frames, failures)
+
+    def _download_batch(self, batch: list, period: str, interval: str, start) -> tuple:
+        """
+        Downloads a single batch, retrying the tickers that are still missing with an exponential backoff.
+
+        :return: a tuple of (frames, failures)
+        """
+        frames = {}
+        pending = list(batch)
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            self._rate_limiter.wait()
+            try:
+                frames.update(self.source(pending, period=period, interval=interval, start=start))
+            except Exception as e:
+                error = e
+                # a single bad ticker can fail the whole batch, so the tickers are retried one by one from now on
+                if len(pending) > 1:
+                    return self._download_individually(pending, frames, period, interval, start)
+                continue
+
+            pending = [ticker for ticker in pending if ticker not in frames]
+            if not pending:
+                break
+
+        reason = repr(error) if error is not None else NO_DATA
+        return frames, {ticker: reason for ticker in pending}
+
+    def _download_individually(self, pending: list, frames: dict, period: str, interval: str, start) -> tuple:
+        failures = {}
+        for ticker in pending:
+            ticker_frames, ticker_failures = self._download_batch([ticker], period, interval, start)
+            frames.update(ticker_frames)
+            failures.update(ticker_failures)
+        return frames, failures
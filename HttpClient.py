@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/92.0.4515.107 Safari/537.36')
+
+
+class HttpClient:
+    """
+    A pooled keep-alive session that every outbound request goes through. Connections are reused between requests,
+    every request has a timeout, and connection errors and 429/5xx responses are retried with an exponential backoff.
+    """
+
+    def __init__(self, timeout: float = 10, retries: int = 3, backoff: float = 0.5, pool_size: int = 10,
+                 headers: dict = None):
+        """
+        :param timeout: the number of seconds to wait for the server (connect and read)
+        :param retries: the number of times a failed request is retried
+        :param backoff: the backoff factor between retries (0.5 waits 0.5s, 1s, 2s, ...)
+        :param pool_size: the maximum number of connections kept alive per host
+        :param headers: headers that are sent with every request (on top of the browser User-Agent)
+        """
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT, **(headers or {})})
+
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+
+
+def default_client() -> HttpClient:
+    """
+    :return: the client that is shared by everything that is not given a client of its own
+    """
+    global _default_client
+    if _default_client is None:
+        _default_client = HttpClient()
+    return _default_client
+
+
+def gather(*calls) -> list:
+    """
+    Runs blocking calls concurrently from synchronous code.
+
+    :param calls: functions without any arguments
+    :return: the results in the same order as the calls, a call that raised returns its exception instead
+    """
+    def run(call):
+        try:
+            return call()
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, len(calls))) as executor:
+        return list(executor.map(run, calls))
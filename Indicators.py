@@ -1,19 +1,58 @@
+import numpy as np
 import pandas as pd
 from ta.trend import EMAIndicator
 from ta.volatility import AverageTrueRange, BollingerBands
 from ta.momentum import RSIIndicator
 from ta.volume import OnBalanceVolumeIndicator, VolumeWeightedAveragePrice
+import NumpyIndicators as np_indicators
+from Cache import IndicatorCache
 
+# the indicators are either computed by the ta module or directly on numpy arrays (NumpyIndicators), see set_backend
+backend = "ta"
 
+# every indicator is memoized on its data and parameters, use cache.configure to bound it or to add an on-disk tier
+cache = IndicatorCache(salt=lambda: backend)
+
+
+def set_backend(name: str):
+    """
+    :param name: ta or numpy (the numpy backend falls back to ta when fillna is True)
+    """
+    global backend
+    if name not in ("ta", "numpy"):
+        raise ValueError(f"unknown backend {name!r}, expected ta or numpy")
+    backend = name
+
+
+def _use_numpy(fillna) -> bool:
+    return backend == "numpy" and not fillna
+
+
+def _values(series: pd.Series) -> np.ndarray:
+    return series.to_numpy(dtype=float)
+
+
+@cache.memoize
 def ema(series: pd.Series, periods=14, fillna=False):
+    if _use_numpy(fillna):
+        return pd.Series(np_indicators.ema(_values(series), periods), index=series.index)
     return EMAIndicator(series, periods, fillna).ema_indicator()
 
 
+@cache.memoize
 def atr(close: pd.Series, low: pd.Series, high: pd.Series, periods=14, fillna=False):
-    return AverageTrueRange(close=close, high=high, low=low, window=periods, fillna=fillna)
+    if _use_numpy(fillna):
+        return pd.Series(np_indicators.atr(_values(close), _values(low), _values(high), periods), index=close.index,
+                         name="atr")
+    return AverageTrueRange(close=close, high=high, low=low, window=periods, fillna=fillna).average_true_range()
 
 
+@cache.memoize
 def bollinger_bands(close: pd.Series, periods=20, std=2, fillna=False):
+    if _use_numpy(fillna):
+        return {name: pd.Series(values, index=close.index)
+                for name, values in np_indicators.bollinger_bands(_values(close), periods, std).items()}
+
     bands = BollingerBands(close, periods, std, fillna)
 
     d_bands = {"HighBands": bands.bollinger_hband(), "LowBands": bands.bollinger_lband(),
@@ -23,41 +62,51 @@ def bollinger_bands(close: pd.Series, periods=20, std=2, fillna=False):
     return d_bands
 
 
+@cache.memoize
 def rsi(close: pd.Series, periods=14, fillna=False):
+    if _use_numpy(fillna):
+        return pd.Series(np_indicators.rsi(_values(close), periods), index=close.index)
     return RSIIndicator(close, periods, fillna).rsi()
 
 
+@cache.memoize
 def obv(close: pd.Series, volume: pd.Series, fillna=False):
+    if _use_numpy(fillna):
+        return pd.Series(np_indicators.obv(_values(close), _values(volume)), index=close.index)
     return OnBalanceVolumeIndicator(close, volume, fillna).on_balance_volume()
 
 
+@cache.memoize
 def vwap(high: pd.Series, low: pd.Series, close: pd.Series, volume: pd.Series, period=14, fillna=False):
+    if _use_numpy(fillna):
+        return pd.Series(np_indicators.vwap(_values(high), _values(low), _values(close), _values(volume), period),
+                         index=close.index)
     return VolumeWeightedAveragePrice(high=high, low=low,
                                       close=close, volume=volume,
                                       window=period, fillna=fillna).volume_weighted_average_price()
 
 
-def first_derivative_obv(close: pd.Series, volume: pd.Series, time: pd.Series, fillna=False):
-    c_obv = obv(close, volume)
-    first_derivatives = []
-
-    for index in range(len(c_obv)):
-        if index == 0:
-            first_derivatives.append(0)
-            continue
-        current_obv = c_obv[index]
-        current_time = time[index]
-
-        previous_obv = c_obv[index - 1]
-        previous_time = time[index - 1]
+@cache.memoize
+def first_derivative_obv(close: pd.Series, volume: pd.Series, time: pd.Series, fillna=False, order=1):
+    """
+    The rate of change of the OBV per millisecond, (obv[i] - obv[i - 1]) / (time[i] - time[i - 1]).
 
-        delta_obv = current_obv - previous_obv
-        delta_time = (current_time - previous_time).total_seconds() * 1000  # delta time will be in milliseconds
+    :param close: the closing prices
+    :param volume: the volumes
+    :param time: the timestamps of the bars
+    :param order: the order of the derivative (2 is the rate of change of the first derivative and so on)
+    :return: a series (with a range index) where the first `order` values are 0
+    """
+    c_obv = obv(close, volume).to_numpy(dtype=float)
 
-        derivative = delta_obv / delta_time
+    # delta time will be in milliseconds
+    delta_time = np.diff(pd.DatetimeIndex(time).values) / np.timedelta64(1, "ms")
 
-        first_derivatives.append(derivative)
+    derivatives = c_obv
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for n in range(order):
+            derivatives = np.diff(derivatives) / delta_time[n:]
 
-    ser = pd.Series(first_derivatives, copy=False)
+    ser = pd.Series(np.concatenate([np.zeros(min(order, len(c_obv))), derivatives]), copy=False)
 
     return ser
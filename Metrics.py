@@ -0,0 +1,170 @@
+import io
+import sys
+import time
+import pstats
+import threading
+import cProfile
+from contextlib import contextmanager
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # resource is not available on windows
+    resource = None
+
+
+def peak_memory() -> dict:
+    """
+    :return: the peak resident memory (in bytes) of this process and of its (finished) worker processes, None when
+    the platform does not report it
+    """
+    if resource is None:
+        return {"self": None, "children": None}
+
+    # linux reports kilobytes, macos reports bytes
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale}
+
+
+class Metrics:
+    """
+    The wall time of every stage of a sweep (screening, downloading, loading, computing indicators, backtesting, ...)
+    in total and per ticker, along with counters such as the number of bytes read. The metrics recorded within a
+    worker process are captured by the job (see capture) and merged back into the metrics of the parent process.
+    Updates are guarded by a lock, as the job generators of a pool record metrics from the pool's task handler thread
+    while the main thread merges the metrics of the finished jobs.
+    """
+
+    def __init__(self):
+        # stage -> [number of calls, seconds]
+        self.stages = {}
+        # ticker -> stage -> seconds
+        self.tickers = {}
+        # counter -> value
+        self.counters = {}
+        self.enabled = True
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        # the captured metrics of a job are sent back from the worker processes, a lock can not be pickled
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def stage(self, name: str, ticker: str = None):
+        """
+        Times the body of the with statement as the stage (of the ticker).
+        """
+        if not self.enabled:
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started, ticker)
+
+    def add_time(self, name: str, seconds: float, ticker: str = None, calls: int = 1):
+        with self._lock:
+            stage = self.stages.setdefault(name, [0, 0.0])
+            stage[0] += calls
+            stage[1] += seconds
+            if ticker is not None:
+                timings = self.tickers.setdefault(ticker, {})
+                timings[name] = timings.get(name, 0.0) + seconds
+
+    def count(self, name: str, value=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def seconds(self, name: str) -> float:
+        return self.stages.get(name, [0, 0.0])[1]
+
+    @contextmanager
+    def capture(self):
+        """
+        Records the metrics of the body of the with statement into a new Metrics (that is yielded) instead of into this
+        one. A job that runs within a worker process returns the captured metrics, which are merged into the metrics of
+        the parent process.
+        """
+        captured = Metrics()
+        captured.enabled = self.enabled
+        with self._lock:
+            stages, tickers, counters = self.stages, self.tickers, self.counters
+            self.stages, self.tickers, self.counters = captured.stages, captured.tickers, captured.counters
+        try:
+            yield captured
+        finally:
+            with self._lock:
+                self.stages, self.tickers, self.counters = stages, tickers, counters
+
+    def merge(self, other):
+        with self._lock:
+            for name, (calls, seconds) in other.stages.items():
+                self.add_time(name, seconds, calls=calls)
+            for ticker, timings in other.tickers.items():
+                for name, seconds in timings.items():
+                    self.tickers.setdefault(ticker, {})
+                    self.tickers[ticker][name] = self.tickers[ticker].get(name, 0.0) + seconds
+            for name, value in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.stages, self.tickers, self.counters = {}, {}, {}
+
+    def report(self, caches: dict = None) -> dict:
+        """
+        :param caches: a dict of name -> cache whose stats (hits, misses, hit rate, ...) are part of the report
+        :return: a dict of the stages (calls and seconds), the counters, the stats of the caches and the peak memory
+        """
+        with self._lock:
+            stages = {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in self.stages.items()}
+            counters = dict(self.counters)
+        return {"stages": stages, "counters": counters,
+                "caches": {name: cache.stats() for name, cache in (caches or {}).items()},
+                "peak_memory": peak_memory()}
+
+    def ticker_report(self) -> pd.DataFrame:
+        """
+        :return: a dataframe of the seconds every ticker (rows) spent within every stage (columns)
+        """
+        with self._lock:
+            tickers = {ticker: dict(timings) for ticker, timings in self.tickers.items()}
+        return pd.DataFrame.from_dict(tickers, orient="index").fillna(0.0)
+
+
+# the metrics of everything that runs within this process
+metrics = Metrics()
+
+
+@contextmanager
+def profile(path: str = None, sort: str = "cumulative", limit: int = 30):
+    """
+    Profiles the body of the with statement with cProfile. The yielded dict holds the hot paths (the top `limit`
+    functions sorted by `sort`) as text once the body is done.
+
+    :param path: a file the raw profile is dumped to (it can be opened with pstats or snakeviz)
+    :param sort: the pstats sort key
+    :param limit: the number of functions within the text
+    """
+    profiler = cProfile.Profile()
+    result = {}
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        if path is not None:
+            profiler.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats(sort).print_stats(limit)
+        result["hot_paths"] = text.getvalue()
@@ -0,0 +1,163 @@
+"""
+The indicators of Indicators.py computed directly on numpy arrays. Every function takes either 1-D arrays (bars) or 2-D
+arrays (bars x tickers) and returns arrays of the same shape, the values match the ta implementations (with
+fillna=False). The inputs are expected to be free of NaNs, other than NaNs that pad the end of a column.
+"""
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _as_2d(values) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    return values.reshape(len(values), -1)
+
+
+def _ewm(values: np.ndarray, alpha: float, initial: np.ndarray = None) -> np.ndarray:
+    """
+    The recursive (adjust=False) exponential moving average y[i] = alpha * x[i] + (1 - alpha) * y[i - 1] of every
+    column. Instead of stepping through the bars one at a time, the recursion is solved in closed form over blocks of
+    bars, the block size is picked so that the decay factors stay well within the range of a float.
+
+    :param values: a 2-D array
+    :param alpha: the smoothing factor
+    :param initial: the value before the first row (the first row is used as is when it is not given)
+    :return: a 2-D array of the moving averages
+    """
+    result = np.empty_like(values)
+    if not len(values):
+        return result
+
+    if initial is None:
+        result[0] = values[0]
+        carry, start = values[0], 1
+    else:
+        carry, start = initial, 0
+
+    decay = 1 - alpha
+    if decay <= 0:
+        result[start:] = values[start:]
+        return result
+
+    block = int(min(4096, max(1, 100 * math.log(10) / -math.log(decay))))
+    steps = np.arange(block)
+    powers = decay ** steps
+    inverse_powers = decay ** -steps.astype(float)
+    for first in range(start, len(values), block):
+        chunk = values[first:first + block]
+        size = len(chunk)
+        sums = np.cumsum(inverse_powers[:size, None] * chunk, axis=0)
+        result[first:first + size] = (decay * powers[:size, None]) * carry + alpha * powers[:size, None] * sums
+        carry = result[first + size - 1]
+    return result
+
+
+def _rolling(values: np.ndarray, periods: int, reduce) -> np.ndarray:
+    """
+    Applies `reduce` over a rolling window of every column, the first periods - 1 rows are NaN.
+    """
+    result = np.full_like(values, np.nan)
+    if len(values) >= periods:
+        result[periods - 1:] = reduce(sliding_window_view(values, periods, axis=0), axis=-1)
+    return result
+
+
+def sma(series, periods=14):
+    result = _rolling(_as_2d(series), periods, np.mean)
+    return result.reshape(np.shape(series))
+
+
+def ema(series, periods=14):
+    values = _as_2d(series)
+    result = _ewm(values, 2 / (periods + 1))
+    result[:periods - 1] = np.nan
+    return result.reshape(np.shape(series))
+
+
+def rsi(close, periods=14):
+    values = _as_2d(close)
+    diff = np.diff(values, axis=0, prepend=np.nan)
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+
+    ema_up = _ewm(up, 1 / periods)
+    ema_down = _ewm(down, 1 / periods)
+    ema_up[:periods - 1] = ema_down[:periods - 1] = np.nan
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.where(ema_down == 0, 100, 100 - (100 / (1 + ema_up / ema_down)))
+    return result.reshape(np.shape(close))
+
+
+def bollinger_bands(close, periods=20, std=2):
+    values = _as_2d(close)
+    middle = _rolling(values, periods, np.mean)
+    deviation = _rolling(values, periods, np.std)
+    high = middle + std * deviation
+    low = middle - std * deviation
+
+    shape = np.shape(close)
+    return {"HighBands": high.reshape(shape), "LowBands": low.reshape(shape), "MiddleBands": middle.reshape(shape),
+            "HighBands_I": np.where(values > high, 1.0, 0.0).reshape(shape),
+            "LowBands_I": np.where(values < low, 1.0, 0.0).reshape(shape)}
+
+
+def obv(close, volume):
+    values = _as_2d(close)
+    volumes = _as_2d(volume)
+    previous = np.vstack([np.full((1, values.shape[1]), np.nan), values[:-1]])
+    result = np.cumsum(np.where(values < previous, -volumes, volumes), axis=0)
+    return result.reshape(np.shape(close))
+
+
+def vwap(high, low, close, volume, period=14):
+    volumes = _as_2d(volume)
+    typical_price = (_as_2d(high) + _as_2d(low) + _as_2d(close)) / 3.0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = _rolling(typical_price * volumes, period, np.sum) / _rolling(volumes, period, np.sum)
+    return result.reshape(np.shape(close))
+
+
+def atr(close, low, high, periods=14):
+    closes = _as_2d(close)
+    previous = np.vstack([np.full((1, closes.shape[1]), np.nan), closes[:-1]])
+    highs, lows = _as_2d(high), _as_2d(low)
+    true_range = np.fmax(highs - lows, np.fmax(np.abs(highs - previous), np.abs(lows - previous)))
+
+    result = np.zeros_like(closes)
+    if len(closes) >= periods:
+        result[periods - 1] = true_range[:periods].mean(axis=0)
+        result[periods:] = _ewm(true_range[periods:], 1 / periods, initial=result[periods - 1])
+    return result.reshape(np.shape(close))
+
+
+def first_derivative_obv(close, volume, time, order=1):
+    """
+    :param time: the timestamps of the bars as datetime64 (or int64 nanoseconds), either a single column that is shared
+    by every ticker or one column per ticker
+    """
+    derivatives = _as_2d(obv(close, volume))
+    times = np.asarray(time)
+    if times.dtype.kind == "M":
+        times = times.astype("datetime64[ns]").view("int64")
+    delta_time = np.diff(times.reshape(len(times), -1), axis=0) / 1e6  # delta time will be in milliseconds
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for n in range(order):
+            derivatives = np.diff(derivatives, axis=0) / delta_time[n:]
+
+    padding = np.zeros((min(order, len(times)), derivatives.shape[1]))
+    return np.vstack([padding, derivatives]).reshape(np.shape(close))
+
+
+def crossover(series1, series2):
+    """
+    The vectorized backtesting.lib.crossover, True at the bars where series1 just crossed over series2 (it was below
+    series2 on the previous bar and is above it on this bar). Bars with a NaN on either side are never a crossover.
+    """
+    first, second = np.broadcast_arrays(np.asarray(series1, dtype=float), np.asarray(series2, dtype=float))
+    result = np.zeros(first.shape, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        result[1:] = (first[:-1] < second[:-1]) & (first[1:] > second[1:])
+    return result
@@ -0,0 +1,249 @@
+import os
+import json
+import math
+import random
+import itertools
+from multiprocessing import Pool
+import pandas as pd
+from backtesting import Backtest
+
+
+def grid(**ranges) -> list:
+    """
+    :param ranges: parameter name -> list of values, e.g. grid(short_ema=[5, 9, 12], long_ema=[15, 20])
+    :return: every combination of the values as a list of dicts
+    """
+    names = list(ranges)
+    return [dict(zip(names, values)) for values in itertools.product(*ranges.values())]
+
+
+def random_search(n: int, seed=None, **ranges) -> list:
+    """
+    :param n: the number of combinations
+    :param seed: the seed of the sampling
+    :param ranges: parameter name -> list of values
+    :return: n distinct combinations sampled uniformly from the grid
+    """
+    combinations = grid(**ranges)
+    return random.Random(seed).sample(combinations, min(n, len(combinations)))
+
+
+def parameters(strategy) -> dict:
+    """
+    :return: the parameters of the strategy (its public class attributes that are numbers, strings or booleans) along
+    with their default values
+    """
+    result = {}
+    for name in dir(strategy):
+        value = getattr(strategy, name)
+        if not name.startswith("_") and isinstance(value, (bool, int, float, str)):
+            result[name] = value
+    return result
+
+
+def _evaluate(job):
+    """
+    Back tests a single ticker with every combination of parameters. This lives at module level so that it can be
+    pickled and sent to the worker processes of the pool.
+
+    :param job: a tuple of (ticker, dataframe, strategy, list of parameter dicts, stat to maximize)
+    :return: a tuple of (ticker, list of parameter dicts, list of (score, number of trades))
+    """
+    ticker, df, strategy, combinations, maximize = job
+    scores = []
+    for params in combinations:
+        bt = Backtest(df, strategy, commission=0, exclusive_orders=True, cash=100000)
+        stats = bt.run(**params)
+        scores.append((float(stats[maximize]), int(stats["# Trades"])))
+    return ticker, combinations, scores
+
+
+def _key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+def _mean_sem(values: list) -> tuple:
+    """
+    :return: the mean and the standard error of the mean of the values
+    """
+    if not values:
+        return math.nan, math.nan
+
+    mean = sum(values) / len(values)
+    if len(values) < 2:
+        return mean, math.inf
+    variance = sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+    return mean, math.sqrt(variance / len(values))
+
+
+class Optimizer:
+    """
+    Searches the parameters of a strategy over the tickers of a universe. The tickers are evaluated in rounds on a
+    process pool and after every round the combinations that are clearly dominated (the upper end of their confidence
+    interval is below the lower end of the best combination's) stop being evaluated. Every (combination, ticker) score
+    is appended to a results file, and scores that are already within the file are never evaluated again.
+    """
+
+    def __init__(self, universe, strategy, maximize="Win Rate [%]", results_path=None, processes=None, chunksize=1,
+                 round_size=50, min_tickers=10, z=2.0):
+        """
+        :param universe: the universe whose tickers are back tested
+        :param strategy: the strategy class, its parameters must be class attributes
+        :param maximize: the stat (of the stats returned by Backtest.run) that is maximized
+        :param results_path: the json lines file the scores are persisted to (None to not persist them)
+        :param processes: the number of worker processes (defaults to the number of cores); 1 runs in this process
+        :param chunksize: the number of jobs that are sent to a worker at a time
+        :param round_size: the number of tickers evaluated before dominated combinations are dropped
+        :param min_tickers: the minimum number of scores a combination needs before it can be dropped
+        :param z: the width (in standard errors) of the confidence intervals used to drop combinations
+        """
+        self.universe = universe
+        self.strategy = strategy
+        self.maximize = maximize
+        self.results_path = results_path
+        self.processes = processes
+        self.chunksize = chunksize
+        self.round_size = round_size
+        self.min_tickers = min_tickers
+        self.z = z
+        self.results = self._read_results()
+
+    def run(self, combinations: list) -> pd.DataFrame:
+        """
+        :param combinations: a list of parameter dicts (see grid and random_search)
+        :return: a dataframe with a row per combination of its parameters, mean score, standard error, number of
+        tickers with a score, number of trades and the round it was dropped in (NaN if it was never dropped), sorted by
+        the mean score
+        """
+        for params in combinations:
+            for name in params:
+                if not hasattr(self.strategy, name):
+                    raise AttributeError(f"{self.strategy.__name__} has no parameter {name!r}")
+
+        active = {_key(params): params for params in combinations}
+        # the scores are persisted under every parameter of the strategy (the defaults the combination does not
+        # override included), so that a change of a default is evaluated again
+        defaults = parameters(self.strategy)
+        resolved = {key: _key({**defaults, **params}) for key, params in active.items()}
+        scores = {key: [] for key in active}
+        trades = {key: 0 for key in active}
+        eliminated = {}
+
+        tickers = list(self.universe.tickers)
+        last_bars = self._last_bars(tickers)
+        # a single pool serves every round
+        pool = Pool(self.processes) if self.processes != 1 else None
+        try:
+            for round_number, first in enumerate(range(0, len(tickers), self.round_size)):
+                jobs = []
+                for ticker in tickers[first:first + self.round_size]:
+                    todo = []
+                    for key, params in active.items():
+                        result = self.results.get(self._result_key(ticker, last_bars[ticker], resolved[key]))
+                        if result is not None:
+                            self._record(scores, trades, key, result)
+                        else:
+                            todo.append(params)
+
+                    if todo:
+                        jobs.append((ticker, todo))
+
+                for ticker, combos, results in self._map(jobs, pool):
+                    for params, result in zip(combos, results):
+                        key = _key(params)
+                        self._record(scores, trades, key, result)
+                        self._write_result(self._result_key(ticker, last_bars[ticker], resolved[key]), result)
+
+                for key in self._dominated(active, scores):
+                    del active[key]
+                    eliminated[key] = round_number
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        rows = []
+        for key in scores:
+            values = [score for score in scores[key] if not math.isnan(score)]
+            mean, sem = _mean_sem(values)
+            rows.append({**json.loads(key), "mean": mean, "sem": sem, "tickers": len(values), "trades": trades[key],
+                         "eliminated": eliminated.get(key, math.nan)})
+        return pd.DataFrame(rows).sort_values("mean", ascending=False).reset_index(drop=True)
+
+    def _map(self, jobs: list, pool=None):
+        def generate():
+            for ticker, combos in jobs:
+                # the bars were cleaned when they were downloaded (see Quality)
+                df = self.universe.tickers[ticker]
+                if not df.empty:
+                    yield ticker, df, self.strategy, combos, self.maximize
+
+        if pool is None:
+            yield from map(_evaluate, generate())
+            return
+
+        yield from pool.imap_unordered(_evaluate, generate(), self.chunksize)
+
+    def _dominated(self, active: dict, scores: dict) -> list:
+        summary = {}
+        for key in active:
+            values = [score for score in scores[key] if not math.isnan(score)]
+            if len(values) >= self.min_tickers:
+                summary[key] = _mean_sem(values)
+
+        if len(summary) < 2:
+            return []
+
+        best_mean, best_sem = max(summary.values(), key=lambda mean_sem: mean_sem[0])
+        return [key for key, (mean, sem) in summary.items()
+                if mean + self.z * sem < best_mean - self.z * best_sem]
+
+    @staticmethod
+    def _record(scores: dict, trades: dict, key: str, result):
+        score, number_of_trades = result
+        scores[key].append(score)
+        trades[key] += number_of_trades
+
+    def _last_bars(self, tickers: list) -> dict:
+        """
+        :return: a dict of ticker -> the timestamp of its last bar, the freshness metadata the stores do not have yet is
+        backfilled once for all of the tickers of a store instead of a ticker at a time
+        """
+        sources = self.universe.tickers.sources
+        by_store = {}
+        for ticker in tickers:
+            store = sources[ticker]
+            # a resampled store reads the last bar of its base store
+            by_store.setdefault(getattr(store, "base", store), []).append(ticker)
+        for store, symbols in by_store.items():
+            store.backfill_freshness(symbols)
+        return {ticker: str(sources[ticker].last_timestamp(ticker)) for ticker in tickers}
+
+    def _result_key(self, ticker: str, last_bar: str, params: str) -> str:
+        # the last bar of the ticker is part of the key so that refreshed data is evaluated again, and the stat that is
+        # maximized so that a run that maximizes another stat does not reuse the scores
+        return json.dumps([self.strategy.__name__, self.maximize, params, ticker, self.universe.interval, last_bar])
+
+    def _read_results(self) -> dict:
+        results = {}
+        if self.results_path is None or not os.path.isfile(self.results_path):
+            return results
+
+        with open(self.results_path, "r", encoding="utf-8") as file:
+            for line in file:
+                # the last line might be incomplete if a previous run was interrupted
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                results[record["key"]] = (record["score"], record["trades"])
+        return results
+
+    def _write_result(self, key: str, result):
+        self.results[key] = result
+        if self.results_path is None:
+            return
+
+        with open(self.results_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps({"key": key, "score": result[0], "trades": result[1]}) + "\n")
+
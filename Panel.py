@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+
+
+def align(frames: dict, column: str = "Close") -> pd.DataFrame:
+    """
+    :param frames: a dict of ticker -> dataframe
+    :param column: the column of the dataframes that is aligned
+    :return: a (time x ticker) dataframe over the union of all of the timestamps, bars that a ticker does not have are
+    NaN
+    """
+    return pd.DataFrame({ticker: df[column] for ticker, df in frames.items()})
+
+
+class BarPanel:
+    """
+    The bars of many tickers stacked into (bar x ticker) arrays so that an indicator can be computed for every ticker
+    in a single vectorized pass. Each column holds the bars of one ticker in order and shorter tickers are padded with
+    NaN at the end, which keeps the indicators of every column exactly the same as the ones computed on the ticker by
+    itself (the indicators only ever look back in time).
+    """
+
+    def __init__(self, frames: dict, columns=COLUMNS):
+        """
+        :param frames: a dict of ticker -> dataframe
+        :param columns: the columns that are stacked
+        """
+        self.tickers = list(frames)
+        self.lengths = np.array([len(df) for df in frames.values()], dtype=int)
+        self.indexes = {ticker: df.index for ticker, df in frames.items()}
+        self.positions = {ticker: position for position, ticker in enumerate(self.tickers)}
+
+        rows = int(self.lengths.max()) if len(self.lengths) else 0
+        self._columns = {column: np.full((rows, len(self.tickers)), np.nan) for column in columns}
+        # the timestamps as nanoseconds since the epoch, the padding is NaT
+        self.time = np.full((rows, len(self.tickers)), np.iinfo("int64").min, dtype="int64")
+        for position, df in enumerate(frames.values()):
+            for column in columns:
+                self._columns[column][:len(df), position] = df[column].to_numpy(dtype=float)
+            self.time[:len(df), position] = pd.DatetimeIndex(df.index).values.astype("datetime64[ns]").view("int64")
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self._columns[column]
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def slice(self, values: np.ndarray, ticker: str) -> np.ndarray:
+        """
+        :param values: a (bar x ticker) array that was computed over the panel
+        :param ticker: the ticker
+        :return: the values of the ticker (without the padding)
+        """
+        position = self.positions[ticker]
+        return np.ascontiguousarray(values[:self.lengths[position], position])
+
+    def series(self, values: np.ndarray, ticker: str) -> pd.Series:
+        """
+        :return: the values of the ticker as a series over the ticker's own index
+        """
+        return pd.Series(self.slice(values, ticker), index=self.indexes[ticker])
+
+    def slices(self, values: dict, ticker: str) -> dict:
+        """
+        :param values: a dict of name -> (bar x ticker) array
+        :return: a dict of name -> values of the ticker
+        """
+        return {name: self.slice(array, ticker) for name, array in values.items()}
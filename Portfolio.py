@@ -0,0 +1,207 @@
+"""
+A portfolio backtester: every ticker of the universe trades out of a single pool of cash. The bars of every ticker are
+placed onto one shared time index and the simulation steps through it a timestamp at a time, every step acts on all
+of the tickers at once with numpy (there is no loop over the tickers). The signals are the ones of the vectorized
+backtester (see Strategies.UniverseStrategy.signals) and follow the same rules:
+
+* an order placed on a bar is filled at the open of the ticker's next bar
+* a buy (sell) closes the open position of the ticker and opens a long (short) position
+* a position is closed by a close signal or when its profit/loss reaches the take profit or the stop loss
+
+on top of which the capital is allocated under constraints: at most max_positions positions are held at a time, a
+position takes at most max_weight of the equity, and when there are more entries than free positions the entries
+with the highest score (the momentum of the ticker by default) are filled first. The positions that are still open at
+the end are closed at the last close of their ticker.
+"""
+import sys
+import math
+import numpy as np
+import pandas as pd
+from Panel import BarPanel
+from VectorBacktest import warmup
+
+NAT = np.iinfo("int64").min
+
+
+def momentum(panel: BarPanel, values: dict, lookback: int = 20) -> np.ndarray:
+    """
+    The default score of an entry, the return of the ticker over the last lookback bars.
+
+    :return: a (bar x ticker) array of the scores
+    """
+    close = panel["Close"]
+    result = np.full(close.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result[lookback:] = close[lookback:] / close[:-lookback] - 1
+    return result
+
+
+def time_index(panel: BarPanel) -> tuple:
+    """
+    :return: a tuple of (the union of the timestamps (as int64 nanoseconds) of every ticker, a (bar x ticker) array of
+    the position of every bar within the union, -1 for the padding)
+    """
+    valid = panel.time != NAT
+    times = np.unique(panel.time[valid])
+    return times, np.where(valid, np.searchsorted(times, panel.time), -1)
+
+
+def scatter(values: np.ndarray, rows: np.ndarray, length: int, fill=np.nan) -> np.ndarray:
+    """
+    :param values: a (bar x ticker) array that was computed over the panel
+    :param rows: the position of every bar within the shared time index (see time_index)
+    :param length: the number of timestamps of the shared time index
+    :param fill: the value of the timestamps at which a ticker does not have a bar
+    :return: a (time x ticker) array of the values
+    """
+    values = np.asarray(values)
+    result = np.full((length, values.shape[1]), fill, dtype=values.dtype if values.dtype == bool else float)
+    bars, tickers = np.nonzero(rows >= 0)
+    result[rows[bars, tickers], tickers] = values[bars, tickers]
+    return result
+
+
+def _trades(trades: list, tickers: list, index: pd.DatetimeIndex) -> pd.DataFrame:
+    columns = ["Ticker", "Size", "EntryTime", "ExitTime", "EntryPrice", "ExitPrice", "PnL"]
+    if not trades:
+        return pd.DataFrame(columns=columns)
+    positions, size, entry_row, exit_row, entry, exit_, pl = (np.concatenate(values) for values in zip(*trades))
+    return pd.DataFrame({"Ticker": np.asarray(tickers, dtype=object)[positions], "Size": size,
+                         "EntryTime": index[entry_row], "ExitTime": index[exit_row], "EntryPrice": entry,
+                         "ExitPrice": exit_, "PnL": pl})
+
+
+def _stats(equity: pd.DataFrame, trades: pd.DataFrame, cash: float) -> pd.Series:
+    final = float(equity["Equity"].iloc[-1]) if len(equity) else cash
+    drawdown = (equity["Equity"] / equity["Equity"].cummax() - 1).min() * 100 if len(equity) else math.nan
+    pl = trades["PnL"].to_numpy(dtype=float)
+    return pd.Series({"Start": equity.index[0] if len(equity) else None,
+                      "End": equity.index[-1] if len(equity) else None,
+                      "# Trades": len(pl), "Win Rate [%]": (pl > 0).sum() / len(pl) * 100 if len(pl) else math.nan,
+                      "Return [%]": (final - cash) / cash * 100, "Equity Final [$]": final,
+                      "Max. Drawdown [%]": drawdown,
+                      "Max. Positions": int(equity["Positions"].max()) if len(equity) else 0}, dtype=object)
+
+
+def run(frames: dict, strategy, cash: float = 100000, max_positions: int = 10, max_weight: float = 0.1, score=None,
+        **params) -> dict:
+    """
+    Back tests the tickers together as a single portfolio (see the module docstring).
+
+    :param frames: a dict of ticker -> dataframe (without NaNs)
+    :param strategy: a strategy class that implements batch_indicators and signals (see Strategies.UniverseStrategy)
+    :param cash: the starting cash of the portfolio
+    :param max_positions: the most positions that are held at a time (None for no limit)
+    :param max_weight: the largest fraction of the equity a position is opened with (None for no limit)
+    :param score: a function (panel, indicators) -> (bar x ticker) array, the entries with the highest score (the
+    lowest score for short entries) are filled first (defaults to momentum)
+    :param params: the parameters of the strategy that differ from the class defaults
+    :return: a dict of the stats, the equity (a dataframe of the equity, cash and number of positions at every
+    timestamp) and the trades of the portfolio
+    """
+    for name in params:
+        if not hasattr(strategy, name):
+            raise AttributeError(f"{strategy.__name__} has no parameter {name!r}")
+
+    panel = BarPanel(frames)
+    values = strategy.batch_indicators(panel, **params)
+    signals = strategy.signals(panel, values, **params)
+    scores = (score if score is not None else momentum)(panel, values)
+
+    # the signals before the first bar of every ticker (see VectorBacktest.warmup) are ignored
+    active = np.arange(panel["Close"].shape[0])[:, None] >= np.broadcast_to(warmup(values), len(panel))[None, :]
+    no_signal = np.zeros(panel["Close"].shape, dtype=bool)
+    times, rows = time_index(panel)
+    length = len(times)
+    open_, close = scatter(panel["Open"], rows, length), scatter(panel["Close"], rows, length)
+    buy, sell, exit_ = (scatter(signals.get(name, no_signal) & active, rows, length, False)
+                        for name in ("buy", "sell", "close"))
+    scores = scatter(scores, rows, length)
+    take_profit, stop_loss = signals.get("take_profit"), signals.get("stop_loss")
+
+    balance = cash
+    tickers = len(panel)
+    size = np.zeros(tickers)
+    entry = np.full(tickers, np.nan)
+    entry_row = np.zeros(tickers, dtype=int)
+    last_close = np.full(tickers, np.nan)
+    # the orders that are filled at the next bar of the ticker, 1 (-1) opens a long (short) position
+    pending = np.zeros(tickers, dtype=int)
+    pending_exit = np.zeros(tickers, dtype=bool)
+    priority = np.full(tickers, -np.inf)
+
+    equity = np.empty(length)
+    cash_curve = np.empty(length)
+    positions = np.empty(length, dtype=int)
+    trades = []
+    for row in range(length):
+        price = open_[row]
+        has_bar = ~np.isnan(price)
+
+        # the exits are filled first, which frees up the cash and the positions of the entries
+        closing = np.flatnonzero(pending_exit & has_bar & (size != 0))
+        if len(closing):
+            pl = size[closing] * (price[closing] - entry[closing])
+            balance += float(np.sum(np.abs(size[closing]) * entry[closing] + pl))
+            trades.append((closing, size[closing], entry_row[closing], np.full(len(closing), row), entry[closing],
+                           price[closing], pl))
+            size[closing] = 0
+        pending_exit[has_bar] = False
+
+        entering = np.flatnonzero((pending != 0) & has_bar)
+        if len(entering):
+            held = np.count_nonzero(size)
+            if max_positions is not None and held + len(entering) > max_positions:
+                order = np.argsort(-priority[entering], kind="stable")
+                entering = entering[order[:max(max_positions - held, 0)]]
+
+            budget = balance / len(entering) if len(entering) else 0.0
+            if max_weight is not None and len(entering):
+                # the equity as of the last close
+                value = balance + np.sum(np.where(size != 0, np.abs(size) * entry + size * (last_close - entry), 0.0))
+                budget = min(budget, max_weight * value)
+            shares = np.floor(budget * (1 - sys.float_info.epsilon) / price[entering])
+            entering, shares = entering[shares > 0], shares[shares > 0]
+            size[entering] = pending[entering] * shares
+            entry[entering] = price[entering]
+            entry_row[entering] = row
+            balance -= float(np.sum(shares * price[entering]))
+        pending[has_bar] = 0
+
+        # the signals of this bar are filled at the next bar of each ticker
+        np.copyto(last_close, close[row], where=~np.isnan(close[row]))
+        holding = size != 0
+        direction = np.where(buy[row], 1, np.where(sell[row], -1, 0))
+        exits = holding & (exit_[row] | (direction != 0))
+        if take_profit is not None or stop_loss is not None:
+            with np.errstate(invalid="ignore"):
+                pl = size * (close[row] - entry)
+                if take_profit is not None:
+                    exits |= holding & (pl >= take_profit)
+                if stop_loss is not None:
+                    exits |= holding & (pl <= -stop_loss)
+        pending_exit |= exits
+        entries = direction != 0
+        pending[entries] = direction[entries]
+        # the entries without a score are filled last
+        priority[entries] = np.nan_to_num(direction[entries] * scores[row, entries], nan=-np.inf)
+
+        holding = size != 0
+        equity[row] = balance + np.sum(np.abs(size[holding]) * entry[holding]
+                                    + size[holding] * (last_close[holding] - entry[holding]))
+        cash_curve[row] = balance
+        positions[row] = np.count_nonzero(holding)
+
+    # the positions that are still open are closed at the last close of their ticker
+    closing = np.flatnonzero(size != 0)
+    if len(closing):
+        pl = size[closing] * (last_close[closing] - entry[closing])
+        trades.append((closing, size[closing], entry_row[closing], rows.max(axis=0)[closing], entry[closing],
+                       last_close[closing], pl))
+
+    index = pd.DatetimeIndex(times.view("datetime64[ns]"))
+    tz = next((df.index.tz for df in frames.values() if isinstance(df.index, pd.DatetimeIndex)), None)
+    index = index.tz_localize("UTC").tz_convert(tz) if tz is not None else index
+    equity = pd.DataFrame({"Equity": equity, "Cash": cash_curve, "Positions": positions}, index=index)
+    trades = _trades(trades, panel.tickers, index)
+    return {"stats": _stats(equity, trades, cash), "equity": equity, "trades": trades}
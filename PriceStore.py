@@ -0,0 +1,595 @@
+import os
+import json
+import math
+from datetime import datetime, timezone
+from os import listdir
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed by the parquet store
+    pa = pq = None
+
+
+def _to_ns(timestamp, tz) -> int:
+    """
+    Converts a timestamp (or a string) into nanoseconds since the epoch, timestamps without a timezone are assumed to be
+    in the timezone of the data.
+    """
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None and tz is not None:
+        timestamp = timestamp.tz_localize(tz)
+    return timestamp.value
+
+
+class Store:
+    """
+    The parts that are shared by every store. Besides the bars, each store keeps freshness metadata (freshness.json)
+    that records the first and last bar of every ticker and when the ticker was last written, and a quality manifest
+    (quality.json) of the report of every ticker that was cleaned before it was written (see Quality).
+    """
+
+    freshness_name = "freshness.json"
+    quality_name = "quality.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._freshness = None
+        self._quality = None
+
+    def symbols(self) -> set:
+        raise NotImplementedError
+
+    def load(self, symbols: list, columns: list = None, start=None, end=None) -> dict:
+        raise NotImplementedError
+
+    def save(self, frames: dict):
+        raise NotImplementedError
+
+    @property
+    def freshness(self) -> dict:
+        """
+        symbol -> {"first_bar": timestamp, "last_bar": timestamp, "bars": count, "updated": timestamp}
+        """
+        if self._freshness is None:
+            self._freshness = self._read_json(self.freshness_name)
+        return self._freshness
+
+    @property
+    def quality(self) -> dict:
+        """
+        symbol -> the quality report of the ticker (see Quality.Cleaner.clean)
+        """
+        if self._quality is None:
+            self._quality = self._read_json(self.quality_name)
+        return self._quality
+
+    def record_quality(self, reports: dict):
+        """
+        :param reports: a dict of symbol -> the quality report of the bars that were written
+        """
+        self.quality.update(reports)
+        self._write_json(self.quality_name, self.quality)
+
+    def _read_json(self, name: str) -> dict:
+        path = f"{self.directory}/{name}"
+        if not os.path.isfile(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write_json(self, name: str, value: dict):
+        path = f"{self.directory}/{name}"
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(value, file)
+        os.replace(f"{path}.tmp", path)
+
+    def last_timestamp(self, symbol: str):
+        """
+        :return: the timestamp of the last cached bar of the ticker (None if the ticker is not cached)
+        """
+        if symbol not in self.freshness:
+            # stores written before the freshness metadata existed have to read the bars
+            self.backfill_freshness([symbol])
+        if symbol in self.freshness:
+            return pd.Timestamp(self.freshness[symbol]["last_bar"])
+        return None
+
+    def backfill_freshness(self, symbols: list, batch_size: int = 500):
+        """
+        Records the freshness metadata of the cached tickers that do not have any yet (they were cached before the
+        freshness metadata existed) from their bars, batch_size tickers at a time. The metadata is written once.
+        """
+        missing = [symbol for symbol in symbols if symbol not in self.freshness]
+        if not missing:
+            return
+
+        frames = {}
+        for first in range(0, len(missing), batch_size):
+            # only the timestamps are needed (a frame without columns is empty, but it still has its index)
+            frames.update(self.load(missing[first:first + batch_size], columns=[]))
+        if frames:
+            self._record_freshness(frames)
+
+    def _record_freshness(self, frames: dict):
+        updated = datetime.now(timezone.utc).isoformat()
+        for symbol, df in frames.items():
+            # the frames of backfill_freshness do not have any columns, so their length is the one of their index
+            if not len(df.index):
+                continue
+            self.freshness[symbol] = {"first_bar": df.index[0].isoformat(), "last_bar": df.index[-1].isoformat(),
+                                      "bars": len(df.index), "updated": updated}
+        self._write_json(self.freshness_name, self.freshness)
+
+
+class PickleStore(Store):
+    """
+    The original cache layout, every ticker is saved as its own pickle file within the directory.
+    """
+
+    def symbols(self) -> set:
+        return {file[:-len(".pkl")] for file in listdir(self.directory) if file.endswith(".pkl")}
+
+    def load(self, symbols: list, columns: list = None, start=None, end=None) -> dict:
+        """
+        :param symbols: the tickers to load, tickers that are not cached are left out
+        :param columns: the columns to load (defaults to all of them)
+        :param start: only keep the bars from this timestamp onwards
+        :param end: only keep the bars up until this timestamp (inclusive)
+        :return: a dict of ticker -> dataframe
+        """
+        frames = {}
+        for symbol in symbols:
+            path = f"{self.directory}/{symbol}.pkl"
+            if not os.path.isfile(path):
+                continue
+
+            df = pd.read_pickle(path)
+            if columns is not None:
+                df = df[columns]
+            if start is not None or end is not None:
+                df = df.loc[start:end]
+            frames[symbol] = df
+        return frames
+
+    def save(self, frames: dict):
+        for symbol, df in frames.items():
+            df.to_pickle(f"{self.directory}/{symbol}.pkl")
+        self._record_freshness(frames)
+
+
+class ParquetStore(Store):
+    """
+    Keeps the bars of a directory within parquet files (parts). Every save writes the tickers it is given as a new part,
+    where every ticker is its own run of row groups, and an index (index.json) maps each ticker to its part, row
+    groups, rows and timestamps. A save only writes the tickers it is given, the parts whose tickers were all written
+    again are removed and the live tickers are rewritten into a single part once the parts hold more replaced rows
+    than live ones. Loading many tickers is a single read of their row groups per part, and row groups outside of the
+    requested date range are never read.
+    """
+
+    file_name = "bars.parquet"
+    index_name = "index.json"
+
+    def __init__(self, directory: str, row_group_size: int = 2048):
+        """
+        :param directory: the directory that contains the parquet files and their index
+        :param row_group_size: the maximum number of bars within a row group (smaller groups make date range reads
+        cheaper but the files larger)
+        """
+        if pq is None:
+            raise ImportError("the parquet store requires pyarrow (pip install pyarrow)")
+
+        super().__init__(directory)
+        self.row_group_size = row_group_size
+        self._index = None
+
+    @property
+    def path(self) -> str:
+        return f"{self.directory}/{self.file_name}"
+
+    def _part_path(self, part) -> str:
+        # the stores written before the bars were split into parts have a single file
+        return self.path if part is None else f"{self.directory}/bars-{part}.parquet"
+
+    def _parts(self) -> dict:
+        """
+        :return: a dict of part -> path of every part file within the directory
+        """
+        parts = {None: self.path} if os.path.isfile(self.path) else {}
+        for file in listdir(self.directory):
+            if file.startswith("bars-") and file.endswith(".parquet"):
+                parts[int(file[len("bars-"):-len(".parquet")])] = f"{self.directory}/{file}"
+        return parts
+
+    @property
+    def index(self) -> dict:
+        """
+        symbol -> {"part": part, "rows": [start, stop], "tz": timezone, "index_name": name,
+        "groups": [[group, first, last, rows]]} where the rows and the row groups are the ones within the part and first
+        and last are the nanosecond timestamps of the first and last bar of the row group.
+        """
+        if self._index is None:
+            path = f"{self.directory}/{self.index_name}"
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as file:
+                    self._index = json.load(file)
+            else:
+                self._index = {}
+        return self._index
+
+    def symbols(self) -> set:
+        return set(self.index)
+
+    def last_timestamp(self, symbol: str):
+        entry = self.index.get(symbol)
+        if entry is None:
+            return None
+        return pd.Timestamp(entry["groups"][-1][2], tz="UTC").tz_convert(entry["tz"])
+
+    def load(self, symbols: list, columns: list = None, start=None, end=None) -> dict:
+        """
+        :param symbols: the tickers to load, tickers that are not cached are left out
+        :param columns: the columns to load (defaults to all of them)
+        :param start: only keep the bars from this timestamp onwards
+        :param end: only keep the bars up until this timestamp (inclusive)
+        :return: a dict of ticker -> dataframe
+        """
+        # part -> (row groups, [(symbol, entry, rows, lower, upper)])
+        plans = {}
+        for symbol in symbols:
+            entry = self.index.get(symbol)
+            if entry is None:
+                continue
+
+            lower = _to_ns(start, entry["tz"]) if start is not None else -math.inf
+            upper = _to_ns(end, entry["tz"]) if end is not None else math.inf
+            selected = [group for group in entry["groups"] if group[2] >= lower and group[1] <= upper]
+            if not selected:
+                continue
+
+            groups, plan = plans.setdefault(entry.get("part"), ([], []))
+            groups.extend(group[0] for group in selected)
+            plan.append((symbol, entry, sum(group[3] for group in selected), lower, upper))
+
+        read_columns = ["Datetime"] + list(columns) if columns is not None else None
+        frames = {}
+        for part, (groups, plan) in plans.items():
+            df = pq.ParquetFile(self._part_path(part)).read_row_groups(groups, columns=read_columns).to_pandas()
+
+            offset = 0
+            for symbol, entry, rows, lower, upper in plan:
+                frame = df.iloc[offset:offset + rows]
+                offset += rows
+
+                times = frame["Datetime"].to_numpy(dtype="datetime64[ns]").view("int64")
+                if start is not None or end is not None:
+                    frame = frame[(times >= lower) & (times <= upper)]
+
+                index = pd.DatetimeIndex(frame["Datetime"], name=entry["index_name"]).tz_convert(entry["tz"])
+                frame = frame.drop(columns="Datetime")
+                frame.index = index
+                frames[symbol] = frame
+        return {symbol: frames[symbol] for symbol in symbols if symbol in frames}
+
+    def _write_part(self, part: int, frames: dict) -> dict:
+        """
+        Writes the frames as a new part.
+
+        :return: the index entries of the tickers that were written
+        """
+        index = {}
+        group = 0
+        row = 0
+        writer = None
+        path = self._part_path(part)
+        try:
+            for symbol, df in frames.items():
+                tz = str(df.index.tz) if df.index.tz is not None else None
+                times = df.index.tz_localize("UTC") if tz is None else df.index.tz_convert("UTC")
+
+                frame = df.astype("float64")
+                frame.index = times.rename("Datetime")
+                table = pa.Table.from_pandas(frame.reset_index(), preserve_index=False)
+
+                if writer is None:
+                    writer = pq.ParquetWriter(f"{path}.tmp", table.schema)
+                writer.write_table(table.cast(writer.schema), row_group_size=self.row_group_size)
+
+                ns = times.to_numpy(dtype="datetime64[ns]").view("int64")
+                groups = []
+                for first in range(0, len(df), self.row_group_size):
+                    last = min(first + self.row_group_size, len(df)) - 1
+                    groups.append([group, int(ns[first]), int(ns[last]), last - first + 1])
+                    group += 1
+
+                index[symbol] = {"part": part, "rows": [row, row + len(df)], "tz": tz,
+                                 "index_name": df.index.name or "Datetime", "groups": groups}
+                row += len(df)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is not None:
+            os.replace(f"{path}.tmp", path)
+        return index
+
+    def save(self, frames: dict):
+        """
+        Writes the frames into the store as a new part. Tickers that are already within the store are replaced (an
+        empty dataframe removes the ticker), the rest of the store is kept as is.
+        """
+        if not frames:
+            return
+
+        written = frames
+        index = {symbol: entry for symbol, entry in self.index.items() if symbol not in frames}
+        parts = self._parts()
+        live = sum(entry["rows"][1] - entry["rows"][0] for entry in index.values())
+        stored = sum(pq.ParquetFile(parts[part]).metadata.num_rows
+                     for part in {entry.get("part") for entry in index.values()} if part in parts)
+        if stored - live > live:
+            # most of the rows within the parts were replaced since, so the live tickers are written again as well
+            frames = {**self.load(list(index)), **frames}
+            index = {}
+
+        part = max((number for number in parts if number is not None), default=-1) + 1
+        index.update(self._write_part(part, {symbol: df for symbol, df in frames.items() if not df.empty}))
+
+        with open(f"{self.directory}/{self.index_name}.tmp", "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(f"{self.directory}/{self.index_name}.tmp", f"{self.directory}/{self.index_name}")
+        self._index = index
+
+        # the parts that no ticker is within anymore
+        referenced = {entry.get("part") for entry in index.values()}
+        for number, path in parts.items():
+            if number not in referenced:
+                os.remove(path)
+        self._record_freshness({symbol: df for symbol, df in written.items() if symbol in index})
+
+
+class MemmapStore(Store):
+    """
+    Keeps all of the bars of a directory as fixed layout arrays that are memory mapped read only. The bars are within
+    segments, every save writes the tickers it is given as a new segment: a bars file, a (bar x 5) float64 array of the
+    open, high, low, close and volume of every ticker one after the other, and a time file of their timestamps as int64
+    nanoseconds. Every save is also a new generation of the index (index-<generation>.json), which maps each ticker to
+    its segment and rows, and the CURRENT file holds the number of the current generation. Loading a ticker does not
+    deserialize anything, its dataframe is a view of the mapped pages, so every process that loads the store shares a
+    single copy of the bars within the page cache. Only the columns within COLUMNS are kept.
+    """
+
+    columns = ("Open", "High", "Low", "Close", "Volume")
+    current_name = "CURRENT"
+    # the index of the stores that were written before the bars were split into segments
+    legacy_index_name = "index.json"
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self._index = None
+        self._version = None
+        # segment -> (bars, time), the segments are never written again so they stay mapped across generations
+        self._segments = {}
+
+    def _current(self):
+        """
+        :return: the number of the current generation, None for a store without any (a new or a legacy store)
+        """
+        try:
+            with open(f"{self.directory}/{self.current_name}", "r", encoding="utf-8") as file:
+                return int(file.read())
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _index_name(generation: int) -> str:
+        return f"index-{generation}.json"
+
+    def _read_index(self, version) -> dict:
+        if version is not None:
+            with open(f"{self.directory}/{self._index_name(version)}", "r", encoding="utf-8") as file:
+                index = json.load(file)
+            index["segments"] = {int(segment): rows for segment, rows in index["segments"].items()}
+            return index
+
+        path = f"{self.directory}/{self.legacy_index_name}"
+        if not os.path.isfile(path):
+            return {"generation": 0, "segments": {}, "symbols": {}}
+
+        # every ticker of a legacy store is within the files of its generation
+        with open(path, "r", encoding="utf-8") as file:
+            index = json.load(file)
+        generation = index["generation"]
+        for entry in index["symbols"].values():
+            entry["segment"] = generation
+        return {"generation": generation, "segments": {generation: index["rows"]} if index["rows"] else {},
+                "symbols": index["symbols"]}
+
+    def _map(self, segment: int, rows: int) -> tuple:
+        return (np.memmap(self._path("bars", segment), dtype="float64", mode="r", shape=(rows, len(self.columns))),
+                np.memmap(self._path("time", segment), dtype="int64", mode="r", shape=(rows,)))
+
+    def _open(self) -> dict:
+        """
+        Maps the segments of the current generation, they are mapped again whenever the generation within CURRENT
+        changed since.
+
+        :return: the index, {"generation": number, "segments": {segment: number of bars}, "symbols": {symbol:
+        {"segment": segment, "rows": [start, stop], "tz": timezone, "index_name": name, "first": nanoseconds,
+        "last": nanoseconds}}} where the rows are the ones within the segment
+        """
+        while True:
+            version = self._current()
+            if self._index is not None and version == self._version:
+                return self._index
+
+            try:
+                index = self._read_index(version)
+                self._segments = {segment: self._segments.get(segment) or self._map(segment, rows)
+                                  for segment, rows in index["segments"].items()}
+            except FileNotFoundError:
+                if self._current() == version:
+                    raise
+                # a save replaced the generation (and removed its files) while it was read
+                continue
+            self._index, self._version = index, version
+            return index
+
+    def _path(self, name: str, segment: int) -> str:
+        return f"{self.directory}/{name}-{segment}.{'f64' if name == 'bars' else 'i64'}"
+
+    def symbols(self) -> set:
+        return set(self._open()["symbols"])
+
+    def length(self, symbol: str) -> int:
+        start, stop = self._open()["symbols"][symbol]["rows"]
+        return stop - start
+
+    def last_timestamp(self, symbol: str):
+        entry = self._open()["symbols"].get(symbol)
+        if entry is None:
+            return None
+        return pd.Timestamp(entry["last"], tz="UTC").tz_convert(entry["tz"])
+
+    def reference(self, symbol: str):
+        """
+        :return: a small picklable reference to the bars of the ticker, which a worker process maps itself instead of
+        receiving a copy of the bars
+        """
+        return MemmapBars(self.directory, symbol)
+
+    def load(self, symbols: list, columns: list = None, start=None, end=None) -> dict:
+        """
+        :param symbols: the tickers to load, tickers that are not cached are left out
+        :param columns: the columns to load (defaults to all of them)
+        :param start: only keep the bars from this timestamp onwards
+        :param end: only keep the bars up until this timestamp (inclusive)
+        :return: a dict of ticker -> read only dataframe over the mapped bars
+        """
+        index = self._open()
+        frames = {}
+        for symbol in symbols:
+            entry = index["symbols"].get(symbol)
+            if entry is None:
+                continue
+
+            bars, time = self._segments[entry["segment"]]
+            first, last = entry["rows"]
+            times = time[first:last]
+            if start is not None:
+                first += int(np.searchsorted(times, _to_ns(start, entry["tz"]), side="left"))
+            if end is not None:
+                last = entry["rows"][0] + int(np.searchsorted(times, _to_ns(end, entry["tz"]), side="right"))
+            last = max(first, last)
+
+            frame = pd.DataFrame(bars[first:last], columns=list(self.columns), copy=False)
+            if columns is not None:
+                frame = frame[list(columns)]
+            index_values = pd.DatetimeIndex(np.asarray(time[first:last]).view("datetime64[ns]"),
+                                            name=entry["index_name"])
+            frame.index = index_values.tz_localize("UTC").tz_convert(entry["tz"]) if entry["tz"] else index_values
+            frames[symbol] = frame
+        return frames
+
+    def _write_segment(self, segment: int, frames: dict) -> tuple:
+        """
+        Writes the frames as a new segment.
+
+        :return: a tuple of (the index entries of the tickers that were written, the number of bars of the segment)
+        """
+        bars, times, symbols = [], [], {}
+        row = 0
+        for symbol, df in frames.items():
+            tz = str(df.index.tz) if df.index.tz is not None else None
+            utc = df.index.tz_convert("UTC") if tz is not None else df.index
+            ns = utc.to_numpy(dtype="datetime64[ns]").view("int64")
+            bars.append(df.reindex(columns=list(self.columns)).to_numpy(dtype="float64"))
+            times.append(ns)
+            symbols[symbol] = {"segment": segment, "rows": [row, row + len(df)], "tz": tz,
+                               "index_name": df.index.name or "Datetime", "first": int(ns[0]), "last": int(ns[-1])}
+            row += len(df)
+
+        if row:
+            for name, parts, dtype in (("bars", bars, "float64"), ("time", times, "int64")):
+                with open(f"{self._path(name, segment)}.tmp", "wb") as file:
+                    np.concatenate(parts).astype(dtype, copy=False).tofile(file)
+                os.replace(f"{self._path(name, segment)}.tmp", self._path(name, segment))
+        return symbols, row
+
+    def save(self, frames: dict):
+        """
+        Writes the frames into the store as a new segment. Tickers that are already within the store are replaced (an
+        empty dataframe removes the ticker), the rest of the store is kept as is. The live tickers are written into a
+        single segment once the segments hold more replaced bars than live ones. Every write is a new generation, so
+        processes that still map the previous generation keep reading consistent bars.
+        """
+        if not frames:
+            return
+
+        written = frames
+        previous = self._open()
+        symbols = {symbol: entry for symbol, entry in previous["symbols"].items() if symbol not in frames}
+        live = sum(entry["rows"][1] - entry["rows"][0] for entry in symbols.values())
+        if sum(previous["segments"].values()) - live > live:
+            # most of the bars within the segments were replaced since, so the live tickers are written again as well
+            frames = {**self.load(list(symbols)), **frames}
+            symbols = {}
+
+        generation = previous["generation"] + 1
+        # a save writes at most one segment, so the segment is numbered after its generation
+        entries, rows = self._write_segment(generation, {symbol: df for symbol, df in frames.items() if not df.empty})
+        symbols.update(entries)
+        segments = {entry["segment"]: previous["segments"].get(entry["segment"], rows) for entry in symbols.values()}
+
+        # CURRENT is replaced last, it is what switches the readers over to the new generation
+        self._write_json(self._index_name(generation), {"generation": generation, "segments": segments,
+                                                        "symbols": symbols})
+        with open(f"{self.directory}/{self.current_name}.tmp", "w", encoding="utf-8") as file:
+            file.write(str(generation))
+        os.replace(f"{self.directory}/{self.current_name}.tmp", f"{self.directory}/{self.current_name}")
+
+        # the files of the previous generation and the segments that no ticker is within anymore
+        stale = [f"{self.directory}/{name}"
+                 for name in (self._index_name(previous["generation"]), self.legacy_index_name)]
+        stale += [self._path(name, segment) for segment in previous["segments"] if segment not in segments
+                  for name in ("bars", "time")]
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:  # the file does not exist, or is still mapped (windows)
+                pass
+        self._record_freshness({symbol: df for symbol, df in written.items() if symbol in symbols})
+
+
+# the memmap stores that were opened by this process, so that a worker maps every directory only once
+_memmap_stores = {}
+
+
+class MemmapBars(namedtuple("MemmapBars", ["directory", "symbol"])):
+    """
+    A reference to the bars of a ticker within a MemmapStore (see MemmapStore.reference).
+    """
+
+    def load(self) -> pd.DataFrame:
+        if self.directory not in _memmap_stores:
+            _memmap_stores[self.directory] = MemmapStore(self.directory)
+        return _memmap_stores[self.directory].load([self.symbol])[self.symbol]
+
+
+STORES = {"pickle": PickleStore, "parquet": ParquetStore, "memmap": MemmapStore}
+
+
+def open_store(kind: str, directory: str):
+    """
+    :param kind: pickle, parquet or memmap
+    :param directory: the directory of the store
+    :return: the store for that directory
+    """
+    if kind not in STORES:
+        raise ValueError(f"unknown store {kind!r}, expected one of {sorted(STORES)}")
+    return STORES[kind](directory)
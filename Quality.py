@@ -0,0 +1,129 @@
+"""
+Cleans and validates the bars of a ticker once, when they are downloaded, instead of within every backtest. The bars
+are sorted, duplicate timestamps are dropped (the last one is kept) and so are the rows with a NaN, a non-positive
+price or a zero volume (the rows ta.utils.dropna would drop). The report of a ticker records what was dropped along
+with the problems that are only detected: bars whose high/low do not contain their open/close, intraday gaps (bars
+missing from the schedule within a trading day, the rows the cleaner dropped are not gaps) and suspected splits (a jump
+between two bars by close to a split ratio). A ticker is unusable when it has too few bars or too many missing bars, a
+suspected split is only a warning since an ordinary jump can be close to a split ratio as well. The reports are kept
+within the quality manifest of the store (see PriceStore.Store.quality).
+"""
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+PRICES = ("Open", "High", "Low", "Close")
+# the ratios of the common stock splits (and reverse splits)
+SPLIT_RATIOS = (1.5, 2, 3, 4, 5, 8, 10, 20)
+
+
+def _gaps(index: pd.DatetimeIndex) -> tuple:
+    """
+    :return: a tuple of (the number of gaps, the number of missing bars, the largest gap in bars) within the trading
+    days, the time between two bars is the most common time between two bars of the same day
+    """
+    if len(index) < 3:
+        return 0, 0, 0
+
+    local = index.tz_localize(None) if index.tz is not None else index
+    times = local.to_numpy(dtype="datetime64[ns]").view("int64")
+    days = local.normalize().to_numpy(dtype="datetime64[ns]").view("int64")
+    same_day = days[1:] == days[:-1]
+    steps = np.diff(times)[same_day]
+    if not len(steps):
+        # daily (or coarser) bars, the gaps between days are weekends and holidays
+        return 0, 0, 0
+
+    values, counts = np.unique(steps, return_counts=True)
+    step = values[counts.argmax()]
+    missing = steps // step - 1
+    missing = missing[missing > 0]
+    return len(missing), int(missing.sum()), int(missing.max()) if len(missing) else 0
+
+
+def _splits(df: pd.DataFrame, tolerance: float) -> list:
+    """
+    :return: the timestamps of the bars whose open is about a split ratio away from the previous close
+    """
+    if len(df) < 2:
+        return []
+
+    ratio = df["Open"].to_numpy(dtype=float)[1:] / df["Close"].to_numpy(dtype=float)[:-1]
+    ratio = np.where(ratio < 1, 1 / ratio, ratio)
+    near = np.zeros(len(ratio), dtype=bool)
+    for split in SPLIT_RATIOS:
+        near |= np.abs(ratio - split) <= tolerance * split
+    return [timestamp.isoformat() for timestamp in df.index[1:][near]]
+
+
+class Cleaner:
+    """
+    The cleaning and validation of the bars of a ticker, see the module docstring.
+    """
+
+    def __init__(self, min_bars: int = 1, max_missing: float = 0.2, split_tolerance: float = 0.03):
+        """
+        :param min_bars: the fewest bars a usable ticker has after cleaning
+        :param max_missing: the largest fraction of the bars of a usable ticker that are missing (intraday gaps)
+        :param split_tolerance: the relative distance to a split ratio at which a jump is reported as a suspected split
+        """
+        self.min_bars = min_bars
+        self.max_missing = max_missing
+        self.split_tolerance = split_tolerance
+
+    def clean(self, df: pd.DataFrame) -> tuple:
+        """
+        :param df: the bars of a ticker as they were downloaded
+        :return: a tuple of (the cleaned bars, the quality report of the ticker)
+        """
+        report = {"raw_bars": len(df)}
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index(kind="stable")
+
+        duplicated = df.index.duplicated(keep="last")
+        report["duplicates"] = int(duplicated.sum())
+        df = df[~duplicated]
+        # the gaps are the bars missing from the schedule, before the cleaner drops any of the rows
+        scheduled = len(df)
+        gaps, missing, largest = _gaps(pd.DatetimeIndex(df.index))
+
+        numeric = df.select_dtypes("number").to_numpy(dtype=float)
+        nan_rows = ~np.isfinite(numeric).all(axis=1)
+        prices = df[[column for column in PRICES if column in df]].to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            zero_rows = ~nan_rows & ((prices <= 0).any(axis=1) | (df["Volume"].to_numpy(dtype=float) == 0))
+        report["nan_rows"] = int(nan_rows.sum())
+        report["zero_rows"] = int(zero_rows.sum())
+        df = df[~(nan_rows | zero_rows)]
+
+        if len(df):
+            high, low = df["High"].to_numpy(dtype=float), df["Low"].to_numpy(dtype=float)
+            body = df[["Open", "Close"]].to_numpy(dtype=float)
+            invalid = (high < low) | (body.max(axis=1) > high) | (body.min(axis=1) < low)
+        else:
+            invalid = np.zeros(0, dtype=bool)
+        report["invalid_bars"] = int(invalid.sum())
+
+        report.update({"bars": len(df), "gaps": gaps, "missing_bars": missing, "largest_gap": largest,
+                       "splits": _splits(df, self.split_tolerance)})
+
+        reasons = []
+        if len(df) < self.min_bars:
+            reasons.append(f"{len(df)} bars, fewer than {self.min_bars}")
+        if missing and missing / (scheduled + missing) > self.max_missing:
+            reasons.append(f"{missing} missing bars, more than {self.max_missing:.0%}")
+        report["usable"] = not reasons
+        report["reasons"] = reasons
+        report["warnings"] = [f"suspected split at {split}" for split in report["splits"]]
+        report["checked"] = datetime.now(timezone.utc).isoformat()
+        return df, report
+
+    def clean_frames(self, frames: dict) -> tuple:
+        """
+        :param frames: a dict of ticker -> the bars as they were downloaded
+        :return: a tuple of (dict of ticker -> cleaned bars, dict of ticker -> quality report)
+        """
+        cleaned, reports = {}, {}
+        for ticker, df in frames.items():
+            cleaned[ticker], reports[ticker] = self.clean(df)
+        return cleaned, reports
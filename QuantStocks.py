@@ -0,0 +1,190 @@
+"""
+The command line entry point of QuantStocks:
+
+    python QuantStocks.py screen [--offline]
+    python QuantStocks.py fetch [TICKER ...] [--interval 15m] [--period 60d] [--store pickle]
+    python QuantStocks.py backtest [--strategy VolumeIndicatorOBV] [--engine vector] [--processes 4]
+    python QuantStocks.py backtest --train 1000 --test 250 [--step 250]
+    python QuantStocks.py backtest --portfolio [--max-positions 10] [--max-weight 0.1]
+    python QuantStocks.py bench [--startup] [--tickers 100] [--bars 5000]
+
+Only argparse is imported up front, every subcommand imports what it needs (yfinance, backtesting, ta, ...) once it
+runs, so that quick commands (and --help) start right away. Benchmark.bench_startup guards how long importing this
+module takes.
+"""
+import sys
+import json
+import argparse
+
+# the modules that only the subcommands import, importing this module (or running --help) imports none of them
+HEAVY_MODULES = ("yfinance", "backtesting", "ta", "pandas", "numpy", "requests", "bokeh")
+
+
+def _screen(args):
+    from ResponseCache import ResponseCache
+    import Screener as screening
+
+    cache = ResponseCache(args.cache, offline=args.offline)
+    screener = screening.fetch(cache, args.exchanges)
+    condition = screening.universe_condition(args.min_volume, args.industry, args.sector, args.country,
+                                             args.min_market_cap, args.min_short_percent)
+    return screener.screen(condition)
+
+
+def screen(args):
+    """
+    Prints the tickers that meet the screener parameters (the same ones a Universe uses).
+    """
+    screened = _screen(args)
+    print("\n".join(screened.symbol.to_list()))
+
+
+def fetch(args):
+    """
+    Downloads the tickers (defaults to the screened tickers) that are not cached yet into the store of the directory,
+    the bars are cleaned and their quality reports are written to the quality manifest of the store (see Quality).
+    """
+    from Downloader import Downloader
+    from PriceStore import open_store
+    from Quality import Cleaner
+
+    tickers = args.tickers if args.tickers else _screen(args).symbol.to_list()
+    store = open_store(args.store, args.directory)
+    cached = store.symbols()
+    missing = [ticker for ticker in tickers if ticker not in cached and ticker not in store.quality]
+
+    result = Downloader().download(missing, args.period, args.interval)
+    frames, reports = Cleaner().clean_frames(result.frames)
+    store.save({ticker: df for ticker, df in frames.items() if not df.empty})
+    store.record_quality(reports)
+    print(f"downloaded {len(result.frames)} tickers into {args.directory}, {len(tickers) - len(missing)} were cached")
+    for ticker, reason in result.failures.items():
+        print(f"{ticker}: {reason}", file=sys.stderr)
+    for ticker, report in reports.items():
+        if not report["usable"]:
+            print(f"{ticker}: unusable, {'; '.join(report['reasons'])}", file=sys.stderr)
+        elif report["warnings"]:
+            print(f"{ticker}: {'; '.join(report['warnings'])}", file=sys.stderr)
+
+
+def backtest(args):
+    """
+    Back tests the universe with the strategies and prints the running aggregates of the sweep, or with --test the
+    stats of every window of a walk-forward backtest (see Universe.walk_forward), or with --portfolio the stats of the
+    universe as a single portfolio (see Universe.portfolio).
+    """
+    from ResponseCache import ResponseCache
+    from StockData import Universe
+    import Strategies
+
+    strategies = [getattr(Strategies, name) for name in args.strategy]
+    universe = Universe(strategies, period=args.period, interval=args.interval, store=args.store,
+                        http_cache=ResponseCache(args.cache, offline=args.offline), base_interval=args.base_interval)
+    if args.portfolio:
+        result = universe.portfolio(strategies[0], max_positions=args.max_positions, max_weight=args.max_weight)
+        print(result["stats"].to_string())
+    elif args.test is not None:
+        runs = universe.walk_forward(args.train, args.test, args.step, processes=args.processes, engine=args.engine)
+        if args.results is not None:
+            runs.to_csv(args.results, index=False)
+        print(runs.to_string())
+    else:
+        universe.back_test(processes=args.processes, results_path=args.results, engine=args.engine)
+        print(json.dumps(universe.results.summary(), indent=2, default=str))
+    if args.metrics:
+        print(json.dumps(universe.metrics_report(), indent=2, default=str))
+
+
+def bench(args):
+    """
+    Runs the benchmark suite over a synthetic universe (see Benchmark.run_suite), --startup only times the startup (and
+    exits with 1 when it imports a heavy module or takes longer than its budget).
+    """
+    import Benchmark
+
+    if args.startup:
+        report = Benchmark.bench_startup(repeat=args.repeat)
+    else:
+        report = Benchmark.run_suite(args.tickers, args.bars, store=args.store, repeat=args.repeat,
+                                     processes=args.processes, output=args.output)
+    print(json.dumps(report, indent=2))
+    if args.startup and not report["passed"]:
+        sys.exit(1)
+
+
+def _add_screener_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--exchanges", nargs="+", default=["NYSE", "NASDAQ", "AMEX"])
+    parser.add_argument("--min-volume", type=float, default=100000)
+    parser.add_argument("--industry", default="")
+    parser.add_argument("--sector", default=None, help="only screen the tickers of this sector")
+    parser.add_argument("--country", default="United States")
+    parser.add_argument("--min-market-cap", type=float, default=1000000)
+    parser.add_argument("--min-short-percent", type=float, default=0.25)
+    _add_cache_arguments(parser)
+
+
+def _add_cache_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--cache", default="Exchanges/Cache", help="the directory of the cached http responses")
+    parser.add_argument("--offline", action="store_true", help="only use the cached http responses")
+
+
+def parser() -> argparse.ArgumentParser:
+    # the choices are spelled out here so that --help does not import PriceStore or Strategies
+    stores = ("pickle", "parquet", "memmap")
+    result = argparse.ArgumentParser(prog="QuantStocks", description="Screens, downloads and back tests stocks")
+    commands = result.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("screen", help="print the screened tickers")
+    _add_screener_arguments(command)
+    command.set_defaults(run=screen)
+
+    command = commands.add_parser("fetch", help="download the tickers that are not cached yet")
+    command.add_argument("tickers", nargs="*", help="the tickers (defaults to the screened tickers)")
+    command.add_argument("--period", default="60d")
+    command.add_argument("--interval", default="15m")
+    command.add_argument("--store", default="pickle", choices=stores)
+    command.add_argument("--directory", default="Exchanges/Screener", help="the directory of the store")
+    _add_screener_arguments(command)
+    command.set_defaults(run=fetch)
+
+    command = commands.add_parser("backtest", help="back test the universe")
+    command.add_argument("--strategy", nargs="+", default=["VolumeIndicatorOBV"], help="the names of the strategies")
+    command.add_argument("--engine", default="backtesting", choices=("backtesting", "vector"))
+    command.add_argument("--processes", type=int, default=None)
+    command.add_argument("--period", default="60d")
+    command.add_argument("--interval", default="15m")
+    command.add_argument("--base-interval", default=None)
+    command.add_argument("--store", default="pickle", choices=stores)
+    command.add_argument("--results", default=None, help="the directory the stats of every run are appended to (the "
+                                                          "csv file of the windows of a walk-forward backtest)")
+    command.add_argument("--train", type=int, default=0, help="the number of bars of the train segment of a window")
+    command.add_argument("--test", type=int, default=None, help="run a walk-forward backtest with windows whose test "
+                                                               "segments have this number of bars")
+    command.add_argument("--step", type=int, default=None, help="the number of bars between two windows")
+    command.add_argument("--portfolio", action="store_true", help="back test the universe as a single portfolio "
+                                                                  "with the first strategy")
+    command.add_argument("--max-positions", type=int, default=10)
+    command.add_argument("--max-weight", type=float, default=0.1)
+    command.add_argument("--metrics", action="store_true", help="also print the timings of every stage")
+    _add_cache_arguments(command)
+    command.set_defaults(run=backtest)
+
+    command = commands.add_parser("bench", help="run the benchmarks over a synthetic universe")
+    command.add_argument("--startup", action="store_true", help="only time how long the startup takes")
+    command.add_argument("--tickers", type=int, default=100)
+    command.add_argument("--bars", type=int, default=5000)
+    command.add_argument("--store", default="pickle", choices=stores)
+    command.add_argument("--repeat", type=int, default=3)
+    command.add_argument("--processes", type=int, default=1)
+    command.add_argument("--output", help="the json file the report is written to")
+    command.set_defaults(run=bench)
+    return result
+
+
+def main(argv: list = None):
+    args = parser().parse_args(argv)
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Derives the bars of a coarser interval from the bars of a finer (base) interval, so that a single download at the base
+interval serves every timeframe. The bars are aggregated with numpy (first open, highest high, lowest low, last close
+and total volume) and the derived bars are cached within a store of their own (see ResampledStore).
+"""
+import numpy as np
+import pandas as pd
+from PriceStore import Store
+
+# the intraday intervals of yfinance -> minutes
+MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+DAILY = ("1d",)
+# the start of the regular session in the local (exchange) time of the bars, the intraday bins are counted from it
+SESSION_START = "09:30"
+
+
+def interval_minutes(interval: str) -> int:
+    """
+    :param interval: a yfinance interval, e.g. 5m, 1h or 1d
+    :return: the number of minutes of the interval (a trading day for 1d)
+    """
+    if interval in MINUTES:
+        return MINUTES[interval]
+    if interval in DAILY:
+        return 24 * 60
+    raise ValueError(f"can not resample to {interval!r}, expected one of {sorted(MINUTES) + list(DAILY)}")
+
+
+def can_resample(base: str, interval: str) -> bool:
+    """
+    :return: whether the bars of interval can be derived from the bars of base
+    """
+    if interval in DAILY:
+        return base in MINUTES or base in DAILY
+    return interval_minutes(interval) % interval_minutes(base) == 0
+
+
+def _bins(index: pd.DatetimeIndex, interval: str, session_start: str = SESSION_START) -> np.ndarray:
+    """
+    :param session_start: the start of the session (HH:MM) in the local time of the bars
+    :return: the start of the bar (as nanoseconds of the local time) each of the bars falls into. Intraday bins are
+    counted from the start of the session of each day, which is how yfinance aligns them (an hour starts at 9:30, not
+    at 9:00), so a day whose first bars are missing still has the same bins.
+    """
+    local = index.tz_localize(None) if index.tz is not None else index
+    times = local.to_numpy(dtype="datetime64[ns]").view("int64")
+    days = local.normalize().to_numpy(dtype="datetime64[ns]").view("int64")
+    if interval in DAILY:
+        return days
+
+    hours, minutes = (int(value) for value in session_start.split(":"))
+    origin = days + (hours * 60 + minutes) * 60 * 10 ** 9
+    width = interval_minutes(interval) * 60 * 10 ** 9
+    # the bars before the session (pre-market) fall into the bins before its start
+    return origin + (times - origin) // width * width
+
+
+def resample(df: pd.DataFrame, interval: str, session_start: str = SESSION_START) -> pd.DataFrame:
+    """
+    :param df: the bars of a ticker (sorted by time)
+    :param interval: the interval of the bars that are returned
+    :param session_start: the start of the session (HH:MM) in the local time of the bars, see _bins
+    :return: the bars aggregated into interval, each bar is labelled with the start of its bin
+    """
+    df = df.dropna(how="all")
+    if df.empty:
+        return df
+
+    bins = _bins(pd.DatetimeIndex(df.index), interval, session_start)
+    starts = np.flatnonzero(np.diff(bins, prepend=bins[0] - 1))
+    ends = np.append(starts[1:], len(bins)) - 1
+
+    columns = {}
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if column == "Open":
+            columns[column] = values[starts]
+        elif column == "High":
+            columns[column] = np.fmax.reduceat(values, starts)
+        elif column == "Low":
+            columns[column] = np.fmin.reduceat(values, starts)
+        elif column == "Volume":
+            columns[column] = np.add.reduceat(np.nan_to_num(values), starts).astype(values.dtype, copy=False)
+        else:
+            columns[column] = values[ends]
+    labels = pd.DatetimeIndex(bins[starts].view("datetime64[ns]"), name=df.index.name)
+    return pd.DataFrame(columns, index=labels.tz_localize(df.index.tz) if df.index.tz is not None else labels)
+
+
+class ResampledStore(Store):
+    """
+    A read only view of a store of base interval bars as bars of a coarser interval. The derived bars are cached within
+    another store and are derived again whenever the base bars of the ticker were written after them. Writes go to the
+    base store.
+    """
+
+    def __init__(self, base: Store, interval: str, cache: Store):
+        """
+        :param base: the store of the base interval bars
+        :param interval: the interval of the bars that are loaded
+        :param cache: the store the derived bars are cached in
+        """
+        self.base = base
+        self.interval = interval
+        self.cache = cache
+        self.directory = cache.directory
+        self._freshness = None
+
+    def symbols(self) -> set:
+        return self.base.symbols()
+
+    @property
+    def freshness(self) -> dict:
+        return self.base.freshness
+
+    @property
+    def quality(self) -> dict:
+        return self.base.quality
+
+    def record_quality(self, reports: dict):
+        self.base.record_quality(reports)
+
+    def last_timestamp(self, symbol: str):
+        return self.base.last_timestamp(symbol)
+
+    def _stale(self, symbol: str) -> bool:
+        if symbol not in self.cache.symbols():
+            return True
+        base, derived = self.base.freshness.get(symbol), self.cache.freshness.get(symbol)
+        return base is None or derived is None or base["updated"] > derived["updated"]
+
+    def load(self, symbols: list, columns: list = None, start=None, end=None) -> dict:
+        """
+        :param symbols: the tickers to load, tickers that are not cached are left out
+        :param columns: the columns to load (defaults to all of them)
+        :param start: only keep the bars from this timestamp onwards
+        :param end: only keep the bars up until this timestamp (inclusive)
+        :return: a dict of ticker -> dataframe of the bars of the interval
+        """
+        # the base stores written before the freshness metadata existed have none to compare the derived bars with
+        self.base.backfill_freshness(symbols)
+        stale = [symbol for symbol in symbols if self._stale(symbol)]
+        derived = {symbol: resample(df, self.interval) for symbol, df in self.base.load(stale).items()}
+        if derived:
+            self.cache.save({symbol: df for symbol, df in derived.items() if not df.empty})
+
+        frames = self.cache.load([symbol for symbol in symbols if symbol not in derived], columns, start, end)
+        for symbol, df in derived.items():
+            if columns is not None:
+                df = df[columns]
+            if start is not None or end is not None:
+                df = df.loc[start:end]
+            frames[symbol] = df
+        return {symbol: frames[symbol] for symbol in symbols if symbol in frames}
+
+    def save(self, frames: dict):
+        """
+        :param frames: a dict of ticker -> dataframe of base interval bars
+        """
+        self.base.save(frames)
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import hashlib
+import pandas as pd
+from HttpClient import HttpClient, default_client
+
+
+class OfflineCacheMiss(LookupError):
+    """
+    Raised when the cache is offline and does not have an entry for a request.
+    """
+
+
+def entry_name(url: str, params: dict = None) -> str:
+    """
+    :return: the file name of the entry of a request, the same url with other query parameters is another entry
+    """
+    request = json.dumps([url, params or {}], sort_keys=True, default=str)
+    return hashlib.sha1(request.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Caches the parsed responses of http requests as compressed dataframes on disk, an entry per url and query
+    parameters. An entry is served from disk until it is older than the ttl, after which it is revalidated with the
+    ETag/Last-Modified of the previous response (a 304 only refreshes the entry). In offline mode the network is never
+    touched and every entry is served regardless of its age, which lets a directory of entries act as the
+    fixtures of a run without a network.
+    """
+
+    def __init__(self, directory: str = "Exchanges/Cache", ttl: float = 24 * 60 * 60, offline=False,
+                 client: HttpClient = None):
+        """
+        :param directory: the directory of the entries
+        :param ttl: the number of seconds an entry is served without revalidating it
+        :param offline: whether to only serve entries from disk
+        :param client: the HttpClient the requests go through (defaults to the shared client)
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.offline = offline
+        self.client = client if client is not None else default_client()
+        os.makedirs(directory, exist_ok=True)
+
+    def get_frame(self, url: str, parse, params: dict = None, headers: dict = None, ttl: float = None) -> pd.DataFrame:
+        """
+        :param url: the url that is requested
+        :param parse: a function (response text) -> dataframe
+        :param params: the query parameters of the request
+        :param headers: the headers of the request
+        :param ttl: overrides the ttl of the cache for this entry
+        :return: the parsed response
+        """
+        ttl = self.ttl if ttl is None else ttl
+        name = entry_name(url, params)
+        meta = self._read_meta(name)
+        if meta is not None and (self.offline or time.time() - meta["fetched"] < ttl):
+            return self._read(name)
+        if self.offline:
+            raise OfflineCacheMiss(f"{url} {params or ''} is not cached in {self.directory}")
+
+        request_headers = dict(headers or {})
+        if meta is not None and meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta is not None and meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.client.get(url, params=params, headers=request_headers)
+        if response.status_code == 304 and meta is not None:
+            self._write_meta(name, {**meta, "fetched": time.time()})
+            return self._read(name)
+        response.raise_for_status()
+
+        frame = parse(response.text)
+        self.put(url, frame, params=params, etag=response.headers.get("ETag"),
+                 last_modified=response.headers.get("Last-Modified"))
+        return frame
+
+    def read(self, url: str, params: dict = None) -> pd.DataFrame:
+        return self._read(entry_name(url, params))
+
+    def put(self, url: str, frame: pd.DataFrame, params: dict = None, etag: str = None, last_modified: str = None):
+        """
+        Writes an entry, this is also how fixtures are recorded for offline runs.
+        """
+        name = entry_name(url, params)
+        path = f"{self.directory}/{name}.pkl.gz"
+        frame.to_pickle(f"{path}.tmp", compression="gzip")
+        os.replace(f"{path}.tmp", path)
+        self._write_meta(name, {"url": url, "params": params, "etag": etag, "last_modified": last_modified,
+                                "fetched": time.time()})
+
+    def _read(self, name: str) -> pd.DataFrame:
+        return pd.read_pickle(f"{self.directory}/{name}.pkl.gz")
+
+    def _read_meta(self, name: str):
+        path = f"{self.directory}/{name}.json"
+        if not os.path.isfile(path) or not os.path.isfile(f"{self.directory}/{name}.pkl.gz"):
+            return None
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write_meta(self, name: str, meta: dict):
+        path = f"{self.directory}/{name}.json"
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(f"{path}.tmp", path)
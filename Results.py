@@ -0,0 +1,170 @@
+import os
+import math
+from datetime import timedelta
+from os import listdir
+import numpy as np
+import pandas as pd
+
+
+def flatten_stats(stats: pd.Series) -> dict:
+    """
+    :param stats: the stats returned by Backtest.run
+    :return: the public entries of the stats with durations converted into seconds, so that every entry fits into a
+    column of a parquet file
+    """
+    row = {}
+    for key, value in stats.items():
+        if key.startswith("_"):
+            continue
+        if value is pd.NaT:
+            value = None
+        elif isinstance(value, (pd.Timedelta, timedelta)):
+            value = value.total_seconds()
+        elif isinstance(value, np.timedelta64):
+            value = value / np.timedelta64(1, "s")
+        row[key] = value
+    return row
+
+
+class RunningStats:
+    """
+    Aggregates of a sweep that are updated one run at a time: the trade weighted win rate, the distribution of the
+    Sharpe ratios (mean and variance) and of the maximum drawdowns (a histogram in 5% bins).
+    """
+
+    drawdown_bins = np.arange(-100, 5, 5)
+
+    def __init__(self):
+        self.runs = 0
+        self.trades = 0
+        self._wins = 0.0
+        self._sharpe_count = 0
+        self._sharpe_mean = 0.0
+        self._sharpe_m2 = 0.0
+        self._returns = 0.0
+        self._drawdowns = np.zeros(len(self.drawdown_bins) - 1, dtype=int)
+        self._worst_drawdown = 0.0
+
+    def update(self, row: dict):
+        """
+        :param row: the flattened stats of a single run (see flatten_stats)
+        """
+        self.runs += 1
+
+        trades = row.get("# Trades", 0) or 0
+        win_rate = row.get("Win Rate [%]")
+        if trades and win_rate is not None and not math.isnan(win_rate):
+            self.trades += trades
+            self._wins += win_rate / 100 * trades
+
+        returns = row.get("Return [%]")
+        if returns is not None and not math.isnan(returns):
+            self._returns += returns
+
+        # the mean and variance of the Sharpe ratios are kept with Welford's algorithm
+        sharpe = row.get("Sharpe Ratio")
+        if sharpe is not None and math.isfinite(sharpe):
+            self._sharpe_count += 1
+            delta = sharpe - self._sharpe_mean
+            self._sharpe_mean += delta / self._sharpe_count
+            self._sharpe_m2 += delta * (sharpe - self._sharpe_mean)
+
+        drawdown = row.get("Max. Drawdown [%]")
+        if drawdown is not None and not math.isnan(drawdown):
+            position = np.searchsorted(self.drawdown_bins, drawdown, side="right") - 1
+            self._drawdowns[min(max(position, 0), len(self._drawdowns) - 1)] += 1
+            self._worst_drawdown = min(self._worst_drawdown, drawdown)
+
+    @property
+    def win_rate(self) -> float:
+        """
+        :return: the win rate (in %) over every trade of every run
+        """
+        return self._wins / self.trades * 100 if self.trades else math.nan
+
+    def drawdowns(self) -> pd.Series:
+        """
+        :return: the number of runs per maximum drawdown bin, e.g. [-10, -5) is the number of runs whose maximum drawdown
+        was between -10% and -5%
+        """
+        labels = [f"[{low}, {high})" for low, high in zip(self.drawdown_bins[:-1], self.drawdown_bins[1:])]
+        return pd.Series(self._drawdowns, index=labels, name="Max. Drawdown [%]")
+
+    def summary(self) -> dict:
+        sharpe_std = math.sqrt(self._sharpe_m2 / (self._sharpe_count - 1)) if self._sharpe_count > 1 else math.nan
+        return {"Runs": self.runs, "# Trades": self.trades, "Win Rate [%]": self.win_rate,
+                "Mean Return [%]": self._returns / self.runs if self.runs else math.nan,
+                "Mean Sharpe Ratio": self._sharpe_mean if self._sharpe_count else math.nan,
+                "Std Sharpe Ratio": sharpe_std, "Worst Max. Drawdown [%]": self._worst_drawdown}
+
+
+class ResultsWriter:
+    """
+    An append-only results file of a sweep. The results are a directory of parquet parts, every flush writes a new part
+    (renamed into place once it is complete), so an interrupted sweep loses at most the results that were not flushed
+    yet and can be resumed by skipping the (ticker, strategy) pairs that are already within the directory.
+    """
+
+    def __init__(self, directory: str, flush_every: int = 500):
+        """
+        :param directory: the directory of the parts
+        :param flush_every: the number of results that are buffered before a part is written. A crash loses up to
+        flush_every - 1 results (which a resumed sweep runs again), a smaller value writes more (and smaller) parts,
+        which are slower to write and to read back
+        """
+        self.directory = directory
+        self.flush_every = flush_every
+        self.aggregates = RunningStats()
+        self._rows = []
+        os.makedirs(directory, exist_ok=True)
+
+        # the parts are only listed and read once, the next part number is kept from then on
+        parts = self._parts()
+        self._next_part = int(parts[-1].split("-")[1].split(".")[0]) + 1 if parts else 0
+        # the results of previous (interrupted) runs of the sweep, the aggregates also cover them
+        self.previous = self.read(parts)
+        self._completed = set()
+        for row in self.previous.to_dict("records"):
+            self.aggregates.update(row)
+            self._completed.add((row["Ticker"], row["Strategy"]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    def _parts(self) -> list:
+        return sorted(file for file in listdir(self.directory) if file.endswith(".parquet"))
+
+    def completed(self) -> set:
+        """
+        :return: the (ticker, strategy) pairs that are already within the results
+        """
+        return set(self._completed)
+
+    def append(self, ticker: str, strategy: str, stats: pd.Series):
+        row = {"Ticker": ticker, "Strategy": strategy, **flatten_stats(stats)}
+        self._rows.append(row)
+        self._completed.add((ticker, strategy))
+        self.aggregates.update(row)
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+
+        path = f"{self.directory}/part-{self._next_part:06d}.parquet"
+        pd.DataFrame(self._rows).to_parquet(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        self._next_part += 1
+        self._rows = []
+
+    def read(self, parts: list = None) -> pd.DataFrame:
+        """
+        :param parts: the parts that are read (defaults to every part within the directory)
+        :return: every result that was flushed, a row per (ticker, strategy)
+        """
+        parts = [pd.read_parquet(f"{self.directory}/{part}") for part in (self._parts() if parts is None else parts)]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
@@ -0,0 +1,231 @@
+import json
+import numpy as np
+import pandas as pd
+import requests
+from os.path import isfile
+from HttpClient import gather
+from ResponseCache import OfflineCacheMiss
+
+SCREENER_URL = "https://api.nasdaq.com/api/screener/stocks"
+SCREENER_PARAMS = {"tableonly": "true", "limit": 10000, "offset": 0, "download": "true"}
+SHORT_INTEREST_URL = "https://www.marketwatch.com/tools/screener/short-interest"
+
+# the columns of the exchange csvs -> the columns of the NASDAQ screener api
+COLUMNS = {"Symbol": "symbol", "Name": "name", "Last Sale": "lastsale", "Net Change": "netchange",
+           "% Change": "pctchange", "Market Cap": "marketCap", "Country": "country", "IPO Year": "ipoyear",
+           "Volume": "volume", "Sector": "sector", "Industry": "industry"}
+NUMERIC = ("lastsale", "netchange", "pctchange", "marketCap", "volume")
+# the columns that are indexed for lookups
+CATEGORIES = ("symbol", "sector", "industry", "country", "exchange")
+
+
+def load_exchanges(exchanges=("NYSE", "NASDAQ", "AMEX"), directory="Exchanges") -> pd.DataFrame:
+    """
+    :param exchanges: can be NYSE, NASDAQ, or AMEX
+    :param directory: the directory that contains the exchange csvs
+    :return: the rows of every exchange csv (with the column names of the NASDAQ screener api) and an exchange column
+    """
+    frames = []
+    for exchange in exchanges:
+        path = f"{directory}/{exchange}.csv"
+        if not isfile(path):
+            continue
+
+        df = pd.read_csv(path, dtype=str, keep_default_na=False).rename(columns=COLUMNS)
+        df["exchange"] = exchange
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(COLUMNS.values()))
+
+
+def parse_screener(text: str) -> pd.DataFrame:
+    return pd.DataFrame(json.loads(text)["data"]["rows"])
+
+
+def parse_short_interest(text: str) -> pd.DataFrame:
+    # a helper function that fixes the weird naming system that market watch has
+    def fix_symbol_name(name):
+        return name.split("  ")[0]
+
+    def fix_percent_shorted(percent):
+        return float(percent.strip("%")) / 100
+
+    df = pd.read_html(text)[0]
+    tickers = df["Symbol  Symbol"].rename("Symbol").apply(fix_symbol_name)
+    percent = df["Float Shorted (%)"].apply(fix_percent_shorted)
+    df.drop(["Symbol  Symbol", "Float Shorted (%)"], inplace=True, axis=1)
+    df["Symbol"] = tickers
+    df["Float Shorted (%)"] = percent
+
+    return df
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Types the columns of either the exchange csvs or the NASDAQ screener api payload, prices, changes, market caps and
+    volumes become floats ($ and % signs are stripped) and missing text becomes an empty string. A category the table
+    does not have (the api payload has no exchange column) is a column of empty strings.
+    """
+    df = df.rename(columns=COLUMNS).reset_index(drop=True)
+    for column in NUMERIC:
+        if column in df:
+            values = df[column].astype(str).str.replace(r"[$%,]", "", regex=True)
+            df[column] = pd.to_numeric(values, errors="coerce")
+    for column in CATEGORIES:
+        if column in df:
+            df[column] = df[column].fillna("").astype(str).str.strip()
+        else:
+            df[column] = ""
+    return df
+
+
+class Condition:
+    """
+    A filter of a screener. Conditions are composed with & (and), | (or) and ~ (not).
+    """
+
+    def __init__(self, mask):
+        """
+        :param mask: a function (screener) -> boolean numpy array of the rows that pass the filter
+        """
+        self.mask = mask
+
+    def __call__(self, screener) -> np.ndarray:
+        return self.mask(screener)
+
+    def __and__(self, other):
+        return Condition(lambda screener: self(screener) & other(screener))
+
+    def __or__(self, other):
+        return Condition(lambda screener: self(screener) | other(screener))
+
+    def __invert__(self):
+        return Condition(lambda screener: ~self(screener))
+
+
+def symbol(*names) -> Condition:
+    return Condition(lambda screener: screener.isin("symbol", names))
+
+
+def sector(*names) -> Condition:
+    return Condition(lambda screener: screener.isin("sector", names))
+
+
+def industry(*names) -> Condition:
+    return Condition(lambda screener: screener.isin("industry", names))
+
+
+def country(*names) -> Condition:
+    return Condition(lambda screener: screener.isin("country", names))
+
+
+def exchange(*names) -> Condition:
+    """
+    The tickers of the NASDAQ screener api do not have an exchange, only the ones of the exchange csvs do.
+    """
+    return Condition(lambda screener: screener.isin("exchange", names))
+
+
+def min_volume(volume: float) -> Condition:
+    return Condition(lambda screener: screener.values("volume") >= volume)
+
+
+def min_market_cap(market_cap: float) -> Condition:
+    return Condition(lambda screener: screener.values("marketCap") >= market_cap)
+
+
+def min_short_percent(percent: float) -> Condition:
+    """
+    Requires the short interest to be joined first (see Screener.with_short_interest).
+    """
+    return Condition(lambda screener: screener.values("Float Shorted (%)") >= percent)
+
+
+def universe_condition(volume=100000, industry_name="", sector_name=None, country_name="United States",
+                       market_cap=1000000, short_percent=0.25) -> Condition:
+    """
+    :param sector_name: the sector of the tickers (None to not filter on the sector)
+    :return: the condition of a Universe, the tickers that meet every criteria along with the tickers with a high
+    short interest
+    """
+    condition = min_volume(volume) & industry(industry_name) & min_market_cap(market_cap) & country(country_name)
+    if sector_name is not None:
+        condition = condition & sector(sector_name)
+    return condition | min_short_percent(short_percent)
+
+
+class Screener:
+    """
+    A typed table of tickers with precomputed lookups of the rows of every symbol, sector, industry, country and
+    exchange, so that a screen is a handful of vectorized masks no matter how many tickers there are.
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        """
+        :param table: the rows of the exchange csvs (see load_exchanges) or of the NASDAQ screener api
+        """
+        self.table = normalize(table)
+        self._lookups = {column: self.table.groupby(column, sort=False).indices for column in CATEGORIES
+                         if column in self.table}
+
+    @classmethod
+    def from_exchanges(cls, exchanges=("NYSE", "NASDAQ", "AMEX"), directory="Exchanges"):
+        return cls(load_exchanges(exchanges, directory))
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def rows(self, column: str, value) -> np.ndarray:
+        """
+        :return: the positions of the rows whose column equals the value
+        """
+        return self._lookups[column].get(value, np.empty(0, dtype=int))
+
+    def isin(self, column: str, values) -> np.ndarray:
+        mask = np.zeros(len(self.table), dtype=bool)
+        for value in values:
+            mask[self.rows(column, value)] = True
+        return mask
+
+    def values(self, column: str) -> np.ndarray:
+        return self.table[column].to_numpy(dtype=float)
+
+    def with_short_interest(self, short_interest: pd.DataFrame):
+        """
+        :param short_interest: the dataframe returned by StockData.high_short_interest_tickers
+        :return: a new screener with the Float Shorted (%) column joined on the symbol (NaN for tickers without any)
+        """
+        shorts = (short_interest[["Symbol", "Float Shorted (%)"]].rename(columns={"Symbol": "symbol"})
+                  .drop_duplicates("symbol"))
+        table = self.table.drop(columns=["Float Shorted (%)"], errors="ignore")
+        return Screener(table.merge(shorts, on="symbol", how="left"))
+
+    def screen(self, condition: Condition) -> pd.DataFrame:
+        """
+        :return: the rows that pass the condition
+        """
+        return self.table[condition(self)].reset_index(drop=True)
+
+
+def fetch(cache, exchanges=("NYSE", "NASDAQ", "AMEX")) -> Screener:
+    """
+    Fetches the NASDAQ screener api and the short interest at the same time. The exchange csvs are used when the api
+    can not be reached (or parsed) and the short interest is left empty when it can not be reached (or parsed).
+
+    :param cache: the ResponseCache the responses are served from
+    :param exchanges: the exchanges of the csvs that are used when the api can not be reached
+    :return: a screener of every ticker with the short interest joined
+    """
+    table, high_shorts = gather(lambda: cache.get_frame(SCREENER_URL, parse_screener, SCREENER_PARAMS),
+                                lambda: cache.get_frame(SHORT_INTEREST_URL, parse_short_interest))
+
+    if isinstance(table, (requests.RequestException, OfflineCacheMiss, ValueError, KeyError, TypeError)):
+        table = load_exchanges(exchanges)
+    elif isinstance(table, Exception):
+        raise table
+
+    # ['Symbol', 'Company Name', 'Price', 'Chg% (1D)', 'Chg% (YTD)', 'Short Interest', 'Short Date', 'Float', 'Float Shorted (%)']
+    if isinstance(high_shorts, (requests.RequestException, OfflineCacheMiss, ValueError, KeyError, TypeError)):
+        high_shorts = pd.DataFrame(columns=["Symbol", "Float Shorted (%)"])
+    elif isinstance(high_shorts, Exception):
+        raise high_shorts
+    return Screener(table).with_short_interest(high_shorts)
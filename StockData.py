@@ -1,48 +1,134 @@
-import os
-import yfinance as yf
 import csv
 import pandas as pd
 import math
-import requests
-import json
+from collections.abc import Mapping
+from multiprocessing import Pool
 from backtesting import Backtest
-from Strategies import VolumeIndicatorOBV
-from ta.utils import dropna
-from os import listdir
-from os.path import isfile, join
+from Strategies import VolumeIndicatorOBV, UniverseStrategy
+from Downloader import Downloader, NO_DATA
+from PriceStore import open_store, MemmapStore, MemmapBars
+from Cache import LRUCache, sizeof
+from Panel import BarPanel, align
+from Optimizer import Optimizer
+import Screener as screening
+from ResponseCache import ResponseCache
+from HttpClient import HttpClient, default_client
+from Results import ResultsWriter, RunningStats, flatten_stats
+import VectorBacktest as vector
+import WalkForward as walk_forward
+import Portfolio as portfolio
+import Indicators as indicators
+from Metrics import metrics, profile
+from Compact import compact as compact_bars, expand
+from Streaming import Stream, ReplaySource
+from Resample import ResampledStore, can_resample
+from Quality import Cleaner
+from os.path import isfile
 
 
 def data(ticker: str = "AAPL", period: str = "30d", interval: str = "15m"):
+    # yfinance is only imported once it is needed, it takes a while to import
+    import yfinance as yf
+
     df = yf.download(tickers=ticker, period=period, interval=interval)
     df.drop("Adj Close", axis=1, inplace=True)
     return df
 
 
-def high_short_interest_tickers() -> pd.DataFrame:
+def high_short_interest_tickers(cache: ResponseCache = None, client: HttpClient = None) -> pd.DataFrame:
     """
 
+    :param cache: the response cache the parsed table is served from (None to always request it)
+    :param client: the HttpClient the request goes through when there is no cache (defaults to the shared client)
     :return:
     TODO: when screening for stocks, incorporate short interest as part of the parameters
     URL: https://www.marketwatch.com/tools/screener/short-interest
     """
-    url = "https://www.marketwatch.com/tools/screener/short-interest"
-    request = requests.get(url)
+    if cache is not None:
+        return cache.get_frame(screening.SHORT_INTEREST_URL, screening.parse_short_interest)
 
-    # a helper function that fixes the weird naming system that market watch has
-    def fix_symbol_name(name):
-        return name.split("  ")[0]
+    client = client if client is not None else default_client()
+    request = client.get(screening.SHORT_INTEREST_URL)
+    return screening.parse_short_interest(request.text)
 
-    def fix_percent_shorted(percent):
-        return float(percent.strip("%")) / 100
 
-    df = pd.read_html(request.text)[0]
-    tickers = df["Symbol  Symbol"].rename("Symbol").apply(fix_symbol_name)
-    percent = df["Float Shorted (%)"].apply(fix_percent_shorted)
-    df.drop(["Symbol  Symbol", "Float Shorted (%)"], inplace=True, axis=1)
-    df["Symbol"] = tickers
-    df["Float Shorted (%)"] = percent
+def _back_test_job(job):
+    """
+    Runs a single (ticker, strategy) backtest. This lives at module level so that it can be pickled and sent to the
+    worker processes of the pool.
 
-    return df
+    :param job: a tuple of (ticker, dataframe (or a reference to the bars of a memmap store), strategy, precomputed
+    indicators or None)
+    :return: a tuple of ((ticker, strategy name, stats), metrics) where stats only contains the public entries of the
+    run and metrics are the Metrics recorded by the run
+    """
+    ticker, df, strategy, precomputed = job
+    if isinstance(df, MemmapBars):
+        df = df.load()
+    with metrics.capture() as captured:
+        with metrics.stage("backtest", ticker):
+            bt = Backtest(df, strategy, commission=0, exclusive_orders=True, cash=100000)
+            if precomputed is not None:
+                stats = bt.run(precomputed=precomputed)
+            else:
+                stats = bt.run()  # returns a pd.Series
+
+        # the rest of the run (other than the indicators computed within init) is the next() loop
+        if captured.enabled:
+            indicator_seconds = captured.seconds("indicators")
+            captured.add_time("next", captured.seconds("backtest") - indicator_seconds, ticker)
+            captured.tickers[ticker]["indicators"] = indicator_seconds
+
+    # the private entries (_strategy, _equity_curve, _trades) are heavy to send back to the parent process
+    stats = stats[[key for key in stats.index if not key.startswith("_")]]
+    return (ticker, strategy.__name__, stats), captured
+
+
+def _vector_back_test_job(job):
+    """
+    Runs the vectorized backtest of a strategy over a batch of tickers (see VectorBacktest).
+
+    :param job: a tuple of (dict of ticker -> dataframe (or a reference to the bars of a memmap store), strategy)
+    :return: a tuple of (list of (ticker, strategy name, stats), metrics)
+    """
+    frames, strategy = job
+    frames = {ticker: df.load() if isinstance(df, MemmapBars) else df for ticker, df in frames.items()}
+    with metrics.capture() as captured:
+        with metrics.stage("vector_backtest"):
+            stats = vector.run(frames, strategy)
+    return [(ticker, strategy.__name__, ticker_stats) for ticker, ticker_stats in stats.items()], captured
+
+
+def _walk_forward_job(job):
+    """
+    Back tests both segments of a single window of a ticker (see WalkForward).
+
+    :param job: a tuple of (ticker, window, dataframe of the bars of the window, strategy, the precomputed indicators
+    of the bars of the window or None)
+    :return: a tuple of (list of (ticker, strategy name, window, segment name, stats), metrics)
+    """
+    ticker, window, df, strategy, precomputed = job
+    with metrics.capture() as captured:
+        with metrics.stage("walk_forward", ticker):
+            runs = walk_forward.back_test(df, strategy, window, precomputed)
+    return [(ticker, strategy.__name__, window, segment, stats) for segment, stats in runs], captured
+
+
+def _vector_walk_forward_job(job):
+    """
+    Back tests every window of a batch of tickers with the vectorized backtester (see WalkForward.vector_back_test).
+
+    :param job: a tuple of (dict of ticker -> dataframe (or a reference to the bars of a memmap store), strategy,
+    train, test, step)
+    :return: a tuple of (list of (ticker, strategy name, window, segment name, stats), metrics)
+    """
+    frames, strategy, train, test, step = job
+    frames = {ticker: df.load() if isinstance(df, MemmapBars) else df for ticker, df in frames.items()}
+    with metrics.capture() as captured:
+        with metrics.stage("vector_walk_forward"):
+            results = walk_forward.vector_back_test(frames, strategy, train, test, step)
+    return [(ticker, strategy.__name__, window, segment, stats)
+            for ticker, runs in results.items() for window, segment, stats in runs], captured
 
 
 def str_exist_in_column(series: pd.Series, string):
@@ -52,17 +138,88 @@ def str_exist_in_column(series: pd.Series, string):
     return True
 
 
+class LazyTickers(Mapping):
+    """
+    A read only mapping of ticker -> dataframe. A ticker's dataframe is only loaded from its store when it is first
+    accessed, and it is kept within a bounded LRU cache afterwards so that the whole universe never has to be in memory
+    at once. With compact, the cache holds on to the compact bars of the tickers (see Compact) instead, so that many
+    more tickers fit within the same number of bytes, and they are turned back into dataframes when they are accessed.
+    """
+
+    def __init__(self, sources: dict, cache: LRUCache, compact=None):
+        """
+        :param sources: a dict of ticker -> the store the ticker is cached in
+        :param cache: the cache that holds on to the loaded dataframes
+        :param compact: None to cache the dataframes as they are, float32 or scaled to cache compact bars
+        """
+        self.sources = sources
+        self.cache = cache
+        self.compact = compact
+
+    def __getitem__(self, ticker: str) -> pd.DataFrame:
+        bars = self.cache.get(ticker)
+        if bars is not None:
+            return expand(bars)
+
+        with metrics.stage("load", ticker):
+            frames = self.sources[ticker].load([ticker])
+        if ticker not in frames:
+            raise KeyError(ticker)
+        df = frames[ticker]
+        metrics.count("bytes_read", sizeof(df))
+        # the first access returns the same (compacted) prices as the later ones
+        return expand(self._put(ticker, df))
+
+    def _put(self, ticker: str, df: pd.DataFrame):
+        """
+        :return: the bars that were cached, tickers whose prices can not be made compact within the tolerance are
+        cached as they are
+        """
+        bars = compact_bars(df, self.compact) if self.compact is not None else df
+        self.cache.put(ticker, bars)
+        return bars
+
+    def __iter__(self):
+        return iter(self.sources)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def preload(self, tickers: list) -> dict:
+        """
+        Loads the tickers that are not cached yet with a single read per store. Only as many tickers as the cache can
+        hold on to are kept.
+
+        :return: a dict of ticker -> dataframe of the tickers that were loaded (the same bars that were cached)
+        """
+        by_store = {}
+        for ticker in tickers:
+            if ticker not in self.cache:
+                by_store.setdefault(self.sources[ticker], []).append(ticker)
+
+        loaded = {}
+        for store, symbols in by_store.items():
+            with metrics.stage("load"):
+                frames = store.load(symbols)
+            for ticker, df in frames.items():
+                metrics.count("bytes_read", sizeof(df))
+                loaded[ticker] = expand(self._put(ticker, df))
+        return loaded
+
+
 class Universe:
     """
     A universe is a class that contains all of the stock data that would be used for backtesting
-    URL: https://api.nasdaq.com/api/screener/stocks?tableonly=true&limit=25&offset=0&download=true
+    URL: https://api.nasdaq.com/api/screener/stocks?tableonly=true&limit=10000&offset=0&download=true
     URL: https://api.nasdaq.com/api/quote/ABCM/chart?assetclass=stocks&fromdate=2021-07-01&todate=2021-07-28
     """
 
     def __init__(self, strategies: list, exchanges: list = ("NYSE", "NASDAQ", "AMEX"), period="60d", interval="15m",
-                 min_volume=100000, set_industry="", set_sector="Miscellaneous",
+                 min_volume=100000, set_industry="", set_sector=None,
                  set_country="United States", min_market_cap=1000000, min_short_percent=0.25,
-                 only_screener_tickers=True):
+                 only_screener_tickers=True, downloader=None, store="pickle", max_cached_tickers=None,
+                 max_cache_bytes=2 ** 30, http_cache=None, http_client=None, compact=None, base_interval=None,
+                 cleaner=None):
         """
         :param strategies: a list of strategies (the strategies must inherent the strategy class)
         :param exchanges: can be NYSE, NASDAQ, or AMEX
@@ -70,17 +227,35 @@ class Universe:
         :param interval: 5m, 10m, 15m, 30m, 45m, 1h, 1d, and so on
         :param min_volume: the minimum volume (float)
         :param set_industry: the industry the ticker is in (please look below for a list)
-        :param set_sector: the sector the ticker is in (please look below for a list)
+        :param set_sector: the sector the ticker is in (please look below for a list), None to not filter on the
+        sector
         :param set_country: the country the screener is interested in (please look below for a list)
         :param min_market_cap: the minimum market cap
         :param min_short_percent: the minimum percent of short interest (decimal format (0.05) or percent format (5%))
         :param only_screener_tickers: whether to use the screener tickers only or not (bool)
+        :param downloader: the Downloader used to fetch the tickers that are not cached yet
+        :param store: how the dataframes are cached on disk, pickle (one file per ticker), parquet (one file per
+        interval) or memmap (fixed layout arrays that worker processes map instead of receiving copies of the bars)
+        :param max_cached_tickers: the maximum number of dataframes that are kept in memory (None for no limit)
+        :param max_cache_bytes: the maximum number of bytes the dataframes in memory can take up (None for no limit)
+        :param http_cache: the ResponseCache of the screener and short interest requests (defaults to a day long cache
+        within Exchanges/Cache, ResponseCache(offline=True) never touches the network)
+        :param http_client: the HttpClient of the default http_cache (defaults to the shared client)
+        :param compact: None to keep the dataframes in memory as they are, float32 or scaled to keep them as compact
+        bars (float32 or scaled integer prices, integer volumes and shared timestamps, see Compact)
+        :param base_interval: the interval that is downloaded and cached (defaults to interval). When it is finer than
+        interval, the bars of interval are derived from the cached base bars (see Resample), so universes of different
+        intervals share a single download
+        :param cleaner: the Quality.Cleaner the downloaded bars are cleaned and validated with before they are cached
         """
         # by default, the stocks within this universe will be from the NYSE and NASDAQ exchanges
         self.strategies = strategies
         self.exchanges = exchanges
         self.period = period
         self.interval = interval
+        self.base_interval = base_interval if base_interval is not None else interval
+        if self.base_interval != interval and not can_resample(self.base_interval, interval):
+            raise ValueError(f"the bars of {interval} can not be derived from the bars of {self.base_interval}")
 
         # screener parameters
         self._min_volume = min_volume
@@ -91,147 +266,519 @@ class Universe:
         self._min_short_percent = min_short_percent
         self._only_screener_tickers = only_screener_tickers
 
-        # we will also be generating all of the dataframes for each ticker
-        self.screener = self.__generate_screener()
+        self.downloader = downloader if downloader is not None else Downloader()
+        self.store = store
+        # cache directory -> store
+        self.stores = {}
+        self._max_cached_tickers = max_cached_tickers
+        self._max_cache_bytes = max_cache_bytes
+        self._compact = compact
+        self.http_client = http_client if http_client is not None else default_client()
+        self.http_cache = http_cache if http_cache is not None else ResponseCache(client=self.http_client)
+        # tickers that could not be downloaded along with the reason why
+        self.failed_tickers = {}
+        self.cleaner = cleaner if cleaner is not None else Cleaner()
+        # tickers whose bars did not pass the quality checks along with the reasons why (see Quality)
+        self.unusable_tickers = {}
+
+        # the dataframes of each ticker are only loaded when they are first accessed
+        with metrics.stage("screener"):
+            self.screener = self.__generate_screener()
         self.tickers = self.__generate_dataframes()
         self.win_rate = []
+        # the running aggregates of the last back test
+        self.results = RunningStats()
 
     def __generate_screener(self) -> pd.DataFrame:
         """
+        Screens every ticker of the NASDAQ screener api (or of the exchange csvs when the api can not be reached) with
+        the screener parameters of the universe. Tickers with a high short interest are always part of the screener.
 
-        :param min_volume: the minimum volume the screener will look for
-        :param set_industry: the industry that we are interested in screening
-        :param set_sector: the sector that we are interested in screening
-        :param set_country: the country that the stock was founded in
-        :return: a dict of tickers that meets all of the criteria
+        :return: a dataframe of the tickers that meets all of the criteria
         """
 
-        # requests
-        url = "https://api.nasdaq.com/api/screener/stocks?tableonly=true&limit=25&offset=0&download=true"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
-                          'Chrome/92.0.4515.107 Safari/537.36'}
-        request = requests.get(url, headers=headers)
-        ticker_data = json.loads(request.text)["data"]["rows"]
+        # requests (the screener and the short interest are fetched at the same time)
+        screener = screening.fetch(self.http_cache, self.exchanges)
 
-        # dataframe manipulation
-        df = pd.DataFrame(ticker_data)
+        # these are the tickers we are interested base off preset parameters
+        return screener.screen(screening.universe_condition(self._min_volume, self._set_industry, self._set_sector,
+                                                            self._set_country, self._min_market_cap,
+                                                            self._min_short_percent))
 
-        volumes = pd.to_numeric(df["volume"], errors="coerce")
-        market_caps = pd.to_numeric(df["marketCap"], errors="coerce")
+    def __ticker_directories(self) -> dict:
+        """
+        :return: a dict of cache directory -> list of tickers that are cached within that directory
+        """
+        if self._only_screener_tickers:
+            return {"Exchanges/Screener": self.screener.symbol.to_list()}
 
-        df.drop(columns=["volume", "marketCap"], axis=1, inplace=True)
+        directories = {}
+        for exchange in self.exchanges:
+            path = f"Exchanges/{exchange}.csv"
+            if not isfile(path):
+                continue
 
-        df["volume"] = volumes
-        df["marketCap"] = market_caps
-        # these are the tickers we are interested base off preset parameters
-        target_ticker = df[(df["volume"] >= self._min_volume) & (df["industry"] == self._set_industry)
-                           & (df["marketCap"] >= self._min_market_cap) & (df["country"] == self._set_country)
-                           & (df["industry"] == self._set_industry)]
+            with open(path, "r", encoding="utf-8") as file:
+                tickers = [row["Symbol"] for row in csv.DictReader(file) if "/" not in row["Symbol"]]
+            directories[f"Exchanges/{exchange}/{self.base_interval}"] = tickers
+        return directories
 
-        # we also want to incorporate stocks on our screener that contains high short interest
-        # ['Symbol', 'Company Name', 'Price', 'Chg% (1D)', 'Chg% (YTD)', 'Short Interest', 'Short Date', 'Float', 'Float Shorted (%)']
-        high_shorts = high_short_interest_tickers()
-        high_shorts = high_shorts[high_shorts["Float Shorted (%)"] >= self._min_short_percent]
+    def __generate_dataframes(self) -> LazyTickers:
+        """
+        The dataframes are separated into folders base off intervals. Each folder (interval) is a store that contains
+        the dataframes (either as pickle files or a single parquet file). The interval is base off the input when
+        Universe is initialized. The tickers that are not cached yet are downloaded all at once by the downloader, the
+        ones that fail are recorded in self.failed_tickers. The downloaded bars are cleaned before they are cached and the
+        tickers that are unusable (see Quality) are left out of the universe and recorded in self.unusable_tickers, so
+        the bars are never cleaned again within a backtest. When the base interval differs from the interval, the base
+        interval bars are downloaded and the bars of the interval are derived from them (and cached within the
+        resampled/<interval> folder of the store).
+
+        :return: returns a lazy mapping of ticker -> dataframe of stock data gathered from yfinance, the dataframes are
+        only read from the stores when they are accessed. If screener is not None, then the method will only
+        incorporate tickers within the screener as part of the universe.
+        """
+        sources = {}
+        for directory, symbols in self.__ticker_directories().items():
+            store = open_store(self.store, directory)
+            self.stores[directory] = store
+
+            cached = store.symbols()
+            # the tickers that were cached before they were cleaned are cleaned once
+            self.__clean_cached(store, [ticker for ticker in symbols if ticker in cached and ticker not in store.quality])
+            # the tickers without any usable bars are within the quality manifest but not within the store
+            missing = [ticker for ticker in symbols if ticker not in cached and ticker not in store.quality]
+
+            # save the newly downloaded dataframes for future uses
+            with metrics.stage("download"):
+                result = self.downloader.download(missing, self.period, self.base_interval)
+            metrics.count("tickers_downloaded", len(result.frames))
+            metrics.count("bytes_downloaded", sum(sizeof(df) for df in result.frames.values()))
+            with metrics.stage("clean"):
+                frames, reports = self.cleaner.clean_frames(result.frames)
+            with metrics.stage("save"):
+                store.save({ticker: df for ticker, df in frames.items() if not df.empty})
+                store.record_quality(reports)
+            self.failed_tickers.update(result.failures)
+
+            source = store
+            if self.base_interval != self.interval:
+                source = ResampledStore(store, self.interval,
+                                        open_store(self.store, f"{directory}/resampled/{self.interval}"))
+
+            available = cached | {ticker for ticker, df in frames.items() if not df.empty}
+            for ticker in symbols:
+                report = store.quality.get(ticker)
+                if report is not None and not report["usable"]:
+                    self.unusable_tickers[ticker] = report["reasons"]
+                elif ticker in available:
+                    sources[ticker] = source
+        return LazyTickers(sources, LRUCache(self._max_cached_tickers, self._max_cache_bytes), self._compact)
+
+    def __clean_cached(self, store, tickers: list, batch_size=500):
+        """
+        Cleans the bars of the tickers that are cached without a quality report (they were cached before the bars were
+        cleaned), batch_size tickers at a time. Only the bars that changed are written again.
+        """
+        for first in range(0, len(tickers), batch_size):
+            frames = store.load(tickers[first:first + batch_size])
+            with metrics.stage("clean"):
+                cleaned, reports = self.cleaner.clean_frames(frames)
+            with metrics.stage("save"):
+                store.save({ticker: df for ticker, df in cleaned.items()
+                            if not df.empty and not df.index.equals(frames[ticker].index)})
+                store.record_quality(reports)
+
+    def refresh(self) -> dict:
+        """
+        Brings the cached tickers up to date. Only the bars from the last cached bar of each ticker onwards are
+        downloaded, they are appended to the cached dataframe and bars with the same timestamp are replaced by the newer
+        download (the last cached bar might have been incomplete). The bars are cleaned again and the freshness metadata
+        and quality manifest of every store are updated, tickers that became unusable are left out of the universe.
 
-        for high_short in high_shorts.Symbol.to_list():
-            row = df[df["symbol"] == high_short]
-            target_ticker = target_ticker.append(row, ignore_index=True)
+        :return: a dict of ticker -> number of bars with a new timestamp
+        """
+        added = {}
+        for store in self.stores.values():
+            # the bars of a resampled source are derived from the base interval bars of the store
+            symbols = [ticker for ticker, source in self.tickers.sources.items()
+                       if getattr(source, "base", source) is store]
+            # the tickers cached before the freshness metadata existed get theirs from their bars (written once)
+            store.backfill_freshness(symbols)
+
+            # the tickers are grouped by their last bar so that every group can be downloaded with the same start
+            groups = {}
+            for ticker in symbols:
+                groups.setdefault(store.last_timestamp(ticker), []).append(ticker)
+
+            updated = {}
+            reports = {}
+            for last, tickers in groups.items():
+                if last is None:
+                    continue
 
-        return target_ticker.reset_index(drop=True)
+                result = self.downloader.download(tickers, self.period, self.base_interval, start=last)
+                # tickers without any new bars are not failures
+                self.failed_tickers.update({ticker: reason for ticker, reason in result.failures.items()
+                                            if reason != NO_DATA})
+
+                cached = store.load(list(result.frames))
+                for ticker, new_bars in result.frames.items():
+                    # the newer download of a timestamp comes last, so it is the one that is kept
+                    df, reports[ticker] = self.cleaner.clean(pd.concat([cached[ticker], new_bars]))
+                    # the bars the cleaner dropped from the cached ones are not negative additions
+                    added[ticker] = int((~df.index.isin(cached[ticker].index)).sum())
+                    updated[ticker] = df
+
+            store.save({ticker: df for ticker, df in updated.items() if not df.empty})
+            store.record_quality(reports)
+            for ticker in updated:
+                self.tickers.cache.pop(ticker)
+                if not reports[ticker]["usable"]:
+                    self.unusable_tickers[ticker] = reports[ticker]["reasons"]
+                    self.tickers.sources.pop(ticker, None)
+        return added
+
+    def freshness(self) -> pd.DataFrame:
+        """
+        :return: a dataframe of the freshness metadata (first bar, last bar, number of bars, and when it was last
+        written) of every ticker within the universe
+        """
+        freshness = {}
+        for store in self.stores.values():
+            freshness.update(store.freshness)
+        return pd.DataFrame.from_dict(freshness, orient="index").reindex(list(self.tickers))
 
-    def __generate_dataframes(self) -> dict:
+    def quality(self) -> pd.DataFrame:
+        """
+        :return: a dataframe of the quality report (see Quality) of every ticker within the universe along with the
+        unusable tickers
         """
-        The dataframes are separated into folders base off intervals. Each folder (interval) will contain dataframe
-        files. The interval is base off the input when Universe is initialized.
+        reports = {}
+        for store in self.stores.values():
+            reports.update(store.quality)
+        return pd.DataFrame.from_dict(reports, orient="index").reindex(list(self.tickers) + list(self.unusable_tickers))
 
-        :return: returns a list of dataframes of stock data gathered from yfinance. If screener is not None, then
-        the method will only incorporate tickers within the screener as part of the universe.
+    def panel(self, column: str = "Close", tickers: list = None) -> pd.DataFrame:
         """
-        c_exchanges = [exchange.strip(".csv") for exchange in listdir("Exchanges") if
-                       isfile(join("Exchanges", exchange))]
-        print(c_exchanges)
-        # we will gather all of the ticker names from these exchanges (separated by exchanges for filtering later)
-        exchange_dfs = {}
+        :param column: Open, High, Low, Close or Volume
+        :param tickers: the tickers within the panel (defaults to the whole universe)
+        :return: a (time x ticker) dataframe of the column over the union of the timestamps of every ticker
+        """
+        tickers = list(self.tickers) if tickers is None else tickers
+        return align({ticker: self.tickers[ticker] for ticker in tickers}, column)
 
-        tickers = {}
-        if self._only_screener_tickers:
-            exchange_files = [file.strip(".pkl") for file in listdir("Exchanges/Screener")]
-            for ticker in self.screener.symbol.to_list():
-                if ticker not in exchange_files:
-                    df = data(ticker, self.period, self.interval)
-                    df.to_pickle(f"Exchanges/Screener/{ticker}.pkl")
-                    tickers[ticker] = df
-                else:
-                    df = pd.read_pickle(f"Exchanges/Screener/{ticker}.pkl")
-                    tickers[ticker] = df
+    def _frames(self, tickers: list) -> dict:
+        """
+        :return: a dict of ticker -> dataframe of the tickers (the bars were cleaned when they were downloaded, see
+        Quality), empty tickers are left out
+        """
+        # the tickers that are not cached are read with a single load per store
+        loaded = self.tickers.preload(tickers)
+        frames = {}
+        for ticker in tickers:
+            df = loaded[ticker] if ticker in loaded else self.tickers[ticker]
+            if not df.empty:
+                frames[ticker] = df
+        return frames
+
+    def bar_panel(self, tickers: list = None) -> BarPanel:
+        """
+        :param tickers: the tickers within the panel (defaults to the whole universe)
+        :return: the bars of the tickers stacked into (bar x ticker) arrays, empty tickers are left out
+        """
+        return BarPanel(self._frames(list(self.tickers) if tickers is None else tickers))
+
+    def _job_bars(self, ticker: str, df: pd.DataFrame, share: bool):
+        """
+        :param share: whether the job is sent to a worker process
+        :return: the bars that are sent with a job, a reference to the bars of a memmap store (which the worker maps
+        itself rather than unpickling a copy) when none of the bars were dropped, otherwise the dataframe
+        """
+        store = self.tickers.sources[ticker]
+        if share and isinstance(store, MemmapStore) and len(df) == store.length(ticker):
+            return store.reference(ticker)
+        return df
+
+    def _back_test_jobs(self, precompute=False, batch_size=500, completed=frozenset(), share=False):
+        """
+        A generator of all of the (ticker, dataframe, strategy, precomputed indicators) jobs within the universe.
+        Tickers without any data and (ticker, strategy name) pairs within completed are skipped. The tickers are loaded
+        batch_size at a time, and when precompute is True the indicators of every UniverseStrategy are computed for the
+        whole batch at once. With share, the bars of memmap stores are sent as references (see _job_bars).
+        """
+        tickers = [ticker for ticker in self.tickers
+                   if any((ticker, strategy.__name__) not in completed for strategy in self.strategies)]
+        for first in range(0, len(tickers), batch_size):
+            frames = self._frames(tickers[first:first + batch_size])
+
+            precomputed = {}
+            if precompute and frames:
+                panel = BarPanel(frames)
+                for strategy in self.strategies:
+                    if issubclass(strategy, UniverseStrategy):
+                        with metrics.stage("batch_indicators"):
+                            values = strategy.batch_indicators(panel)
+                        precomputed[strategy] = {ticker: panel.slices(values, ticker) for ticker in panel.tickers}
+
+            for ticker, df in frames.items():
+                bars = self._job_bars(ticker, df, share)
+                for strategy in self.strategies:
+                    if (ticker, strategy.__name__) not in completed:
+                        yield ticker, bars, strategy, precomputed.get(strategy, {}).get(ticker)
+
+    def _vector_back_test_jobs(self, batch_size=500, completed=frozenset(), share=False):
+        """
+        A generator of all of the (dict of ticker -> dataframe, strategy) jobs of the vectorized backtester, a job per
+        batch of batch_size tickers and strategy. With share, the bars of memmap stores are sent as references.
+        """
+        tickers = list(self.tickers)
+        for first in range(0, len(tickers), batch_size):
+            frames = self._frames(tickers[first:first + batch_size])
+            for strategy in self.strategies:
+                todo = {ticker: self._job_bars(ticker, df, share) for ticker, df in frames.items()
+                        if (ticker, strategy.__name__) not in completed}
+                if todo:
+                    yield todo, strategy
+
+    def back_test_iter(self, processes=None, chunksize=1, precompute=False, batch_size=500, completed=frozenset(),
+                       engine="backtesting"):
+        """
+        Back tests every (ticker, strategy) pair within the universe and yields the stats of each run as soon as it is
+        completed. The jobs are sharded across a pool of worker processes, so the results come back out of order.
+
+        :param processes: the number of worker processes (defaults to the number of cores); 1 runs in this process
+        :param chunksize: the number of jobs that are sent to a worker at a time
+        :param precompute: whether to compute the indicators of the strategies for batch_size tickers at a time
+        (see Strategies.UniverseStrategy) instead of within every backtest
+        :param batch_size: the number of tickers that are loaded (and have their indicators computed) at a time
+        :param completed: a set of (ticker, strategy name) pairs that are skipped
+        :param engine: backtesting runs every backtest with Backtest.run, vector runs the strategies with the vectorized
+        backtester (see VectorBacktest), which only reports the core stats (# Trades, Win Rate [%], Return [%])
+        :return: a generator of (ticker, strategy name, stats)
+        """
+        share = processes != 1
+        if engine == "vector":
+            jobs, job = self._vector_back_test_jobs(batch_size, completed, share), _vector_back_test_job
+        elif engine == "backtesting":
+            jobs, job = self._back_test_jobs(precompute, batch_size, completed, share), _back_test_job
         else:
-            for exchange in c_exchanges:
-                directory = f"Exchanges/{exchange}/{self.interval}"
-                if not os.path.isdir(directory):
-                    os.mkdir(directory)
-
-                exchange_files = [file.strip(".pkl") for file in listdir(directory)]
-
-                file = open(f"Exchanges/{exchange}.csv", "r", encoding="utf-8")
-                csv_reader = csv.DictReader(file)
-
-                # if the list is empty
-                if not exchange_files:
-                    # we need to generate all of the dataframes and save it into that directory
-                    for row in csv_reader:
-                        ticker = row["Symbol"]
-
-                        if "/" in ticker:
-                            continue
-                        df = data(ticker, self.period, self.interval)
-                        # save these dataframes for future uses
-                        df.to_pickle(f"{directory}/{ticker}.pkl")
-                        tickers[ticker] = df
-                # if there are already dataframes that exist within the folders, we will just import those
-                else:
-                    for row in csv_reader:
-                        ticker = row["Symbol"]
-
-                        if "/" in ticker:
-                            continue
-                        # if the ticker already exists within the folder we just add them
-                        if ticker in exchange_files:
-                            df = pd.read_pickle(f"{directory}/{ticker}.pkl")
-                            tickers[ticker] = df
-                        # if it doesn't then we need to create them and save them
-                        else:
-                            df = data(ticker, self.period, self.interval)
-                            df.to_pickle(f"{directory}/{ticker}.pkl")
-                            tickers[ticker] = df
-        return tickers
-
-    def back_test(self):
+            raise ValueError(f"unknown engine {engine!r}, expected backtesting or vector")
+
+        def results(runs):
+            for run, captured in runs:
+                metrics.merge(captured)
+                # a vectorized job returns the runs of a whole batch
+                yield from run if engine == "vector" else (run,)
+
+        if processes == 1:
+            yield from results(map(job, jobs))
+            return
+
+        with Pool(processes) as pool:
+            yield from results(pool.imap_unordered(job, jobs, chunksize))
+
+    def _walk_forward_jobs(self, train: int, test: int, step: int = None, batch_size=500):
+        """
+        A generator of all of the (ticker, window, dataframe, strategy, precomputed indicators) jobs of a walk-forward
+        backtest, a job per window. The indicators of every UniverseStrategy are computed for batch_size tickers at a
+        time over their whole series, and every job only gets the bars and the indicators of its own window.
+        """
+        tickers = list(self.tickers)
+        for first in range(0, len(tickers), batch_size):
+            frames = self._frames(tickers[first:first + batch_size])
+            panel = BarPanel(frames) if frames else None
+
+            for strategy in self.strategies:
+                values = None
+                if panel is not None and issubclass(strategy, UniverseStrategy):
+                    with metrics.stage("batch_indicators"):
+                        values = strategy.batch_indicators(panel)
+
+                for ticker, df in frames.items():
+                    precomputed = panel.slices(values, ticker) if values is not None else None
+                    for window in walk_forward.windows(len(df), train, test, step):
+                        yield (ticker, window, df.iloc[window.train_start:window.test_end], strategy,
+                               walk_forward.slice_values(precomputed, window.train_start, window.test_end)
+                               if precomputed is not None else None)
+
+    def walk_forward_iter(self, train: int, test: int, step: int = None, processes=None, chunksize=1, batch_size=500,
+                          engine="backtesting"):
+        """
+        Splits every ticker into rolling windows of train bars followed by test bars (see WalkForward) and back tests
+        both segments of every window with every strategy, the indicators are computed once per ticker and sliced for
+        every window. The windows are sharded across a pool of worker processes, so the results come back out of order.
+
+        :param train: the number of bars of the train segment of every window (0 for only test segments)
+        :param test: the number of bars of the test segment of every window
+        :param step: the number of bars between the start of two windows (defaults to test)
+        :param processes: the number of worker processes (defaults to the number of cores); 1 runs in this process
+        :param chunksize: the number of jobs that are sent to a worker at a time
+        :param batch_size: the number of tickers that are loaded (and have their indicators computed) at a time
+        :param engine: backtesting runs every segment with Backtest.run, vector runs a whole batch of tickers with the
+        vectorized backtester (a job per batch and strategy)
+        :return: a generator of (ticker, strategy name, window, segment name, stats)
+        """
+        if engine == "vector":
+            jobs = ((frames, strategy, train, test, step)
+                    for frames, strategy in self._vector_back_test_jobs(batch_size, share=processes != 1))
+            job = _vector_walk_forward_job
+        elif engine == "backtesting":
+            jobs, job = self._walk_forward_jobs(train, test, step, batch_size), _walk_forward_job
+        else:
+            raise ValueError(f"unknown engine {engine!r}, expected backtesting or vector")
+
+        def results(runs):
+            for run, captured in runs:
+                metrics.merge(captured)
+                yield from run
+
+        if processes == 1:
+            yield from results(map(job, jobs))
+            return
+
+        with Pool(processes) as pool:
+            yield from results(pool.imap_unordered(job, jobs, chunksize))
+
+    def walk_forward(self, train: int, test: int, step: int = None, processes=None, chunksize=1, batch_size=500,
+                     engine="backtesting") -> pd.DataFrame:
+        """
+        Runs a walk-forward backtest of the universe (see walk_forward_iter).
+
+        :return: a dataframe with a row per (ticker, strategy, window, segment) of the bars of the segment and its
+        stats, sorted by ticker, strategy and window
+        """
+        rows = []
+        for ticker, strategy, window, segment, stats in self.walk_forward_iter(train, test, step, processes, chunksize,
+                                                                               batch_size, engine):
+            rows.append({"ticker": ticker, "strategy": strategy, "window": window.number, "segment": segment,
+                         "first_bar": window.train_start if segment == "train" else window.test_start,
+                         "last_bar": (window.test_start if segment == "train" else window.test_end) - 1,
+                         **flatten_stats(stats)})
+        if not rows:
+            return pd.DataFrame(columns=["ticker", "strategy", "window", "segment", "first_bar", "last_bar"])
+        return pd.DataFrame(rows).sort_values(["ticker", "strategy", "window", "segment"],
+                                              ascending=[True, True, True, False], ignore_index=True)
+
+    def back_test(self, processes=None, chunksize=1, precompute=False, batch_size=500, results_path=None,
+                  engine="backtesting"):
         """
         When this function is called, the program will go through the entire universe of stocks and back test each stock
-        using the Backtesting.py module.x
+        using the Backtesting.py module. self.win_rate is the mean of the non zero win rates and self.results holds the
+        running aggregates of the whole sweep (see Results.RunningStats).
+
+        :param processes: the number of worker processes (defaults to the number of cores); 1 runs in this process
+        :param chunksize: the number of jobs that are sent to a worker at a time
+        :param precompute: whether to compute the indicators of the strategies for batch_size tickers at a time
+        :param batch_size: the number of tickers that are loaded (and have their indicators computed) at a time
+        :param results_path: the directory the full stats of every run are appended to as they complete (see
+        Results.ResultsWriter), runs that are already within the directory are not run again
+        :param engine: backtesting or vector (see back_test_iter)
         :return:
         """
-        index = 0
-        for ticker in self.tickers:
-            df = self.tickers[ticker]
-            df = dropna(df)
+        writer = ResultsWriter(results_path) if results_path is not None else None
+        completed = writer.completed() if writer is not None else frozenset()
 
-            if df.empty:
-                continue
+        self.win_rate = []
+        self.results = writer.aggregates if writer is not None else RunningStats()
+        if writer is not None:
+            # the win rates of the runs of an interrupted sweep
+            previous = writer.previous
+            if not previous.empty:
+                self.win_rate = [win_rate for win_rate in previous["Win Rate [%]"].dropna() if win_rate != 0.0]
+
+        try:
+            runs = self.back_test_iter(processes, chunksize, precompute, batch_size, completed, engine)
+            for ticker, strategy, stats in runs:
+                if writer is not None:
+                    writer.append(ticker, strategy, stats)
+                else:
+                    self.results.update(flatten_stats(stats))
 
-            for strategy in self.strategies:
-                bt = Backtest(df, strategy, commission=0, exclusive_orders=True, cash=100000)
-                stats = bt.run()  # returns a pd.Series
                 win_rate = stats["Win Rate [%]"]
                 if math.isnan(win_rate) or win_rate == 0.0:
                     continue
                 self.win_rate.append(win_rate)
-            index += 1
-            if index == 100:
-                break
+        finally:
+            if writer is not None:
+                writer.flush()
+
+        self.win_rate = sum(self.win_rate) / len(self.win_rate) if self.win_rate else math.nan
+
+    def portfolio(self, strategy=None, cash=100000, max_positions=10, max_weight=0.1, score=None, tickers: list = None,
+                  **params) -> dict:
+        """
+        Back tests the tickers together as a single portfolio that shares its cash (see Portfolio), rather than every
+        ticker with its own cash.
+
+        :param strategy: a UniverseStrategy (defaults to the first strategy of the universe)
+        :param cash: the starting cash of the portfolio
+        :param max_positions: the most positions that are held at a time (None for no limit)
+        :param max_weight: the largest fraction of the equity a position is opened with (None for no limit)
+        :param score: a function (panel, indicators) -> (bar x ticker) array that ranks the entries (defaults to
+        Portfolio.momentum)
+        :param tickers: the tickers within the portfolio (defaults to the whole universe)
+        :param params: the parameters of the strategy that differ from the class defaults
+        :return: a dict of the stats, the equity and the trades of the portfolio
+        """
+        strategy = strategy if strategy is not None else self.strategies[0]
+        frames = self._frames(list(self.tickers) if tickers is None else tickers)
+        with metrics.stage("portfolio"):
+            return portfolio.run(frames, strategy, cash, max_positions, max_weight, score, **params)
+
+    def metrics_report(self) -> dict:
+        """
+        :return: the wall time of every stage, the counters (bytes read/downloaded, ...), the hit rates of the ticker and
+        indicator caches and the peak memory of everything that ran so far (see Metrics), Metrics.metrics.reset()
+        starts over
+        """
+        return metrics.report(caches={"tickers": self.tickers.cache, "indicators": indicators.cache})
+
+    def profile(self, ticker: str, strategy=None, path: str = None, engine="backtesting", limit: int = 30) -> dict:
+        """
+        Runs a single backtest within this process under cProfile.
+
+        :param ticker: the ticker that is back tested
+        :param strategy: the strategy (defaults to the first strategy of the universe)
+        :param path: a file the raw profile is dumped to
+        :param engine: backtesting or vector
+        :param limit: the number of functions within the hot paths
+        :return: a dict of the stats of the run and the hot paths (the slowest functions by cumulative time) as text
+        """
+        strategy = strategy if strategy is not None else self.strategies[0]
+        df = self._frames([ticker])[ticker]
+        with profile(path, limit=limit) as profiled:
+            if engine == "vector":
+                (run,), _ = _vector_back_test_job(({ticker: df}, strategy))
+            else:
+                run, _ = _back_test_job((ticker, df, strategy, None))
+        return {"stats": run[2], "hot_paths": profiled["hot_paths"]}
+
+    def stream(self, strategy=None, source=None, **params):
+        """
+        Evaluates a strategy on every bar of every ticker as the bars come in, with indicators that are updated one bar
+        at a time (see Streaming).
+
+        :param strategy: the strategy (defaults to the first strategy of the universe)
+        :param source: an iterable of (ticker, Streaming.Bar) in time order (defaults to a replay of the cached bars of
+        the universe)
+        :param params: the parameters of the strategy that differ from the class defaults
+        :return: a generator of (ticker, bar time, signal)
+        """
+        stream = Stream(strategy if strategy is not None else self.strategies[0], **params)
+        source = source if source is not None else ReplaySource(self._frames(list(self.tickers)))
+        return stream.run(source)
 
-        self.win_rate = sum(self.win_rate) / len(self.win_rate)
+    def optimize(self, strategy, combinations: list, **kwargs) -> pd.DataFrame:
+        """
+        Searches the parameters of a strategy over the whole universe (see Optimizer).
+
+        :param strategy: the strategy class, its parameters must be class attributes
+        :param combinations: a list of parameter dicts (see Optimizer.grid and Optimizer.random_search)
+        :param kwargs: the keyword arguments of Optimizer (maximize, results_path, processes, round_size, ...)
+        :return: a dataframe of the score of every combination, the best combination first
+        """
+        return Optimizer(self, strategy, **kwargs).run(combinations)
 
     @staticmethod
     def list_of_countries():
@@ -460,13 +1007,7 @@ class Universe:
 
 
 if __name__ == '__main__':
-    universe = Universe([VolumeIndicatorOBV], interval="5m")
-
-    # print(len(universe.exchange_dfs["NYSE"]) + len(universe.exchange_dfs["NASDAQ"]) + len(universe.exchange_dfs["AMEX"]))
-    # pd.set_option("display.max_rows", None, "display.max_columns", None)
-    print(universe.screener)
-    # universe.back_test()
-    # print(universe.win_rate)
+    # the command line lives within QuantStocks.py, e.g. python QuantStocks.py screen
+    from QuantStocks import main
 
-    # print(data.columns.tolist())
-    # print(data["Float Shorted (%)"])
+    main()
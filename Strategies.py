@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from ta.utils import dropna
 import Indicators as indicators
+import NumpyIndicators as np_indicators
+from Metrics import metrics
 from backtesting import Backtest, Strategy
 from backtesting.test import SMA
 from backtesting.lib import crossover
@@ -10,10 +12,69 @@ from backtesting.lib import crossover
 # df = dropna(df)
 
 
-class VolumeIndicatorOBV(Strategy):
+class UniverseStrategy(Strategy):
     """
+    A strategy whose indicators can be computed ahead of time for the whole universe at once (see batch_indicators).
+    When a backtest is run with precomputed={name: values}, the precomputed values are used instead of computing the
+    indicators within init.
+    """
+    precomputed = None
+
+    def indicator(self, name, func, *args, **kwargs):
+        """
+        The same as self.I, except that the precomputed values of the indicator are used when there are any.
+
+        :param name: the name of the indicator (the key within precomputed)
+        :param func: the function that computes the indicator
+        """
+        # the time spent on the indicators is the indicators stage of the metrics (see Metrics)
+        with metrics.stage("indicators"):
+            if self.precomputed is not None and name in self.precomputed:
+                metrics.count("precomputed_indicators")
+                values = self.precomputed[name]
+                return self.I(lambda: values, name=name)
+            return self.I(func, *args, name=name, **kwargs)
+
+    @classmethod
+    def batch_indicators(cls, panel, **params) -> dict:
+        """
+        Computes the indicators of every ticker within the panel in a single pass.
+
+        :param panel: a Panel.BarPanel
+        :param params: the parameters of the strategy that differ from the class defaults
+        :return: a dict of indicator name -> (bar x ticker) array
+        """
+        raise NotImplementedError
 
+    @classmethod
+    def signals(cls, panel, values, **params) -> dict:
+        """
+        The rules of next as (bar x ticker) arrays, which lets the strategy be run by the vectorized backtester (see
+        VectorBacktest).
+
+        :param panel: a Panel.BarPanel
+        :param values: the indicators returned by batch_indicators
+        :param params: the parameters of the strategy that differ from the class defaults
+        :return: a dict of the boolean arrays buy, sell and close (the bars at which a long position is opened, a short
+        position is opened and the position is closed, any of them can be left out) and the take_profit/stop_loss (in
+        dollars) of a position
+        """
+        raise NotImplementedError
+
+
+class VolumeIndicatorOBV(UniverseStrategy):
     """
+
+    """
+    # the windows of the EMAs of the price and of the first derivative of the OBV
+    short_ema = 9
+    long_ema = 15
+    short_obv_ema = 50
+    long_obv_ema = 200
+    # the profit/loss (in dollars) at which a position is closed
+    take_profit = 30
+    stop_loss = 10
+
     def init(self):
         # all of the closing prices
         high = pd.Series(self.data.High)
@@ -22,28 +83,51 @@ class VolumeIndicatorOBV(Strategy):
         time = pd.Series(self.data.index)
         volume = pd.Series(self.data.Volume)
 
-        first_derivative_obv = indicators.first_derivative_obv(price, volume, time)
+        def first_derivative_obv():
+            return indicators.first_derivative_obv(price, volume, time)
+
         # EMAs for checking bullish/bearish sentiments
-        self.shortTermEMA = self.I(indicators.ema, price, 9)
-        self.longTermEMA = self.I(indicators.ema, price, 15)
+        self.shortTermEMA = self.indicator("ShortTermEMA", indicators.ema, price, self.short_ema)
+        self.longTermEMA = self.indicator("LongTermEMA", indicators.ema, price, self.long_ema)
 
         # EMAs of OBV
-        self.shortTermDerivativeOBV = self.I(indicators.ema, first_derivative_obv, 50)
-        self.longTermDerivativeOBV = self.I(indicators.ema, first_derivative_obv, 200)
+        self.shortTermDerivativeOBV = self.indicator("ShortTermDerivativeOBV",
+                                                     lambda: indicators.ema(first_derivative_obv(), self.short_obv_ema))
+        self.longTermDerivativeOBV = self.indicator("LongTermDerivativeOBV",
+                                                    lambda: indicators.ema(first_derivative_obv(), self.long_obv_ema))
 
         # VWAP
-        self.vwap = self.I(indicators.vwap, high, low, price, volume)
+        self.vwap = self.indicator("VWAP", indicators.vwap, high, low, price, volume)
 
         # OBV
-        self.obv = self.I(indicators.obv, price, volume)
+        self.obv = self.indicator("OBV", indicators.obv, price, volume)
+
+    @classmethod
+    def batch_indicators(cls, panel, **params) -> dict:
+        high, low, price, volume = panel["High"], panel["Low"], panel["Close"], panel["Volume"]
+        first_derivative_obv = np_indicators.first_derivative_obv(price, volume, panel.time)
+        return {"ShortTermEMA": np_indicators.ema(price, params.get("short_ema", cls.short_ema)),
+                "LongTermEMA": np_indicators.ema(price, params.get("long_ema", cls.long_ema)),
+                "ShortTermDerivativeOBV": np_indicators.ema(first_derivative_obv,
+                                                            params.get("short_obv_ema", cls.short_obv_ema)),
+                "LongTermDerivativeOBV": np_indicators.ema(first_derivative_obv,
+                                                           params.get("long_obv_ema", cls.long_obv_ema)),
+                "VWAP": np_indicators.vwap(high, low, price, volume), "OBV": np_indicators.obv(price, volume)}
+
+    @classmethod
+    def signals(cls, panel, values, **params) -> dict:
+        return {"buy": np_indicators.crossover(values["ShortTermDerivativeOBV"], values["LongTermDerivativeOBV"]),
+                "close": np_indicators.crossover(values["VWAP"], panel["Close"]),
+                "take_profit": params.get("take_profit", cls.take_profit),
+                "stop_loss": params.get("stop_loss", cls.stop_loss)}
 
     def next(self):
         # we need to check if the short term OBV also crossed above the long term OBV
         if crossover(self.shortTermDerivativeOBV, self.longTermDerivativeOBV):
             # we buy
             self.buy()
-        # we also want to sell when the profit/loss is 150 or 100 respectively
-        elif self.position.pl >= 30 or self.position.pl <= -10:
+        # we also want to sell when the profit/loss reaches the take profit or the stop loss respectively
+        elif self.position.pl >= self.take_profit or self.position.pl <= -self.stop_loss:
             # print(self.position.pl)
             self.position.close()
         # a sell signal if the vwap crosses above the closing price
@@ -54,15 +138,31 @@ class VolumeIndicatorOBV(Strategy):
         # print(self.data.Close.s[-1])
 
 
-class GoldenCross(Strategy):
+class GoldenCross(UniverseStrategy):
+    short_ema = 20
+    short_sma = 50
+    long_sma = 200
+
     def init(self):
         # this is the place to create all of the indicators that needs to be used
         # the self.I takes in an indicator function that returns a pandas series
         # however, the self.I function returns a pandas ndarray
         price = pd.Series(self.data.Close)  # of type series
-        self.shortEMA = self.I(indicators.ema, price, 20)
-        self.shortSMA = self.I(SMA, price, 50)  # this is a np.ndarray
-        self.longSMA = self.I(SMA, price, 200)  # this is a np.ndarray
+        self.shortEMA = self.indicator("ShortEMA", indicators.ema, price, self.short_ema)
+        self.shortSMA = self.indicator("ShortSMA", SMA, price, self.short_sma)  # this is a np.ndarray
+        self.longSMA = self.indicator("LongSMA", SMA, price, self.long_sma)  # this is a np.ndarray
+
+    @classmethod
+    def batch_indicators(cls, panel, **params) -> dict:
+        price = panel["Close"]
+        return {"ShortEMA": np_indicators.ema(price, params.get("short_ema", cls.short_ema)),
+                "ShortSMA": np_indicators.sma(price, params.get("short_sma", cls.short_sma)),
+                "LongSMA": np_indicators.sma(price, params.get("long_sma", cls.long_sma))}
+
+    @classmethod
+    def signals(cls, panel, values, **params) -> dict:
+        return {"buy": np_indicators.crossover(values["ShortSMA"], values["LongSMA"]),
+                "sell": np_indicators.crossover(values["LongSMA"], values["ShortSMA"])}
 
     def next(self):
         if crossover(self.shortSMA, self.longSMA):
@@ -0,0 +1,430 @@
+"""
+Streaming versions of the indicators and strategies. Every indicator keeps a constant amount of state and is updated
+with one bar at a time, so that a new bar costs the same no matter how long the history is, and the values are the
+same as the ones of Indicators.py/NumpyIndicators.py over the whole series. The bars come from a source, any iterable
+of (ticker, Bar) in time order (see ReplaySource), and a Stream evaluates a strategy on every ticker as its bars come in.
+"""
+import math
+import time as clock
+from collections import deque, namedtuple
+import numpy as np
+import pandas as pd
+from Strategies import VolumeIndicatorOBV, GoldenCross
+
+Bar = namedtuple("Bar", ["time", "Open", "High", "Low", "Close", "Volume"])
+
+
+class EMA:
+    """
+    The recursive (adjust=False) exponential moving average, NaN until `periods` values were seen.
+    """
+
+    def __init__(self, periods: int = 14, alpha: float = None):
+        self.periods = periods
+        self.alpha = 2 / (periods + 1) if alpha is None else alpha
+        self.count = 0
+        self._average = math.nan
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        if math.isnan(value):
+            return self.value
+
+        self.count += 1
+        self._average = value if self.count == 1 else self.alpha * value + (1 - self.alpha) * self._average
+        self.value = self._average if self.count >= self.periods else math.nan
+        return self.value
+
+
+class Rolling:
+    """
+    A window of the last `periods` values, NaN (for every statistic) until the window is full.
+    """
+
+    def __init__(self, periods: int = 14):
+        self.periods = periods
+        self.window = deque(maxlen=periods)
+
+    def update(self, value: float):
+        self.window.append(value)
+
+    @property
+    def full(self) -> bool:
+        return len(self.window) == self.periods
+
+    def sum(self) -> float:
+        return math.fsum(self.window) if self.full else math.nan
+
+    def mean(self) -> float:
+        return self.sum() / self.periods
+
+    def std(self) -> float:
+        if not self.full:
+            return math.nan
+        mean = self.mean()
+        return math.sqrt(math.fsum((value - mean) ** 2 for value in self.window) / self.periods)
+
+
+class SMA:
+    def __init__(self, periods: int = 14):
+        self._window = Rolling(periods)
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        self._window.update(value)
+        self.value = self._window.mean()
+        return self.value
+
+
+class BollingerBands:
+    def __init__(self, periods: int = 20, std: float = 2):
+        self._window = Rolling(periods)
+        self.std = std
+        self.value = {}
+
+    def update(self, close: float) -> dict:
+        self._window.update(close)
+        middle = self._window.mean()
+        deviation = self._window.std()
+        high, low = middle + self.std * deviation, middle - self.std * deviation
+        self.value = {"HighBands": high, "LowBands": low, "MiddleBands": middle,
+                      "HighBands_I": 1.0 if close > high else 0.0, "LowBands_I": 1.0 if close < low else 0.0}
+        return self.value
+
+
+class OBV:
+    def __init__(self):
+        self._previous = math.nan
+        self.value = 0.0
+
+    def update(self, close: float, volume: float) -> float:
+        self.value += -volume if close < self._previous else volume
+        self._previous = close
+        return self.value
+
+
+class VWAP:
+    def __init__(self, period: int = 14):
+        self._price_volume = Rolling(period)
+        self._volume = Rolling(period)
+        self.value = math.nan
+
+    def update(self, high: float, low: float, close: float, volume: float) -> float:
+        self._price_volume.update((high + low + close) / 3.0 * volume)
+        self._volume.update(volume)
+        volumes = self._volume.sum()
+        self.value = self._price_volume.sum() / volumes if volumes else math.nan
+        return self.value
+
+
+class RSI:
+    def __init__(self, periods: int = 14):
+        self._up = EMA(periods, alpha=1 / periods)
+        self._down = EMA(periods, alpha=1 / periods)
+        self._previous = math.nan
+        self.value = math.nan
+
+    def update(self, close: float) -> float:
+        diff = close - self._previous
+        self._previous = close
+        up = self._up.update(diff if diff > 0 else 0.0)
+        down = self._down.update(-diff if diff < 0 else 0.0)
+        if math.isnan(up) or math.isnan(down):
+            self.value = math.nan
+        else:
+            self.value = 100.0 if down == 0 else 100 - (100 / (1 + up / down))
+        return self.value
+
+
+class ATR:
+    def __init__(self, periods: int = 14):
+        self.periods = periods
+        self._previous = math.nan
+        self._true_ranges = []
+        self.value = 0.0
+
+    def update(self, close: float, low: float, high: float) -> float:
+        true_range = high - low
+        if not math.isnan(self._previous):
+            true_range = max(true_range, abs(high - self._previous), abs(low - self._previous))
+        self._previous = close
+
+        # the first value is the mean of the first `periods` true ranges, after that it is a Wilder moving average
+        if self._true_ranges is not None:
+            self._true_ranges.append(true_range)
+            if len(self._true_ranges) == self.periods:
+                self.value = sum(self._true_ranges) / self.periods
+                self._true_ranges = None
+            return self.value
+
+        self.value += (true_range - self.value) / self.periods
+        return self.value
+
+
+class FirstDerivativeOBV:
+    """
+    The rate of change of the OBV per millisecond, 0 for the first bar.
+    """
+
+    def __init__(self):
+        self._obv = OBV()
+        self._previous = None
+        self.value = 0.0
+
+    def update(self, close: float, volume: float, time) -> float:
+        previous_obv = self._obv.value
+        obv = self._obv.update(close, volume)
+        time = pd.Timestamp(time)
+        if self._previous is not None:
+            # numpy division, so that bars with the same timestamp give inf/NaN like the batch indicator
+            delta_time = np.float64((time - self._previous) / pd.Timedelta(1, "ms"))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.value = float(np.float64(obv - previous_obv) / delta_time)
+        self._previous = time
+        return self.value
+
+
+class Crossover:
+    """
+    True on the bar at which the first value just crossed over the second one (see backtesting.lib.crossover).
+    """
+
+    def __init__(self):
+        self._previous = (math.nan, math.nan)
+
+    def update(self, first: float, second: float) -> bool:
+        crossed = self._previous[0] < self._previous[1] and first > second
+        self._previous = (first, second)
+        return crossed
+
+
+class StreamingStrategy:
+    """
+    Evaluates a strategy on the bars of a single ticker one bar at a time. The position follows the same rules as the
+    backtests (the order of a bar is filled at the open of the next bar, a buy/sell closes the position and opens a
+    new one with all of the cash, and nothing is traded until every indicator had a value), so the take profit and
+    stop loss are evaluated on the same position a backtest would hold.
+    """
+
+    def __init__(self, cash: float = 100000):
+        self.cash = cash
+        self.size = 0
+        self.entry = math.nan
+        self.pending = None
+        # the profit/loss of every closed trade
+        self.trades = []
+        self._pl = 0.0
+        self._seen = set()
+        self._ready = False
+
+    def indicators(self, bar: Bar) -> dict:
+        """
+        Updates the indicators (and crossovers) with the bar.
+
+        :return: a dict of indicator name -> value
+        """
+        raise NotImplementedError
+
+    def signal(self, bar: Bar):
+        """
+        :return: buy, sell, close or None
+        """
+        raise NotImplementedError
+
+    @property
+    def pl(self) -> float:
+        """
+        :return: the profit/loss of the open position at the close of the last bar
+        """
+        return self._pl
+
+    def update(self, bar: Bar):
+        """
+        :param bar: the next bar of the ticker
+        :return: the signal of the bar (buy, sell, close or None), the order is filled at the open of the next bar
+        """
+        if self.pending is not None:
+            self._fill(self.pending, float(bar.Open))
+
+        self._pl = self.size * (float(bar.Close) - self.entry) if self.size else 0.0
+        values = self.indicators(bar)
+        signal = self.signal(bar) if self._ready else None
+        if signal == "close" and not self.size:
+            signal = None
+
+        # the strategy only acts on the bars after every indicator had its first value
+        self._seen.update(name for name, value in values.items() if not math.isnan(value))
+        self._ready = len(self._seen) == len(values)
+
+        self.pending = signal
+        return signal
+
+    def _fill(self, order: str, price: float):
+        if self.size:
+            self.trades.append(self.size * (price - self.entry))
+            self.cash += self.trades[-1]
+            self.size = 0
+        if order in ("buy", "sell"):
+            self.size = (1 if order == "buy" else -1) * int(self.cash * (1 - np.finfo(float).eps) // price)
+            self.entry = price
+        self.pending = None
+
+
+class StreamingVolumeIndicatorOBV(StreamingStrategy):
+    """
+    Strategies.VolumeIndicatorOBV one bar at a time.
+    """
+
+    def __init__(self, cash: float = 100000, **params):
+        super().__init__(cash)
+        defaults = VolumeIndicatorOBV
+        self.take_profit = params.get("take_profit", defaults.take_profit)
+        self.stop_loss = params.get("stop_loss", defaults.stop_loss)
+        self._short_ema = EMA(params.get("short_ema", defaults.short_ema))
+        self._long_ema = EMA(params.get("long_ema", defaults.long_ema))
+        self._derivative = FirstDerivativeOBV()
+        self._short_obv_ema = EMA(params.get("short_obv_ema", defaults.short_obv_ema))
+        self._long_obv_ema = EMA(params.get("long_obv_ema", defaults.long_obv_ema))
+        self._vwap = VWAP()
+        self._obv = OBV()
+        self._obv_crossover = Crossover()
+        self._vwap_crossover = Crossover()
+        self._crossed = {}
+
+    def indicators(self, bar: Bar) -> dict:
+        close, volume = float(bar.Close), float(bar.Volume)
+        derivative = self._derivative.update(close, volume, bar.time)
+        values = {"ShortTermEMA": self._short_ema.update(close), "LongTermEMA": self._long_ema.update(close),
+                  "ShortTermDerivativeOBV": self._short_obv_ema.update(derivative),
+                  "LongTermDerivativeOBV": self._long_obv_ema.update(derivative),
+                  "VWAP": self._vwap.update(float(bar.High), float(bar.Low), close, volume),
+                  "OBV": self._obv.update(close, volume)}
+        self._crossed = {"obv": self._obv_crossover.update(values["ShortTermDerivativeOBV"],
+                                                           values["LongTermDerivativeOBV"]),
+                         "vwap": self._vwap_crossover.update(values["VWAP"], close)}
+        return values
+
+    def signal(self, bar: Bar):
+        if self._crossed["obv"]:
+            return "buy"
+        if self.size and (self.pl >= self.take_profit or self.pl <= -self.stop_loss):
+            return "close"
+        if self._crossed["vwap"]:
+            return "close"
+        return None
+
+
+class StreamingGoldenCross(StreamingStrategy):
+    """
+    Strategies.GoldenCross one bar at a time.
+    """
+
+    def __init__(self, cash: float = 100000, **params):
+        super().__init__(cash)
+        self._short_ema = EMA(params.get("short_ema", GoldenCross.short_ema))
+        self._short_sma = SMA(params.get("short_sma", GoldenCross.short_sma))
+        self._long_sma = SMA(params.get("long_sma", GoldenCross.long_sma))
+        self._up = Crossover()
+        self._down = Crossover()
+        self._crossed = {}
+
+    def indicators(self, bar: Bar) -> dict:
+        close = float(bar.Close)
+        values = {"ShortEMA": self._short_ema.update(close), "ShortSMA": self._short_sma.update(close),
+                  "LongSMA": self._long_sma.update(close)}
+        self._crossed = {"up": self._up.update(values["ShortSMA"], values["LongSMA"]),
+                         "down": self._down.update(values["LongSMA"], values["ShortSMA"])}
+        return values
+
+    def signal(self, bar: Bar):
+        if self._crossed["up"]:
+            return "buy"
+        if self._crossed["down"]:
+            return "sell"
+        return None
+
+
+# strategy -> its streaming version
+STRATEGIES = {VolumeIndicatorOBV: StreamingVolumeIndicatorOBV, GoldenCross: StreamingGoldenCross}
+
+
+class ReplaySource:
+    """
+    A bar source that replays cached bars, the bars of every ticker are merged into a single stream in time order.
+    """
+
+    def __init__(self, frames: dict, delay: float = 0):
+        """
+        :param frames: a dict of ticker -> dataframe
+        :param delay: the number of seconds to wait between two timestamps (0 replays as fast as possible)
+        """
+        self.frames = frames
+        self.delay = delay
+
+    @classmethod
+    def from_store(cls, store, symbols: list = None, start=None, end=None, delay: float = 0):
+        """
+        :param store: a store of PriceStore
+        :param symbols: the tickers that are replayed (defaults to every ticker of the store)
+        :param start: the first timestamp that is replayed
+        :param end: the last timestamp that is replayed
+        """
+        symbols = sorted(store.symbols()) if symbols is None else symbols
+        return cls(store.load(symbols, start=start, end=end), delay)
+
+    def __iter__(self):
+        frames = [df[list(Bar._fields[1:])].assign(Ticker=ticker, time=df.index) for ticker, df in self.frames.items()
+                  if not df.empty]
+        if not frames:
+            return
+
+        bars = pd.concat(frames, ignore_index=True)
+        bars["time"] = pd.to_datetime(bars["time"], utc=True)
+        bars = bars.sort_values("time", kind="stable")
+
+        previous = None
+        for row in bars.itertuples(index=False):
+            if self.delay and previous is not None and row.time != previous:
+                clock.sleep(self.delay)
+            previous = row.time
+            yield row.Ticker, Bar(row.time, row.Open, row.High, row.Low, row.Close, row.Volume)
+
+
+class Stream:
+    """
+    Evaluates a strategy on every ticker of a bar source as the bars come in. The state of every ticker is created on
+    its first bar.
+    """
+
+    def __init__(self, strategy=VolumeIndicatorOBV, cash: float = 100000, **params):
+        """
+        :param strategy: a strategy of Strategies that has a streaming version (see STRATEGIES)
+        :param cash: the cash of every ticker
+        :param params: the parameters of the strategy that differ from the class defaults
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"{strategy.__name__} has no streaming version")
+        self.strategy = strategy
+        self.cash = cash
+        self.params = params
+        # ticker -> StreamingStrategy
+        self.states = {}
+
+    def update(self, ticker: str, bar: Bar):
+        """
+        :return: the signal of the bar (buy, sell, close or None)
+        """
+        state = self.states.get(ticker)
+        if state is None:
+            state = self.states[ticker] = STRATEGIES[self.strategy](self.cash, **self.params)
+        return state.update(bar)
+
+    def run(self, source):
+        """
+        :param source: an iterable of (ticker, Bar) in time order
+        :return: a generator of (ticker, bar time, signal) of every bar with a signal
+        """
+        for ticker, bar in source:
+            signal = self.update(ticker, bar)
+            if signal is not None:
+                yield ticker, bar.time, signal
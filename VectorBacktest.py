@@ -0,0 +1,199 @@
+"""
+A vectorized backtester for strategies whose rules are crossovers and profit/loss thresholds (see
+Strategies.UniverseStrategy.signals). The indicators and the buy/sell/close signals of every ticker are computed as
+(bar x ticker) arrays in a single pass, and positions are simulated from one signal to the next instead of one bar at a
+time. The simulation follows the rules of backtesting.py's Backtest(commission=0, exclusive_orders=True):
+
+* an order placed on a bar is filled at the open of the next bar
+* a buy (sell) closes the open position and opens a long (short) position with all of the cash
+* the first bar is the one after every indicator has a value
+* positions that are still open at the end are closed at the open of the last bar
+
+so that # Trades, Win Rate [%] and Return [%] match Backtest.run (see compare).
+"""
+import sys
+import math
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+from Panel import BarPanel
+
+# the stats that are the same for both engines
+CORE_STATS = ("# Trades", "Win Rate [%]", "Return [%]", "Equity Final [$]")
+
+
+def warmup(indicators: dict) -> np.ndarray:
+    """
+    :param indicators: a dict of name -> (bar x ticker) array
+    :return: the first bar of every ticker at which the strategy is run, the same way backtesting.py picks it (one bar
+    after the first value of the slowest indicator)
+    """
+    firsts = [np.isnan(np.asarray(values, dtype=float)).argmin(axis=0) for values in indicators.values()]
+    return 1 + np.max(firsts, axis=0) if firsts else 0
+
+
+def _next_index(indices: np.ndarray, bar: int, default: int) -> int:
+    """
+    :return: the first of the sorted indices that is at or after the bar (default when there is none)
+    """
+    position = np.searchsorted(indices, bar)
+    return int(indices[position]) if position < len(indices) else default
+
+
+def _first_hit(close: np.ndarray, bar: int, size: int, entry: float, take_profit, stop_loss) -> int:
+    """
+    :return: the first bar at or after bar whose profit/loss reaches the take profit or the stop loss (len(close) when
+    there is none). The bars are searched in growing windows so that a short trade does not scan the whole series.
+    """
+    if take_profit is None and stop_loss is None:
+        return len(close)
+
+    window = 64
+    while bar < len(close):
+        stop = min(bar + window, len(close))
+        pl = size * (close[bar:stop] - entry)
+        hits = np.zeros(len(pl), dtype=bool)
+        if take_profit is not None:
+            hits |= pl >= take_profit
+        if stop_loss is not None:
+            hits |= pl <= -stop_loss
+        if hits.any():
+            return bar + int(hits.argmax())
+        bar, window = stop, window * 2
+    return len(close)
+
+
+def simulate(open_: np.ndarray, close: np.ndarray, buy: np.ndarray, sell: np.ndarray, exit_: np.ndarray, start: int,
+             cash: float = 100000, take_profit=None, stop_loss=None) -> dict:
+    """
+    Simulates the trades of a single ticker. On every bar a buy signal comes first, then a sell signal, then the take
+    profit/stop loss of the open position and then the close signal.
+
+    :param open_: the opening prices
+    :param close: the closing prices
+    :param buy: the bars at which a long position is opened
+    :param sell: the bars at which a short position is opened
+    :param exit_: the bars at which the open position is closed
+    :param start: the first bar at which the signals are acted on
+    :param cash: the starting cash
+    :param take_profit: the profit (in dollars) of the open position at which it is closed (None for no take profit)
+    :param stop_loss: the loss (in dollars) of the open position at which it is closed (None for no stop loss)
+    :return: a dict of the profit/loss of every closed trade (pl) and the final equity
+    """
+    bars = len(close)
+    pls = []
+    if start >= bars:
+        return {"pl": np.array(pls), "equity": cash}
+
+    entries = np.flatnonzero(buy[start:] | sell[start:]) + start
+    signals = np.flatnonzero(buy[start:] | sell[start:] | exit_[start:]) + start
+
+    size, entry, bar = 0, math.nan, start
+    while True:
+        if size:
+            order_bar = min(_next_index(signals, bar, bars), _first_hit(close, bar, size, entry, take_profit, stop_loss))
+        else:
+            order_bar = _next_index(entries, bar, bars)
+        if order_bar >= bars:
+            break
+
+        # the orders placed on the last bar are filled at its own open
+        fill = min(order_bar + 1, bars - 1)
+        price = float(open_[fill])
+        if size:
+            pls.append(size * (price - entry))
+            cash += pls[-1]
+            size = 0
+
+        direction = 1 if buy[order_bar] else -1 if sell[order_bar] else 0
+        if direction:
+            size = direction * int(cash * (1 - sys.float_info.epsilon) // price)
+            entry = price
+        if order_bar == bars - 1:
+            # a position opened on the last bar is never closed, it only counts towards the equity
+            return {"pl": np.array(pls), "equity": cash + size * (float(close[-1]) - entry) if size else cash}
+        bar = fill
+
+    if size:
+        pls.append(size * (float(open_[-1]) - entry))
+        cash += pls[-1]
+    return {"pl": np.array(pls), "equity": cash}
+
+
+def result_stats(result: dict, cash: float, index: pd.Index) -> pd.Series:
+    """
+    :return: the core stats of the result of simulate over the bars of the index
+    """
+    pl = result["pl"]
+    return pd.Series({"Start": index[0] if len(index) else None, "End": index[-1] if len(index) else None,
+                      "# Trades": len(pl), "Win Rate [%]": (pl > 0).sum() / len(pl) * 100 if len(pl) else math.nan,
+                      "Return [%]": (result["equity"] - cash) / cash * 100, "Equity Final [$]": result["equity"]},
+                     dtype=object)
+
+
+def simulate_frames(frames: dict, strategy, cash: float = 100000, **params) -> dict:
+    """
+    Simulates the trades of every ticker with the strategy at once.
+
+    :param frames: a dict of ticker -> dataframe (without NaNs)
+    :param strategy: a strategy class that implements batch_indicators and signals (see Strategies.UniverseStrategy)
+    :param cash: the starting cash of every ticker
+    :param params: the parameters of the strategy that differ from the class defaults
+    :return: a dict of ticker -> the result of simulate
+    """
+    for name in params:
+        if not hasattr(strategy, name):
+            raise AttributeError(f"{strategy.__name__} has no parameter {name!r}")
+
+    if not frames:
+        return {}
+    panel = BarPanel(frames)
+    values = strategy.batch_indicators(panel, **params)
+    signals = strategy.signals(panel, values, **params)
+    starts = np.broadcast_to(warmup(values), len(panel))
+
+    # the signals that a strategy does not use are never set
+    no_signal = np.zeros(panel["Close"].shape, dtype=bool)
+    buy, sell, exit_ = (signals.get(name, no_signal) for name in ("buy", "sell", "close"))
+
+    results = {}
+    for position, ticker in enumerate(panel.tickers):
+        bars = panel.lengths[position]
+        results[ticker] = simulate(panel["Open"][:bars, position], panel["Close"][:bars, position], buy[:bars, position],
+                                   sell[:bars, position], exit_[:bars, position], int(starts[position]), cash,
+                                   signals.get("take_profit"), signals.get("stop_loss"))
+    return results
+
+
+def run(frames: dict, strategy, cash: float = 100000, **params) -> dict:
+    """
+    Back tests every ticker with the strategy at once (see simulate_frames).
+
+    :return: a dict of ticker -> stats
+    """
+    return {ticker: result_stats(result, cash, frames[ticker].index)
+            for ticker, result in simulate_frames(frames, strategy, cash, **params).items()}
+
+
+def back_test(df: pd.DataFrame, strategy, cash: float = 100000, **params) -> pd.Series:
+    """
+    :return: the stats of a single ticker (see run)
+    """
+    return run({"ticker": df}, strategy, cash, **params)["ticker"]
+
+
+def compare(df: pd.DataFrame, strategy, cash: float = 100000, **params) -> pd.DataFrame:
+    """
+    Back tests a ticker with both Backtest.run and the vectorized backtester. Backtest.run is given the same
+    precomputed indicators, so any difference comes from the simulation and not from the indicator backends.
+
+    :return: a dataframe of the core stats (rows) of each engine (columns)
+    """
+    values = strategy.batch_indicators(BarPanel({"ticker": df}), **params)
+    precomputed = {name: np.ascontiguousarray(array[:, 0]) for name, array in values.items()}
+
+    bt = Backtest(df, strategy, commission=0, exclusive_orders=True, cash=cash)
+    expected = bt.run(precomputed=precomputed, **params)
+    actual = back_test(df, strategy, cash, **params)
+    return pd.DataFrame({"backtesting": [expected[key] for key in CORE_STATS],
+                         "vector": [actual[key] for key in CORE_STATS]}, index=list(CORE_STATS))
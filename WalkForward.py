@@ -0,0 +1,108 @@
+"""
+Walk-forward backtesting: every ticker is split into rolling windows of `train` bars followed by `test` bars, which
+move forward `step` bars at a time, and both segments of every window are back tested on their own. The indicators are
+computed once over the whole series (see Strategies.UniverseStrategy.batch_indicators) and sliced for every segment,
+so the first bar of a segment already has the indicator values of the bars before it instead of warming up again.
+"""
+from collections import namedtuple
+import numpy as np
+from backtesting import Backtest
+import VectorBacktest as vector
+from Panel import BarPanel
+
+# the bar positions of a window, the train segment is [train_start, test_start) and the test segment is
+# [test_start, test_end)
+Window = namedtuple("Window", ["number", "train_start", "test_start", "test_end"])
+
+
+def windows(bars: int, train: int, test: int, step: int = None) -> list:
+    """
+    :param bars: the number of bars of the ticker
+    :param train: the number of bars of the train segment of every window (0 for only test segments)
+    :param test: the number of bars of the test segment of every window
+    :param step: the number of bars between the start of two windows (defaults to test, so the test segments do not
+    overlap)
+    :return: a list of the windows that fit within the bars
+    """
+    step = test if step is None else step
+    if train < 0 or test < 1 or step < 1:
+        raise ValueError(f"expected train >= 0, test >= 1 and step >= 1, got {train}, {test} and {step}")
+    return [Window(number, start, start + train, start + train + test)
+            for number, start in enumerate(range(0, bars - train - test + 1, step))]
+
+
+def segments(window: Window) -> list:
+    """
+    :return: a list of (segment name, first bar, last bar + 1) of the window, an empty train segment is left out
+    """
+    result = [("train", window.train_start, window.test_start)] if window.test_start > window.train_start else []
+    return result + [("test", window.test_start, window.test_end)]
+
+
+def slice_values(values: dict, start: int, stop: int) -> dict:
+    """
+    :param values: a dict of name -> the values of an indicator over the whole series
+    :return: a dict of name -> the values of the indicator within [start, stop)
+    """
+    return {name: np.ascontiguousarray(array[start:stop]) for name, array in values.items()}
+
+
+def back_test(df, strategy, window: Window, precomputed: dict = None, cash: float = 100000) -> list:
+    """
+    Back tests both segments of a window with Backtest.run.
+
+    :param df: the bars of the window (from its train_start up until its test_end)
+    :param strategy: the strategy
+    :param window: the window
+    :param precomputed: a dict of name -> the values of the indicator over the bars of the window (None to compute the
+    indicators within init, from the bars of the segment)
+    :param cash: the starting cash of every segment
+    :return: a list of (segment name, stats)
+    """
+    results = []
+    for segment, start, stop in segments(window):
+        # the bars of the window start at train_start
+        start, stop = start - window.train_start, stop - window.train_start
+        bt = Backtest(df.iloc[start:stop], strategy, commission=0, exclusive_orders=True, cash=cash)
+        if precomputed is not None:
+            stats = bt.run(precomputed=slice_values(precomputed, start, stop))
+        else:
+            stats = bt.run()
+        results.append((segment, stats[[key for key in stats.index if not key.startswith("_")]]))
+    return results
+
+
+def vector_back_test(frames: dict, strategy, train: int, test: int, step: int = None, cash: float = 100000,
+                     **params) -> dict:
+    """
+    Back tests every window of every ticker with the vectorized backtester. The indicators and the signals are computed
+    once for every ticker at once and every segment is simulated from its slice of them.
+
+    :param frames: a dict of ticker -> dataframe (without NaNs)
+    :param strategy: a strategy class that implements batch_indicators and signals (see Strategies.UniverseStrategy)
+    :param params: the parameters of the strategy that differ from the class defaults
+    :return: a dict of ticker -> list of (window, segment name, stats)
+    """
+    if not frames:
+        return {}
+    panel = BarPanel(frames)
+    values = strategy.batch_indicators(panel, **params)
+    signals = strategy.signals(panel, values, **params)
+
+    no_signal = np.zeros(panel["Close"].shape, dtype=bool)
+    buy, sell, exit_ = (signals.get(name, no_signal) for name in ("buy", "sell", "close"))
+
+    results = {}
+    for position, ticker in enumerate(panel.tickers):
+        index = frames[ticker].index
+        results[ticker] = []
+        for window in windows(int(panel.lengths[position]), train, test, step):
+            for segment, start, stop in segments(window):
+                # the first bar of a segment is picked from its slice of the indicators, the same way Backtest.run does
+                first = int(vector.warmup({name: array[start:stop, position] for name, array in values.items()}))
+                result = vector.simulate(panel["Open"][start:stop, position], panel["Close"][start:stop, position],
+                                         buy[start:stop, position], sell[start:stop, position],
+                                         exit_[start:stop, position], first, cash, signals.get("take_profit"),
+                                         signals.get("stop_loss"))
+                results[ticker].append((window, segment, vector.result_stats(result, cash, index[start:stop])))
+    return results
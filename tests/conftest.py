@@ -0,0 +1,23 @@
+import os
+import sys
+import pytest
+
+# the modules live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def no_indicator_cache():
+    """
+    Turns off the memoization of Indicators (and puts the ta backend back afterwards) for the duration of a test.
+    """
+    # imported here so that the tests of the command line run without importing numpy or ta
+    import Indicators as indicators
+
+    enabled = indicators.cache.enabled
+    indicators.cache.enabled = False
+    try:
+        yield indicators
+    finally:
+        indicators.set_backend("ta")
+        indicators.cache.enabled = enabled
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from Benchmark import synthetic_bars
+from Cache import LRUCache
+from Compact import CompactBars, TimeGrid
+from PriceStore import open_store
+from StockData import LazyTickers
+
+
+@pytest.mark.parametrize("prices", ["float32", "scaled"])
+def test_compact_bars_round_trip(prices):
+    df = synthetic_bars(5000)
+    expanded = CompactBars.from_frame(df, prices, rtol=1e-6, time_grid=TimeGrid()).to_frame()
+    np.testing.assert_allclose(expanded.to_numpy(dtype=float), df.to_numpy(dtype=float), rtol=1e-6)
+    assert expanded.index.equals(df.index) and (expanded.dtypes == df.dtypes).all()
+
+
+def test_tickers_on_the_same_grid_share_their_timestamps():
+    time_grid = TimeGrid()
+    first, second = (CompactBars.from_frame(synthetic_bars(1000, seed=seed), time_grid=time_grid) for seed in (0, 1))
+    assert first.time is second.time and len(time_grid) == 1
+
+
+def test_lazy_tickers_return_the_same_bars_on_a_miss_and_a_hit(tmp_path):
+    store = open_store("pickle", str(tmp_path))
+    store.save({"AAA": synthetic_bars(1000)})
+    tickers = LazyTickers({"AAA": store}, LRUCache(), compact="float32")
+
+    first = tickers["AAA"]
+    assert "AAA" in tickers.cache
+    second = tickers["AAA"]
+    assert first.equals(second)
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import pytest
+from Benchmark import synthetic_bars, synthetic_universe, working_directory
+from Downloader import Downloader, frame_source, NO_DATA
+from PriceStore import open_store
+from ResponseCache import ResponseCache
+from StockData import Universe
+from Strategies import GoldenCross
+
+
+class FlakySource:
+    """
+    A frame_source whose first `failures` calls raise a ConnectionError, every call is recorded.
+    """
+
+    def __init__(self, frames: dict, failures: int = 0, fail: set = (), missing_once: set = ()):
+        self.source = frame_source(frames, fail)
+        self.failures = failures
+        self.missing_once = set(missing_once)
+        self.calls = []
+
+    def __call__(self, tickers: list, period: str = "30d", interval: str = "15m", start=None) -> dict:
+        self.calls.append(list(tickers))
+        if len(self.calls) <= self.failures:
+            raise ConnectionError("connection reset")
+        frames = self.source(tickers, period, interval, start)
+        # the tickers that come back incomplete the first time they are requested
+        for ticker in self.missing_once & set(frames):
+            self.missing_once.discard(ticker)
+            del frames[ticker]
+        return frames
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    result = []
+    monkeypatch.setattr(time, "sleep", result.append)
+    return result
+
+
+def test_a_failing_call_is_retried_with_an_exponential_backoff(sleeps):
+    source = FlakySource({"AAA": synthetic_bars(100)}, failures=2)
+    result = Downloader(source, rate_limit=0, retries=3, backoff=1.0).download(["AAA"])
+
+    assert list(result.frames) == ["AAA"] and result.failures == {}
+    assert source.calls == [["AAA"]] * 3
+    assert sleeps == [1.0, 2.0]
+
+
+def test_a_ticker_that_keeps_failing_is_reported_after_every_retry(sleeps):
+    source = FlakySource({}, failures=10)
+    result = Downloader(source, rate_limit=0, retries=3, backoff=0.5).download(["AAA"])
+
+    assert result.frames == {} and result.failures == {"AAA": repr(ConnectionError("connection reset"))}
+    assert len(source.calls) == 4
+    assert sleeps == [0.5, 1.0, 2.0]
+
+
+def test_only_the_missing_tickers_of_a_batch_are_retried(sleeps):
+    frames = {ticker: synthetic_bars(100, seed=seed) for seed, ticker in enumerate(["AAA", "BBB", "CCC"])}
+    source = FlakySource(frames, missing_once={"BBB"})
+    result = Downloader(source, batch_size=3, rate_limit=0, retries=3, backoff=1.0).download(["AAA", "BBB", "CCC"])
+
+    assert sorted(result.frames) == ["AAA", "BBB", "CCC"] and result.failures == {}
+    assert source.calls == [["AAA", "BBB", "CCC"], ["BBB"]]
+    assert sleeps == [1.0]
+
+
+def test_a_bad_ticker_fails_alone_within_its_batch(sleeps):
+    frames = {ticker: synthetic_bars(100, seed=seed) for seed, ticker in enumerate(["AAA", "BBB", "CCC"])}
+    source = FlakySource(frames, fail={"BBB"})
+    result = Downloader(source, batch_size=3, rate_limit=0, retries=1, backoff=1.0).download(["AAA", "BBB", "CCC"])
+
+    assert sorted(result.frames) == ["AAA", "CCC"]
+    assert list(result.failures) == ["BBB"] and "BBB" in result.failures["BBB"]
+    # the whole batch, then every ticker on its own (with a retry of the one that fails)
+    assert source.calls == [["AAA", "BBB", "CCC"], ["AAA"], ["BBB"], ["BBB"], ["CCC"]]
+
+
+def test_a_ticker_without_bars_is_reported_as_no_data(sleeps):
+    result = Downloader(FlakySource({}), rate_limit=0, retries=1, backoff=1.0).download(["AAA"])
+    assert result.failures == {"AAA": NO_DATA}
+
+
+def test_the_failed_tickers_of_a_universe_are_not_cached(tmp_path, sleeps):
+    root = str(tmp_path)
+    symbols = synthetic_universe(root, tickers=3, bars=200)
+    directory = f"{root}/Exchanges/Screener"
+    # the last two tickers are not cached yet
+    with open(f"{directory}/quality.json", "r", encoding="utf-8") as file:
+        quality = json.load(file)
+    for symbol in symbols[1:]:
+        os.remove(f"{directory}/{symbol}.pkl")
+        del quality[symbol]
+    with open(f"{directory}/quality.json", "w", encoding="utf-8") as file:
+        json.dump(quality, file)
+
+    source = FlakySource({symbols[1]: synthetic_bars(200, seed=1)}, fail={symbols[2]})
+    with working_directory(root):
+        universe = Universe([GoldenCross], http_cache=ResponseCache(offline=True),
+                            downloader=Downloader(source, rate_limit=0, retries=1, backoff=1.0))
+
+    assert list(universe.failed_tickers) == [symbols[2]]
+    assert sorted(universe.tickers) == symbols[:2]
+    store = open_store("pickle", directory)
+    assert store.symbols() == set(symbols[:2]) and symbols[2] not in store.quality
@@ -0,0 +1,80 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from HttpClient import HttpClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    # keep-alive, so that a pooled session sends every request over a single connection
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.client_address)
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = str(status).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """
+    A local server that answers with the statuses within server.statuses (then 200) and records the client address of
+    every request.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = []
+    server.statuses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def test_connections_are_reused_between_requests(server):
+    client = HttpClient(backoff=0)
+    try:
+        for _ in range(3):
+            assert client.get(_url(server)).status_code == 200
+    finally:
+        client.close()
+
+    # every request came from the same client port, which is a single kept alive connection
+    assert len(server.requests) == 3
+    assert len(set(server.requests)) == 1
+
+
+def test_server_errors_are_retried(server):
+    server.statuses = [503, 502]
+    client = HttpClient(retries=3, backoff=0)
+    try:
+        response = client.get(_url(server))
+    finally:
+        client.close()
+
+    assert response.status_code == 200
+    assert len(server.requests) == 3
+
+
+def test_a_request_fails_once_the_retries_run_out(server):
+    server.statuses = [503, 503, 503]
+    client = HttpClient(retries=1, backoff=0)
+    try:
+        with pytest.raises(requests.exceptions.RetryError):
+            client.get(_url(server))
+    finally:
+        client.close()
+
+    assert len(server.requests) == 2
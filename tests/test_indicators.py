@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+import Indicators as indicators
+from Benchmark import synthetic_bars, _first_derivative_obv_loop
+
+
+def test_first_derivative_obv_matches_the_loop(no_indicator_cache):
+    df = synthetic_bars(5000).reset_index()
+    close, volume, time = df["Close"], df["Volume"], df["Datetime"]
+
+    expected = _first_derivative_obv_loop(close, volume, time)
+    actual = indicators.first_derivative_obv(close, volume, time)
+    pd.testing.assert_series_equal(actual, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize("name", ["ema", "rsi", "bollinger_bands", "obv", "vwap", "atr"])
+def test_numpy_backend_matches_ta(name, no_indicator_cache):
+    df = synthetic_bars(5000)
+    high, low, close, volume = df["High"], df["Low"], df["Close"], df["Volume"].astype(float)
+    calls = {"ema": lambda: indicators.ema(close, 9), "rsi": lambda: indicators.rsi(close),
+             "bollinger_bands": lambda: indicators.bollinger_bands(close), "obv": lambda: indicators.obv(close, volume),
+             "vwap": lambda: indicators.vwap(high, low, close, volume), "atr": lambda: indicators.atr(close, low, high)}
+
+    indicators.set_backend("ta")
+    expected = calls[name]()
+    indicators.set_backend("numpy")
+    actual = calls[name]()
+
+    if not isinstance(expected, dict):
+        expected, actual = {name: expected}, {name: actual}
+    for key in expected:
+        np.testing.assert_allclose(actual[key].to_numpy(dtype=float), expected[key].to_numpy(dtype=float),
+                                   rtol=1e-7, atol=1e-9, err_msg=key)
+
+
+def test_numpy_backend_falls_back_to_ta_with_fillna(no_indicator_cache):
+    close = synthetic_bars(500)["Close"]
+    indicators.set_backend("ta")
+    expected = indicators.rsi(close, fillna=True)
+    indicators.set_backend("numpy")
+    pd.testing.assert_series_equal(indicators.rsi(close, fillna=True), expected)
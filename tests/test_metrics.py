@@ -0,0 +1,37 @@
+import pickle
+import threading
+from Metrics import Metrics
+
+
+def test_concurrent_updates_and_merges_are_not_lost():
+    metrics = Metrics()
+    job = Metrics()
+    job.add_time("backtest", 1.0, "AAA")
+    job.count("bytes_read", 10)
+
+    def record():
+        for _ in range(10000):
+            metrics.add_time("batch_indicators", 1.0)
+            metrics.count("bytes_read")
+
+    thread = threading.Thread(target=record)
+    thread.start()
+    for _ in range(10000):
+        metrics.merge(job)
+    thread.join()
+
+    assert metrics.stages["batch_indicators"] == [10000, 10000.0]
+    assert metrics.stages["backtest"] == [10000, 10000.0]
+    assert metrics.tickers["AAA"]["backtest"] == 10000.0
+    assert metrics.counters["bytes_read"] == 10000 + 10000 * 10
+
+
+def test_captured_metrics_can_be_pickled():
+    metrics = Metrics()
+    with metrics.capture() as captured:
+        metrics.add_time("backtest", 2.0, "AAA")
+    restored = pickle.loads(pickle.dumps(captured))
+    metrics.merge(restored)
+    restored.count("bytes_read")
+    assert metrics.stages["backtest"] == [1, 2.0]
+    assert restored.counters["bytes_read"] == 1
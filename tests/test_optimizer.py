@@ -0,0 +1,96 @@
+import math
+import pytest
+import Optimizer as optimizer
+from Benchmark import synthetic_universe, working_directory
+from Downloader import Downloader, frame_source
+from ResponseCache import ResponseCache
+from StockData import Universe
+from Strategies import GoldenCross
+
+
+def test_grid_expands_every_combination():
+    assert optimizer.grid(short_ema=[5, 9], long_ema=[15]) == [{"short_ema": 5, "long_ema": 15},
+                                                              {"short_ema": 9, "long_ema": 15}]
+    assert len(optimizer.grid(a=[1, 2, 3], b=[4, 5], c=[6, 7])) == 12
+
+
+def test_random_search_samples_distinct_combinations():
+    combinations = optimizer.random_search(4, seed=1, a=[1, 2, 3], b=[4, 5, 6])
+    assert len(combinations) == 4
+    assert len({optimizer._key(params) for params in combinations}) == 4
+    assert combinations == optimizer.random_search(4, seed=1, a=[1, 2, 3], b=[4, 5, 6])
+    # a search larger than the grid is the whole grid
+    assert len(optimizer.random_search(100, a=[1, 2], b=[3])) == 2
+
+
+def test_parameters_are_the_defaults_of_the_strategy():
+    assert optimizer.parameters(GoldenCross) == {"short_ema": 20, "short_sma": 50, "long_sma": 200}
+
+
+def test_dominated_combinations_are_eliminated():
+    search = optimizer.Optimizer(None, GoldenCross, min_tickers=3, z=1.0)
+    active = {"best": {}, "close": {}, "worse": {}, "few": {}}
+    scores = {"best": [10.0, 11.0, 9.0, 10.0], "close": [9.5, 10.0, 9.0, 10.0], "worse": [1.0, 2.0, 1.5, math.nan],
+              "few": [0.0, 0.0]}
+    # a combination with fewer than min_tickers scores is never dropped
+    assert search._dominated(active, scores) == ["worse"]
+    # nor is a combination dropped while there is nothing to compare it with
+    assert search._dominated({"worse": {}}, scores) == []
+
+
+def _universe(root: str) -> Universe:
+    synthetic_universe(root, tickers=4, bars=300)
+    return Universe([GoldenCross], http_cache=ResponseCache(offline=True), downloader=Downloader(frame_source({})))
+
+
+@pytest.fixture
+def evaluations(monkeypatch):
+    """
+    Counts the (ticker, combination) back tests that are run.
+    """
+    jobs = []
+    evaluate = optimizer._evaluate
+
+    def counted(job):
+        jobs.extend((job[0], optimizer._key(params)) for params in job[3])
+        return evaluate(job)
+
+    monkeypatch.setattr(optimizer, "_evaluate", counted)
+    return jobs
+
+
+def test_a_resumed_run_skips_the_finished_scores(tmp_path, evaluations):
+    root = str(tmp_path)
+    results_path = f"{root}/results.jsonl"
+    combinations = optimizer.grid(short_ema=[10, 20], long_sma=[100])
+    with working_directory(root):
+        universe = _universe(root)
+        first = optimizer.Optimizer(universe, GoldenCross, results_path=results_path, processes=1).run(combinations)
+        assert len(evaluations) == 8
+
+        resumed = optimizer.Optimizer(universe, GoldenCross, results_path=results_path, processes=1)
+        second = resumed.run(combinations + optimizer.grid(short_ema=[30], long_sma=[100]))
+
+    # only the new combination is evaluated, the others are read from the results file
+    assert len(evaluations) == 12
+    assert {key for _, key in evaluations[8:]} == {optimizer._key({"short_ema": 30, "long_sma": 100})}
+    assert second[second.short_ema != 30].reset_index(drop=True).equals(first)
+
+
+def test_scores_are_not_reused_for_another_stat_or_default(tmp_path, evaluations, monkeypatch):
+    root = str(tmp_path)
+    results_path = f"{root}/results.jsonl"
+    combinations = optimizer.grid(short_ema=[10])
+    with working_directory(root):
+        universe = _universe(root)
+        optimizer.Optimizer(universe, GoldenCross, results_path=results_path, processes=1).run(combinations)
+        assert len(evaluations) == 4
+
+        optimizer.Optimizer(universe, GoldenCross, maximize="Return [%]", results_path=results_path,
+                            processes=1).run(combinations)
+        assert len(evaluations) == 8
+
+        # the combination does not override long_sma, so its default is part of the scores
+        monkeypatch.setattr(GoldenCross, "long_sma", 150)
+        optimizer.Optimizer(universe, GoldenCross, results_path=results_path, processes=1).run(combinations)
+        assert len(evaluations) == 12
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import Portfolio as portfolio
+import VectorBacktest as vector
+from Benchmark import synthetic_bars
+from Strategies import VolumeIndicatorOBV, GoldenCross
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("strategy", [VolumeIndicatorOBV, GoldenCross], ids=lambda strategy: strategy.__name__)
+def test_a_single_position_matches_the_vectorized_backtest(strategy, seed, no_indicator_cache):
+    df = synthetic_bars(5000, seed=seed)
+    actual = portfolio.run({"ticker": df}, strategy, max_positions=1, max_weight=None)["trades"]["PnL"].to_numpy()
+    expected = vector.simulate_frames({"ticker": df}, strategy)["ticker"]["pl"]
+
+    # the position that is still open at the end is closed at the last close by the portfolio and at the last open
+    # by the backtester, so it is left out
+    assert abs(len(actual) - len(expected)) <= 1
+    count = min(len(actual), len(expected)) - 1
+    np.testing.assert_allclose(actual[:count], expected[:count], rtol=1e-9)
+
+
+def test_the_tickers_share_the_cash_within_the_constraints(no_indicator_cache):
+    frames = {f"T{number}": synthetic_bars(2000, seed=number) for number in range(20)}
+    result = portfolio.run(frames, GoldenCross, cash=100000, max_positions=5, max_weight=0.25)
+    equity, trades = result["equity"], result["trades"]
+
+    assert len(trades) and equity["Positions"].max() <= 5
+    assert (equity["Cash"] >= -1e-6).all()
+    assert result["stats"]["# Trades"] == len(trades)
+
+
+def test_a_position_takes_at_most_max_weight_of_the_equity(no_indicator_cache):
+    trades = portfolio.run({"ticker": synthetic_bars(2000)}, GoldenCross, cash=100000, max_positions=None,
+                           max_weight=0.1)["trades"]
+    # the first position is opened with all of the cash as the equity
+    price = trades["EntryPrice"].iloc[0]
+    cost = abs(trades["Size"].iloc[0]) * price
+    assert 10000 - price < cost <= 10000
@@ -0,0 +1,151 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from Benchmark import synthetic_bars
+from PriceStore import MemmapStore, ParquetStore
+
+
+def _bars(bars: int, seed: int) -> pd.DataFrame:
+    return synthetic_bars(bars, seed=seed).astype("float64")
+
+
+def test_memmap_save_only_writes_the_given_tickers(tmp_path):
+    store = MemmapStore(str(tmp_path))
+    store.save({"AAA": _bars(100, 0), "BBB": _bars(100, 1)})
+    store.save({"CCC": _bars(50, 2)})
+
+    index = store._open()
+    assert index["symbols"]["AAA"]["segment"] == index["symbols"]["BBB"]["segment"] == 1
+    assert index["symbols"]["CCC"]["segment"] == 2
+    frames = store.load(["AAA", "BBB", "CCC"])
+    for symbol, seed, bars in (("AAA", 0, 100), ("BBB", 1, 100), ("CCC", 2, 50)):
+        pd.testing.assert_frame_equal(frames[symbol], _bars(bars, seed), check_freq=False)
+
+
+def test_memmap_save_compacts_replaced_bars(tmp_path):
+    store = MemmapStore(str(tmp_path))
+    store.save({"AAA": _bars(100, 0), "BBB": _bars(100, 1)})
+    store.save({"AAA": _bars(100, 2)})
+    store.save({"AAA": _bars(100, 3)})
+
+    index = store._open()
+    # the replaced bars outnumbered the live ones, so the live tickers were written into a single segment
+    assert list(index["segments"]) == [3]
+    assert sorted(file for file in os.listdir(tmp_path) if file.endswith((".f64", ".i64"))) == ["bars-3.f64",
+                                                                                                "time-3.i64"]
+    pd.testing.assert_frame_equal(store.load(["BBB"])["BBB"], _bars(100, 1), check_freq=False)
+    pd.testing.assert_frame_equal(store.load(["AAA"])["AAA"], _bars(100, 3), check_freq=False)
+
+
+def test_memmap_readers_see_every_generation(tmp_path):
+    writer, reader = MemmapStore(str(tmp_path)), MemmapStore(str(tmp_path))
+    writer.save({"AAA": _bars(100, 0)})
+    assert reader.symbols() == {"AAA"}
+
+    # back to back saves land within the timestamp granularity of the filesystem
+    for seed in range(1, 5):
+        writer.save({"AAA": _bars(100, seed)})
+        pd.testing.assert_frame_equal(reader.load(["AAA"])["AAA"], _bars(100, seed), check_freq=False)
+
+
+def test_memmap_reads_and_upgrades_a_legacy_store(tmp_path):
+    df = _bars(100, 0)
+    ns = df.index.tz_convert("UTC").to_numpy(dtype="datetime64[ns]").view("int64")
+    df.to_numpy(dtype="float64").tofile(tmp_path / "bars-4.f64")
+    ns.tofile(tmp_path / "time-4.i64")
+    with open(tmp_path / "index.json", "w", encoding="utf-8") as file:
+        json.dump({"generation": 4, "rows": len(df), "symbols": {
+            "AAA": {"rows": [0, len(df)], "tz": str(df.index.tz), "index_name": "Datetime", "first": int(ns[0]),
+                    "last": int(ns[-1])}}}, file)
+
+    store = MemmapStore(str(tmp_path))
+    pd.testing.assert_frame_equal(store.load(["AAA"])["AAA"], df, check_freq=False)
+
+    store.save({"BBB": _bars(10, 1)})
+    assert not os.path.exists(tmp_path / "index.json")
+    assert MemmapStore(str(tmp_path))._open()["segments"] == {4: 100, 5: 10}
+    pd.testing.assert_frame_equal(MemmapStore(str(tmp_path)).load(["AAA"])["AAA"], df, check_freq=False)
+    assert np.isfinite(store.load(["BBB"])["BBB"].to_numpy()).all()
+
+
+def _parts(directory) -> list:
+    return sorted(file for file in os.listdir(directory) if file.endswith(".parquet"))
+
+
+@pytest.fixture
+def parquet_store(tmp_path):
+    pytest.importorskip("pyarrow")
+    return ParquetStore(str(tmp_path), row_group_size=64)
+
+
+def test_parquet_round_trip(parquet_store):
+    frames = {"AAA": _bars(300, 0), "BBB": _bars(100, 1)}
+    parquet_store.save(frames)
+
+    # a new store reads everything back from the files and their index
+    store = ParquetStore(parquet_store.directory)
+    assert store.symbols() == {"AAA", "BBB"}
+    loaded = store.load(["BBB", "AAA", "CCC"])
+    assert list(loaded) == ["BBB", "AAA"]
+    for symbol, df in frames.items():
+        pd.testing.assert_frame_equal(loaded[symbol], df, check_freq=False)
+    assert store.last_timestamp("AAA") == frames["AAA"].index[-1]
+
+
+def test_parquet_save_replaces_a_ticker_and_keeps_the_others(parquet_store):
+    parquet_store.save({"AAA": _bars(300, 0), "BBB": _bars(300, 1)})
+    parquet_store.save({"AAA": _bars(200, 2)})
+
+    store = ParquetStore(parquet_store.directory)
+    assert store.index["AAA"]["part"] == 1 and store.index["BBB"]["part"] == 0
+    pd.testing.assert_frame_equal(store.load(["AAA"])["AAA"], _bars(200, 2), check_freq=False)
+    pd.testing.assert_frame_equal(store.load(["BBB"])["BBB"], _bars(300, 1), check_freq=False)
+
+
+def test_parquet_save_of_an_empty_frame_removes_the_ticker(parquet_store):
+    parquet_store.save({"AAA": _bars(100, 0), "BBB": _bars(100, 1)})
+    parquet_store.save({"AAA": _bars(100, 0).iloc[:0]})
+
+    store = ParquetStore(parquet_store.directory)
+    assert store.symbols() == {"BBB"} and store.load(["AAA"]) == {}
+
+
+def test_parquet_loads_a_date_range_and_columns(parquet_store):
+    df = _bars(1000, 0)
+    parquet_store.save({"AAA": df})
+    start, end = df.index[100], df.index[199]
+
+    loaded = parquet_store.load(["AAA"], columns=["Close", "Volume"], start=start, end=end)["AAA"]
+    pd.testing.assert_frame_equal(loaded, df.loc[start:end, ["Close", "Volume"]], check_freq=False)
+    # timestamps without a timezone are in the timezone of the bars
+    naive = parquet_store.load(["AAA"], start=start.tz_localize(None), end=end.tz_localize(None))["AAA"]
+    pd.testing.assert_frame_equal(naive, df.loc[start:end], check_freq=False)
+    assert parquet_store.load(["AAA"], start=df.index[-1] + pd.Timedelta("1d")) == {}
+
+
+def test_parquet_keeps_an_index_without_a_timezone(parquet_store):
+    df = _bars(200, 0)
+    df.index = df.index.tz_localize(None)
+    parquet_store.save({"AAA": df})
+
+    loaded = ParquetStore(parquet_store.directory).load(["AAA"], start=df.index[50])["AAA"]
+    assert loaded.index.tz is None
+    pd.testing.assert_frame_equal(loaded, df.iloc[50:], check_freq=False)
+
+
+def test_parquet_compacts_the_parts_once_most_rows_were_replaced(parquet_store):
+    parquet_store.save({"AAA": _bars(100, 0), "BBB": _bars(100, 1), "CCC": _bars(300, 2)})
+    parquet_store.save({"AAA": _bars(100, 3)})
+    assert _parts(parquet_store.directory) == ["bars-0.parquet", "bars-1.parquet"]
+
+    parquet_store.save({"CCC": _bars(100, 4)})
+    # the replaced rows outnumbered the live ones, so the live tickers were written into a single part
+    assert _parts(parquet_store.directory) == ["bars-2.parquet"]
+    with open(f"{parquet_store.directory}/index.json", "r", encoding="utf-8") as file:
+        index = json.load(file)
+    assert {symbol: entry["part"] for symbol, entry in index.items()} == {"AAA": 2, "BBB": 2, "CCC": 2}
+    store = ParquetStore(parquet_store.directory)
+    for symbol, (bars, seed) in {"AAA": (100, 3), "BBB": (100, 1), "CCC": (100, 4)}.items():
+        pd.testing.assert_frame_equal(store.load([symbol])[symbol], _bars(bars, seed), check_freq=False)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from ta.utils import dropna
+from Benchmark import synthetic_bars, synthetic_universe, working_directory
+from Downloader import Downloader, frame_source
+from PriceStore import open_store
+from Quality import Cleaner
+from ResponseCache import ResponseCache
+from StockData import Universe
+from Strategies import GoldenCross
+
+PRICES = ["Open", "High", "Low", "Close"]
+
+
+def test_cleaner_drops_the_rows_dropna_drops():
+    df = synthetic_bars(5000)
+    rows = np.random.default_rng(0).choice(5000, 20, replace=False)
+    df.iloc[rows[:10], df.columns.get_loc("Close")] = np.nan
+    df.iloc[rows[10:], df.columns.get_loc("Volume")] = 0
+
+    cleaned, report = Cleaner().clean(pd.concat([df, df.iloc[:5]]))
+    # dropna turns the volumes into floats
+    pd.testing.assert_frame_equal(cleaned, dropna(df), check_freq=False, check_dtype=False)
+    assert (report["duplicates"], report["nan_rows"], report["zero_rows"]) == (5, 10, 10)
+    # the dropped rows were on the schedule, so they are not missing bars
+    assert report["missing_bars"] == 0 and report["usable"]
+
+
+def test_missing_bars_are_the_gaps_of_the_schedule():
+    df = synthetic_bars(5000)
+    # 10 bars within the first trading day (from 10:20 onwards)
+    df = df.drop(df.index[10:20])
+    report = Cleaner().clean(df)[1]
+    assert (report["gaps"], report["missing_bars"], report["largest_gap"]) == (1, 10, 10)
+    assert report["usable"]
+
+    assert not Cleaner(max_missing=0.001).clean(df)[1]["usable"]
+
+
+def test_a_suspected_split_is_a_warning():
+    df = synthetic_bars(5000)
+    # a 2:1 split halfway through
+    df.iloc[2500:, [df.columns.get_loc(column) for column in PRICES]] /= 2
+
+    cleaned, report = Cleaner().clean(df)
+    assert report["splits"] == [df.index[2500].isoformat()]
+    assert report["usable"] and report["warnings"] == [f"suspected split at {df.index[2500].isoformat()}"]
+    assert len(cleaned) == len(df)
+
+
+def test_refresh_counts_only_the_new_bars(tmp_path):
+    root = str(tmp_path)
+    symbol = synthetic_universe(root, tickers=1, bars=500)[0]
+    bars = synthetic_bars(500, seed=0)
+    cached = bars.iloc[:400].copy()
+    # bars that were cached before they were cleaned, the cleaner drops their zero volumes once they are refreshed
+    cached.iloc[10:20, cached.columns.get_loc("Volume")] = 0
+    open_store("pickle", f"{root}/Exchanges/Screener").save({symbol: cached})
+
+    with working_directory(root):
+        universe = Universe([GoldenCross], http_cache=ResponseCache(offline=True),
+                            downloader=Downloader(frame_source({symbol: bars}), rate_limit=0))
+        assert universe.refresh() == {symbol: 100}
+        assert len(universe.tickers[symbol]) == 490
@@ -0,0 +1,82 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from Benchmark import synthetic_bars
+from PriceStore import PickleStore
+from Resample import resample, ResampledStore
+
+AGGREGATION = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def session_bars(days: int = 5) -> pd.DataFrame:
+    """
+    :return: 5 minute bars of the regular sessions (9:30 to 16:00) of the business days from 2021-01-04 onwards
+    """
+    sessions = [pd.date_range(f"{day.date()} 09:30", periods=78, freq="5min", tz="America/New_York")
+                for day in pd.bdate_range("2021-01-04", periods=days)]
+    df = synthetic_bars(days * 78)
+    df.index = sessions[0].append(sessions[1:]).rename("Datetime")
+    return df
+
+
+def _expected(df: pd.DataFrame, frequency: str, offset: str = "0min") -> pd.DataFrame:
+    return df.resample(frequency, offset=offset).agg(AGGREGATION).dropna()
+
+
+@pytest.mark.parametrize("interval, frequency", [("15m", "15min"), ("30m", "30min"), ("1d", "1D")])
+def test_resample_matches_pandas_around_the_clock(interval, frequency):
+    # the bins of these intervals start at midnight as well as at 9:30
+    df = synthetic_bars(20000)
+    pd.testing.assert_frame_equal(resample(df, interval), _expected(df, frequency), check_freq=False,
+                                  check_dtype=False)
+
+
+def test_hourly_bars_start_at_the_session_open():
+    df = session_bars()
+    actual = resample(df, "1h")
+    pd.testing.assert_frame_equal(actual, _expected(df, "60min", "30min"), check_freq=False, check_dtype=False)
+    assert [str(time.time()) for time in actual.index[:7]] == ["09:30:00", "10:30:00", "11:30:00", "12:30:00",
+                                                               "13:30:00", "14:30:00", "15:30:00"]
+
+
+@pytest.mark.parametrize("interval, frequency, offset", [("15m", "15min", "0min"), ("1h", "60min", "30min")])
+def test_a_missing_opening_bar_keeps_the_bins_of_the_session(interval, frequency, offset):
+    df = session_bars()
+    # the 9:30 bar of the second day is missing
+    df = df.drop(pd.Timestamp("2021-01-05 09:30", tz="America/New_York"))
+    actual = resample(df, interval)
+    pd.testing.assert_frame_equal(actual, _expected(df, frequency, offset), check_freq=False, check_dtype=False)
+
+    opening = pd.Timestamp("2021-01-05 09:30", tz="America/New_York")
+    day = actual[actual.index.normalize() == opening.normalize()]
+    assert list(day.index[:2]) == [opening, opening + pd.Timedelta(frequency)]
+    assert day["Open"].iloc[0] == df.at[opening + pd.Timedelta("5min"), "Open"]
+
+
+def test_resample_keeps_the_volume_dtype():
+    assert resample(session_bars(1), "1h")["Volume"].dtype == np.int64
+
+
+def test_derived_bars_of_a_legacy_store_are_only_written_once(tmp_path):
+    frames = {"AAA": session_bars(), "BBB": session_bars(3)}
+    PickleStore(f"{tmp_path}/base").save(frames)
+    # a store written before the freshness metadata existed
+    with open(f"{tmp_path}/base/{PickleStore.freshness_name}", "w", encoding="utf-8") as file:
+        json.dump({}, file)
+
+    writes = []
+
+    def load():
+        cache = PickleStore(f"{tmp_path}/1h")
+        save = cache.save
+        cache.save = lambda derived: (writes.append(sorted(derived)), save(derived))
+        return ResampledStore(PickleStore(f"{tmp_path}/base"), "1h", cache).load(["AAA", "BBB"])
+
+    first = load()
+    assert writes == [["AAA", "BBB"]]
+    second = load()
+    assert writes == [["AAA", "BBB"]]
+    for symbol, df in frames.items():
+        pd.testing.assert_frame_equal(second[symbol], first[symbol], check_freq=False)
+        pd.testing.assert_frame_equal(second[symbol], resample(df, "1h"), check_freq=False)
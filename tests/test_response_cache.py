@@ -0,0 +1,93 @@
+import time
+import pandas as pd
+import pytest
+from ResponseCache import ResponseCache, OfflineCacheMiss
+
+URL = "https://example.com/table"
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, text: str = "", headers: dict = None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class FakeClient:
+    """
+    Answers every request with the next response and records the requests.
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return self.responses.pop(0)
+
+
+def parse(text: str) -> pd.DataFrame:
+    return pd.DataFrame({"value": text.split(",")})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_an_entry_is_served_until_its_ttl_expires(tmp_path, clock):
+    client = FakeClient(FakeResponse(200, "a,b"), FakeResponse(200, "c"))
+    cache = ResponseCache(str(tmp_path), ttl=60, client=client)
+
+    # a miss requests the url, a hit within the ttl does not
+    assert cache.get_frame(URL, parse).value.to_list() == ["a", "b"]
+    clock[0] += 59
+    assert cache.get_frame(URL, parse).value.to_list() == ["a", "b"]
+    assert len(client.requests) == 1
+
+    clock[0] += 1
+    assert cache.get_frame(URL, parse).value.to_list() == ["c"]
+    assert len(client.requests) == 2
+    assert cache.read(URL).value.to_list() == ["c"]
+
+
+def test_an_expired_entry_is_revalidated(tmp_path, clock):
+    client = FakeClient(FakeResponse(200, "a", {"ETag": '"v1"'}), FakeResponse(304))
+    cache = ResponseCache(str(tmp_path), ttl=60, client=client)
+    cache.get_frame(URL, parse)
+
+    clock[0] += 120
+    assert cache.get_frame(URL, parse).value.to_list() == ["a"]
+    assert client.requests[1][1]["headers"] == {"If-None-Match": '"v1"'}
+
+    # the 304 starts the ttl again
+    clock[0] += 30
+    cache.get_frame(URL, parse)
+    assert len(client.requests) == 2
+
+
+def test_the_query_parameters_are_part_of_the_entry(tmp_path, clock):
+    client = FakeClient(FakeResponse(200, "a"), FakeResponse(200, "b"))
+    cache = ResponseCache(str(tmp_path), client=client)
+
+    assert cache.get_frame(URL, parse, {"page": 1}).value.to_list() == ["a"]
+    assert cache.get_frame(URL, parse, {"page": 2}).value.to_list() == ["b"]
+    assert cache.get_frame(URL, parse, {"page": 1}).value.to_list() == ["a"]
+    assert [kwargs["params"] for _, kwargs in client.requests] == [{"page": 1}, {"page": 2}]
+
+
+def test_offline_serves_every_entry_and_never_requests(tmp_path, clock):
+    ResponseCache(str(tmp_path), client=FakeClient()).put(URL, parse("a"))
+    cache = ResponseCache(str(tmp_path), ttl=60, offline=True, client=FakeClient())
+
+    clock[0] += 3600
+    assert cache.get_frame(URL, parse).value.to_list() == ["a"]
+    with pytest.raises(OfflineCacheMiss):
+        cache.get_frame(URL, parse, {"page": 2})
@@ -0,0 +1,50 @@
+import os
+import pandas as pd
+import pytest
+import Results as results
+from Results import ResultsWriter
+
+pytest.importorskip("pyarrow")
+
+
+def _stats(win_rate: float) -> pd.Series:
+    return pd.Series({"# Trades": 4, "Win Rate [%]": win_rate, "Return [%]": 1.0, "_trades": None})
+
+
+def test_results_are_written_a_batch_at_a_time(tmp_path):
+    directory = str(tmp_path)
+    with ResultsWriter(directory, flush_every=2) as writer:
+        for number in range(5):
+            writer.append(f"T{number}", "GoldenCross", _stats(50.0))
+        assert sorted(os.listdir(directory)) == ["part-000000.parquet", "part-000001.parquet"]
+
+    # the rest of the buffer is written on exit
+    assert sorted(os.listdir(directory))[-1] == "part-000002.parquet"
+    assert writer.read()["Ticker"].to_list() == [f"T{number}" for number in range(5)]
+
+
+def test_a_resumed_writer_reads_the_parts_once(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    with ResultsWriter(directory, flush_every=1) as writer:
+        writer.append("AAA", "GoldenCross", _stats(25.0))
+        writer.append("BBB", "GoldenCross", _stats(75.0))
+
+    reads = []
+    read_parquet = pd.read_parquet
+
+    def counted(path, *args, **kwargs):
+        reads.append(os.path.basename(path))
+        return read_parquet(path, *args, **kwargs)
+
+    monkeypatch.setattr(results.pd, "read_parquet", counted)
+    resumed = ResultsWriter(directory)
+    assert resumed.completed() == {("AAA", "GoldenCross"), ("BBB", "GoldenCross")}
+    assert resumed.previous["Ticker"].to_list() == ["AAA", "BBB"]
+    assert resumed.aggregates.win_rate == 50.0
+    assert reads == ["part-000000.parquet", "part-000001.parquet"]
+
+    # a new part follows the previous parts
+    resumed.append("CCC", "GoldenCross", _stats(50.0))
+    assert ("CCC", "GoldenCross") in resumed.completed()
+    resumed.flush()
+    assert sorted(os.listdir(directory))[-1] == "part-000002.parquet"
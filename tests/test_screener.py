@@ -0,0 +1,39 @@
+import pandas as pd
+import Screener as screening
+
+
+def _table() -> pd.DataFrame:
+    # the rows of the NASDAQ screener api, which do not have an exchange column
+    return pd.DataFrame({"symbol": ["AAA", "BBB", "CCC"], "volume": ["200000", "300000", "10"],
+                         "marketCap": ["$5,000,000", "$9,000,000", "$9,000,000"],
+                         "country": ["United States", "United States", "United States"],
+                         "sector": ["Miscellaneous", "Technology", "Technology"], "industry": ["", "", ""]})
+
+
+def test_exchange_without_an_exchange_column():
+    screener = screening.Screener(_table())
+    assert screener.screen(screening.exchange("NYSE")).empty
+    assert screener.screen(~screening.exchange("NYSE")).symbol.to_list() == ["AAA", "BBB", "CCC"]
+
+
+def test_universe_condition_does_not_filter_on_the_sector_by_default():
+    screener = screening.Screener(_table()).with_short_interest(pd.DataFrame(columns=["Symbol", "Float Shorted (%)"]))
+    assert screener.screen(screening.universe_condition()).symbol.to_list() == ["AAA", "BBB"]
+    assert screener.screen(screening.universe_condition(sector_name="Technology")).symbol.to_list() == ["BBB"]
+
+
+class FakeCache:
+    def __init__(self, short_interest_error: Exception):
+        self.short_interest_error = short_interest_error
+
+    def get_frame(self, url, parse, params=None):
+        if url == screening.SCREENER_URL:
+            return _table()
+        raise self.short_interest_error
+
+
+def test_short_interest_that_can_not_be_parsed_is_left_empty():
+    for error in (ValueError("no tables found"), KeyError("Symbol")):
+        screener = screening.fetch(FakeCache(error))
+        assert screener.table.symbol.to_list() == ["AAA", "BBB", "CCC"]
+        assert screener.table["Float Shorted (%)"].isna().all()
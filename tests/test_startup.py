@@ -0,0 +1,35 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _imported(code: str) -> list:
+    """
+    :return: the heavy modules (see QuantStocks.HEAVY_MODULES) that running the code imports within a new interpreter
+    """
+    code += ("\nimport sys, json, QuantStocks\n"
+             "print(json.dumps(sorted(set(QuantStocks.HEAVY_MODULES) & set(sys.modules))))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_importing_the_command_line_imports_no_heavy_module():
+    assert _imported("import QuantStocks") == []
+
+
+@pytest.mark.parametrize("command", ["screen", "fetch", "backtest", "bench"])
+def test_parsing_a_command_imports_no_heavy_module(command):
+    assert _imported(f"import QuantStocks; QuantStocks.parser().parse_args([{command!r}])") == []
+
+
+def test_help_imports_no_heavy_module():
+    code = ("import QuantStocks\n"
+            "try:\n"
+            "    QuantStocks.main(['--help'])\n"
+            "except SystemExit:\n"
+            "    pass")
+    assert _imported(code) == []
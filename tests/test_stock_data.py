@@ -0,0 +1,32 @@
+from Benchmark import synthetic_universe, working_directory
+from Downloader import Downloader, frame_source
+from ResponseCache import ResponseCache
+from StockData import Universe
+from Strategies import GoldenCross
+
+
+def _universe(root: str, tickers: int = 10) -> Universe:
+    synthetic_universe(root, tickers=tickers, bars=200)
+    with working_directory(root):
+        return Universe([GoldenCross], http_cache=ResponseCache(offline=True), downloader=Downloader(frame_source({})))
+
+
+def test_a_batch_of_tickers_is_a_single_store_read(tmp_path, monkeypatch):
+    universe = _universe(str(tmp_path))
+    store = next(iter(universe.stores.values()))
+    reads = []
+    load = store.load
+
+    def counted(symbols, *args, **kwargs):
+        reads.append(list(symbols))
+        return load(symbols, *args, **kwargs)
+
+    monkeypatch.setattr(store, "load", counted)
+
+    panel = universe.bar_panel()
+    assert len(panel) == 10
+    assert reads == [list(universe.tickers)]
+
+    # the cached tickers are not read again
+    universe.bar_panel()
+    assert len(reads) == 1
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+import NumpyIndicators as np_indicators
+import Streaming as streaming
+import VectorBacktest as vector
+from Benchmark import synthetic_bars
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return synthetic_bars(5000)
+
+
+@pytest.fixture(scope="module")
+def source(bars):
+    return list(streaming.ReplaySource({"ticker": bars}))
+
+
+def _indicators(df: pd.DataFrame) -> dict:
+    """
+    :return: a dict of name -> (streaming indicator, the arguments of its update from a bar, the batch values)
+    """
+    high, low, close, volume = (df[column].to_numpy(dtype=float) for column in ("High", "Low", "Close", "Volume"))
+    return {"ema": (streaming.EMA(9), lambda bar: (bar.Close,), np_indicators.ema(close, 9)),
+            "sma": (streaming.SMA(50), lambda bar: (bar.Close,), np_indicators.sma(close, 50)),
+            "rsi": (streaming.RSI(), lambda bar: (bar.Close,), np_indicators.rsi(close)),
+            "obv": (streaming.OBV(), lambda bar: (bar.Close, bar.Volume), np_indicators.obv(close, volume)),
+            "vwap": (streaming.VWAP(), lambda bar: (bar.High, bar.Low, bar.Close, bar.Volume),
+                     np_indicators.vwap(high, low, close, volume)),
+            "atr": (streaming.ATR(), lambda bar: (bar.Close, bar.Low, bar.High), np_indicators.atr(close, low, high)),
+            "first_derivative_obv": (streaming.FirstDerivativeOBV(), lambda bar: (bar.Close, bar.Volume, bar.time),
+                                     np_indicators.first_derivative_obv(close, volume, df.index.values))}
+
+
+@pytest.mark.parametrize("name", ["ema", "sma", "rsi", "obv", "vwap", "atr", "first_derivative_obv"])
+def test_streaming_indicator_matches_the_batch_indicator(name, bars, source):
+    indicator, arguments, expected = _indicators(bars)[name]
+    actual = [indicator.update(*(float(value) if not isinstance(value, pd.Timestamp) else value
+                                 for value in arguments(bar))) for _, bar in source]
+    np.testing.assert_allclose(actual, expected, rtol=1e-7, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("strategy", list(streaming.STRATEGIES), ids=lambda strategy: strategy.__name__)
+def test_streaming_strategy_matches_the_vectorized_backtest(strategy, bars, source, no_indicator_cache):
+    stream = streaming.Stream(strategy)
+    for _ in stream.run(source):
+        pass
+    actual = stream.states["ticker"].trades
+    expected = vector.simulate_frames({"ticker": bars}, strategy)["ticker"]["pl"]
+
+    # the backtest also closes the position that is still open at the end
+    assert len(expected) - len(actual) in (0, 1)
+    np.testing.assert_allclose(actual, expected[:len(actual)], rtol=1e-9)
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+import VectorBacktest as vector
+from Benchmark import synthetic_bars
+from Strategies import VolumeIndicatorOBV, GoldenCross
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("strategy, params", [(VolumeIndicatorOBV, {}), (GoldenCross, {}),
+                                              (VolumeIndicatorOBV, {"take_profit": 50, "stop_loss": 5})])
+def test_vector_backtest_matches_backtesting(strategy, params, seed, no_indicator_cache):
+    stats = vector.compare(synthetic_bars(5000, seed=seed), strategy, **params)
+    np.testing.assert_allclose(stats["vector"].to_numpy(dtype=float), stats["backtesting"].to_numpy(dtype=float),
+                               rtol=1e-9, equal_nan=True)
+
+
+def test_vector_backtest_makes_trades(no_indicator_cache):
+    # the parity above would also hold for two engines that never trade
+    stats = vector.back_test(synthetic_bars(5000), GoldenCross)
+    assert stats["# Trades"] > 0
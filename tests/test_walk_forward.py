@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+import VectorBacktest as vector
+import WalkForward as walk_forward
+from Benchmark import synthetic_bars
+from Panel import BarPanel
+from Strategies import VolumeIndicatorOBV, GoldenCross
+
+
+def test_windows_roll_forward_by_step():
+    assert walk_forward.windows(10, 4, 2) == [walk_forward.Window(0, 0, 4, 6), walk_forward.Window(1, 2, 6, 8),
+                                              walk_forward.Window(2, 4, 8, 10)]
+    assert walk_forward.windows(10, 4, 2, step=3) == [walk_forward.Window(0, 0, 4, 6), walk_forward.Window(1, 3, 7, 9)]
+    assert walk_forward.windows(5, 4, 2) == []
+
+
+def test_windows_reject_empty_segments():
+    with pytest.raises(ValueError):
+        walk_forward.windows(10, 4, 0)
+
+
+def test_an_empty_train_segment_is_left_out():
+    assert walk_forward.segments(walk_forward.Window(0, 3, 3, 5)) == [("test", 3, 5)]
+
+
+@pytest.mark.parametrize("strategy", [VolumeIndicatorOBV, GoldenCross], ids=lambda strategy: strategy.__name__)
+@pytest.mark.parametrize("train, test, step", [(1000, 500, None), (0, 1000, 500)])
+def test_vector_walk_forward_matches_backtesting(strategy, train, test, step, no_indicator_cache):
+    df = synthetic_bars(5000)
+    panel = BarPanel({"ticker": df})
+    precomputed = panel.slices(strategy.batch_indicators(panel), "ticker")
+
+    expected = [stats for window in walk_forward.windows(len(df), train, test, step)
+                for _, stats in walk_forward.back_test(df.iloc[window.train_start:window.test_end], strategy, window,
+                                                       walk_forward.slice_values(precomputed, window.train_start,
+                                                                                 window.test_end))]
+    actual = [stats for _, _, stats in walk_forward.vector_back_test({"ticker": df}, strategy, train, test,
+                                                                     step)["ticker"]]
+
+    assert len(actual) == len(expected)
+    for vector_stats, stats in zip(actual, expected):
+        np.testing.assert_allclose([vector_stats[key] for key in vector.CORE_STATS],
+                                   [stats[key] for key in vector.CORE_STATS], rtol=1e-9, equal_nan=True)